@@ -1,28 +1,87 @@
 # app.py
 from functools import wraps
+from collections import OrderedDict
+import os
+import queue
+import sys
+import threading
+import time
 from flask import (
     Flask, render_template, request, jsonify, session,
-    redirect, url_for, flash
+    redirect, url_for, flash, g, send_file, abort,
+    Response, stream_with_context
 )
 from models import (
     db, Dossier, DossierControl, SOC2FrameworkControl, ISO27001FrameworkControl,
     User, Client, UserRole, DossierNote, DossierDocument, DossierClientControl,
-    ContactPerson, DossierACL
+    ContactPerson, DossierACL, Permission, perms_to_mask, mask_to_perms,
+    MasterControl, ControlStatus, DossierStatus, DossierTask, TaskStatus, DossierProgress,
+    CatalogVersion, Job, JobStatus, AuditEvent, DossierChange
 )
-from bcrypt import checkpw, hashpw, gensalt
+from passwords import PasswordHasher, HasherBusy
+from documentstore import DocumentStore, DocumentTooLarge
+from metrics import RequestMetrics
+from dbconfig import configure_database, ReadReplica
+from questionnaire import load_questionnaire, validate_answers, QuestionnaireUnavailable
+from catalog import CatalogCache, CONTROL_FIELDS
+from controlmap import MappingIndex, control_text
+from jobs import JobRunner
+from audit import AuditLog
+from changefeed import ChangeBroker
+import base64
+import click
+import csv
 import datetime
-from sqlalchemy import or_
+import enum
+import hashlib
+import io
+import json
+import zipfile
+from sqlalchemy import or_, and_, inspect, text, select, insert, literal, exists, bindparam, func, DateTime
+from sqlalchemy import Enum as SAEnum
+from sqlalchemy.orm import joinedload, with_parent
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.dialects import sqlite as sqlite_dialect, postgresql as postgresql_dialect
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'jouw_geheime_sleutel'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///audit_applicatie.db'
+configure_database(app)  # DATABASE_URL, pooling en SQLite-PRAGMA's uit de omgeving (zie dbconfig.py)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config.update(
     SESSION_COOKIE_HTTPONLY=True,
     SESSION_COOKIE_SECURE=False,  # <-- zet False als je lokaal zonder HTTPS test
     SESSION_COOKIE_SAMESITE='Lax'
 )
+app.config.setdefault('ACL_CACHE_SIZE', 10000)     # max. aantal (user_id, dossier_id)-entries
+app.config.setdefault('ACL_CACHE_TTL', 60)         # seconden; vangnet naast de gedeelde ACL-versie
+app.config.setdefault('BCRYPT_ROUNDS', 12)          # work factor; oude hashes worden bij login herhasht
+app.config.setdefault('PASSWORD_HASH_WORKERS', 4)   # max. gelijktijdige bcrypt-berekeningen
+app.config.setdefault('PASSWORD_HASH_QUEUE', 32)    # max. wachtenden, daarboven direct 503
+app.config.setdefault('DOCUMENT_STORE_PATH', os.path.join(app.instance_path, 'documents'))
+app.config.setdefault('DOCUMENT_MAX_BYTES', 2 * 1024 ** 3)  # 2 GiB per upload
+app.config.setdefault('USE_X_SENDFILE', False)      # True achter nginx/Apache met X-Sendfile
+app.config.setdefault('QUESTIONNAIRE_CSV', os.environ.get('QUESTIONNAIRE_CSV') or
+                      os.path.join(app.root_path, '2025_lijst tbv app_taken per control_plat - kopie.csv'))
+app.config.setdefault('CATALOG_CHECK_INTERVAL', 5)  # seconden tussen versiecontroles van de framework-catalogus
+app.config.setdefault('CONTROL_MAPPING_PATH', os.path.join(app.instance_path, 'control_mapping.npz'))
+app.config.setdefault('CONTROL_MAPPING_TOP_K', 10)   # aantal bewaarde overeenkomsten per control
+app.config.setdefault('FEED_MAX_CHANGES', 500)       # max. wijzigingen per delta-antwoord
+app.config.setdefault('FEED_RETENTION_DAYS', 30)      # oudere dossier_changes worden opgeruimd
+app.config.setdefault('FEED_SSE_MAX_SECONDS', 300)    # daarna herverbindt EventSource met Last-Event-ID
+app.config.setdefault('FEED_SSE_KEEPALIVE', 15)
+app.config.setdefault('JOB_LIMITS', {'import_frameworks': 1, 'scope_dossier': 2, 'export_dossier': 2,
+                                     'archive_dossiers': 1})
+# JOB_AUTOSTART=0 op de webservers als een aparte worker (flask run-jobs) de jobs uitvoert
+app.config.setdefault('JOB_AUTOSTART', os.environ.get('JOB_AUTOSTART', '1') != '0')
+app.config.setdefault('JOB_EXPORT_PATH', os.path.join(app.instance_path, 'exports'))
+app.config.setdefault('ARCHIVE_PATH', os.path.join(app.instance_path, 'archive'))  # koud archief (zie archive_dossier)
+app.config.setdefault('ARCHIVE_AFTER_DAYS', 90)      # GEARCHIVEERD-dossiers zo lang 'warm' houden
 db.init_app(app)
+read_replica = ReadReplica(app)        # optioneel: DATABASE_READ_URL voor read-only routes
+request_metrics = RequestMetrics(app)  # /metrics, per-route latency + SQL-tellers, slow-query log
+job_runner = JobRunner(app)            # achtergrondjobs (tabel 'jobs' + thread-pool), zie jobs.py
+audit_log = AuditLog(app)              # append-only audittrail, write-behind (zie audit.py)
+change_broker = ChangeBroker(app)      # pub/sub voor de dossier change feed (SSE), zie changefeed.py
 
 # -----------------------------------------------------------------------------
 # AUTH DECORATORS (bestaand)
@@ -68,23 +127,172 @@ ROLE_DEFAULTS = {
 ALL_PERMISSIONS = ['VIEW', 'EDIT', 'MANAGE', 'REQUEST_DELETE']
 
 def _parse_perms(s: str):
+    """LEGACY: CSV-permissies (alleen nog gebruikt door de migratie)."""
     return [p for p in (s or '').split(',') if p]
 
+def _has_mask(column, needed_mask: int):
+    """SQL-expressie: alle bits uit needed_mask staan aan in column."""
+    return column.op('&')(needed_mask) == needed_mask
+
+class PermissionCache:
+    """
+    Begrensde LRU/TTL-cache van perm_mask per (user_id, dossier_id), gedeeld over requests
+    binnen één proces. Ontbrekende ACL-rijen worden als mask 0 gecachet.
+    invalidate() werkt alleen in dit proces; andere workers zien een wijziging via de gedeelde
+    ACL-versie in catalog_versions, die get_dossier_mask eens per request vergelijkt (sync()).
+    """
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, mask: int):
+        with self._lock:
+            self._data[key] = (mask, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id=None, dossier_id=None):
+        """Verwijder entries; None betekent 'alle' voor die sleutelhelft."""
+        with self._lock:
+            if user_id is not None and dossier_id is not None:
+                removed = 1 if self._data.pop((user_id, dossier_id), None) is not None else 0
+            else:
+                keys = [k for k in self._data
+                        if (user_id is None or k[0] == user_id)
+                        and (dossier_id is None or k[1] == dossier_id)]
+                for k in keys:
+                    del self._data[k]
+                removed = len(keys)
+            self.invalidations += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def sync(self, version: int) -> bool:
+        """Leegt de cache als de gedeelde ACL-versie is veranderd; True als dat gebeurde."""
+        with self._lock:
+            if version == self.version:
+                return False
+            stale = self.version is not None
+            self._data.clear()
+            self.version = version
+            return stale
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+            }
+
+permission_cache = PermissionCache(app.config['ACL_CACHE_SIZE'], app.config['ACL_CACHE_TTL'])
+
+def _permission_cache_metrics():
+    st = permission_cache.stats()
+    lines = []
+    for key in ('hits', 'misses', 'invalidations'):
+        lines += [f"# TYPE toverstaf_acl_cache_{key}_total counter",
+                  f"toverstaf_acl_cache_{key}_total {st[key]}"]
+    lines += ["# TYPE toverstaf_acl_cache_size gauge", f"toverstaf_acl_cache_size {st['size']}"]
+    return lines
+
+request_metrics.register_collector(_permission_cache_metrics)
+
+def get_dossier_mask(user_id: int, dossier_id: int) -> int:
+    """
+    perm_mask van een gebruiker op een dossier. Volgorde: per-request memo (g),
+    proces-cache, en pas dan één geïndexeerde query op dossier_acl (uq_dossier_user).
+    Bij de eerste aanroep per request wordt de gedeelde ACL-versie gelezen (één PK-lookup).
+    """
+    key = (user_id, dossier_id)
+    memo = g.get('_acl_masks')
+    if memo is None:
+        permission_cache.sync(catalog_version(ACL_CATALOG))
+        memo = g._acl_masks = {}
+    if key in memo:
+        return memo[key]
+    mask = permission_cache.get(key)
+    if mask is None:
+        mask = db.session.query(DossierACL.perm_mask).filter(
+            DossierACL.dossier_id == dossier_id,
+            DossierACL.user_id == user_id
+        ).scalar() or 0
+        permission_cache.set(key, mask)
+    memo[key] = mask
+    return mask
+
+def invalidate_dossier_permissions(user_id=None, dossier_id=None, publish=True):
+    """
+    Aanroepen direct na een commit die dossier_acl (of de gebruiker) wijzigt. Met publish
+    wordt ook de gedeelde ACL-versie opgehoogd (eigen commit), zodat andere processen hun
+    cache bij hun volgende request legen; publish=False als die al in de transactie is opgehoogd.
+    """
+    if publish:
+        bump_catalog_version(ACL_CATALOG)
+        db.session.commit()
+    permission_cache.invalidate(user_id=user_id, dossier_id=dossier_id)
+    memo = g.get('_acl_masks')
+    if memo:
+        for k in [k for k in memo
+                  if (user_id is None or k[0] == user_id)
+                  and (dossier_id is None or k[1] == dossier_id)]:
+            del memo[k]
+
+def has_dossier_permission(user_id: int, dossier_id: int, needed) -> bool:
+    """needed: permissienaam of lijst met namen, alle moeten aanwezig zijn."""
+    need = needed if isinstance(needed, (list, tuple)) else [needed]
+    mask = perms_to_mask(need)
+    return (get_dossier_mask(user_id, dossier_id) & mask) == mask
+
+def dossiers_with_permission_query(user_id: int, needed='VIEW'):
+    """Query op Dossier, gefilterd via een join op dossier_acl (ix_dossier_acl_user_dossier)."""
+    need = needed if isinstance(needed, (list, tuple)) else [needed]
+    mask = perms_to_mask(need)
+    return Dossier.query.join(
+        DossierACL,
+        and_(DossierACL.dossier_id == Dossier.id, DossierACL.user_id == user_id)
+    ).filter(_has_mask(DossierACL.perm_mask, mask))
+
 def require_dossier_permission(needed):
     """
     Decorator: vereist permissie(s) op een dossier.
     Route moet een URL-parameter 'dossier_id' hebben: /dossiers/<int:dossier_id>/...
     """
-    need = needed if isinstance(needed, (list, tuple)) else [needed]
     def deco(f):
         @wraps(f)
         def wrapper(dossier_id, *args, **kwargs):
             uid = session.get('user_id')
             if not uid:
                 return jsonify({"error": "Authenticatie vereist"}), 401
-            row = DossierACL.query.filter_by(dossier_id=dossier_id, user_id=uid).first()
-            perms = _parse_perms(row.permissions) if row else []
-            if not all(p in perms for p in need):
+            if not has_dossier_permission(uid, dossier_id, needed):
                 if request.accept_mimetypes.accept_html:
                     flash("Toegang geweigerd (ACL)", "error")
                     return redirect(url_for('dossiers'))
@@ -93,6 +301,45 @@ def require_dossier_permission(needed):
         return wrapper
     return deco
 
+def add_column_if_missing(table: str, column: str, ddl: str):
+    """Kleine schema-migratie: db.create_all() voegt geen kolommen toe aan bestaande tabellen."""
+    columns = [c['name'] for c in inspect(db.engine).get_columns(table)]
+    if column not in columns:
+        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        return True
+    return False
+
+def column_ddl(column) -> str:
+    """Type (en FK) van een modelkolom voor ALTER TABLE, in het dialect van de huidige database."""
+    ddl = column.type.compile(dialect=db.engine.dialect)
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {fk.column.table.name}({fk.column.name})"
+    return ddl
+
+def migrate_acl_to_bitmask():
+    """
+    Eenmalige migratie van de CSV-kolom dossier_acl.permissions naar perm_mask.
+    Voegt zo nodig de kolom en de index toe (db.create_all() wijzigt bestaande tabellen niet)
+    en is veilig om bij iedere start opnieuw te draaien.
+    """
+    add_column_if_missing('dossier_acl', 'perm_mask', 'INTEGER NOT NULL DEFAULT 0')
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_dossier_acl_user_dossier "
+        "ON dossier_acl (user_id, dossier_id, perm_mask)"
+    ))
+    rows = db.session.execute(text(
+        "SELECT id, permissions FROM dossier_acl WHERE permissions IS NOT NULL AND permissions != ''"
+    )).fetchall()
+    if rows:
+        db.session.execute(
+            text("UPDATE dossier_acl SET perm_mask = :mask, permissions = '' WHERE id = :id"),
+            [{"id": r.id, "mask": perms_to_mask(_parse_perms(r.permissions))} for r in rows]
+        )
+        bump_catalog_version(ACL_CATALOG)
+    db.session.commit()
+    permission_cache.clear()
+    return len(rows)
+
 def grant_default_acl_for_creator(dossier_id: int, creator_user_id: int, creator_role_value: str):
     """
     Geef default ACL aan de maker van een dossier o.b.v. rol.
@@ -101,24 +348,60 @@ def grant_default_acl_for_creator(dossier_id: int, creator_user_id: int, creator
     defaults = ROLE_DEFAULTS.get(creator_role_value, [])
     if not defaults:
         return
-    perms = ",".join(sorted(set(defaults)))
+    mask = perms_to_mask(defaults)
     row = DossierACL.query.filter_by(dossier_id=dossier_id, user_id=creator_user_id).first()
     if row:
-        row.permissions = perms
+        row.perm_mask = mask
         row.granted_by_user_id = creator_user_id
         row.granted_at = datetime.datetime.utcnow()
     else:
         db.session.add(DossierACL(
             dossier_id=dossier_id,
             user_id=creator_user_id,
-            permissions=perms,
+            perm_mask=mask,
             granted_by_user_id=creator_user_id
         ))
     db.session.commit()
+    invalidate_dossier_permissions(creator_user_id, dossier_id)
 
 # -----------------------------------------------------------------------------
 # HELPERS
 # -----------------------------------------------------------------------------
+password_hasher = PasswordHasher(
+    rounds=app.config['BCRYPT_ROUNDS'],
+    max_workers=app.config['PASSWORD_HASH_WORKERS'],
+    max_queue=app.config['PASSWORD_HASH_QUEUE']
+)
+
+document_store = DocumentStore(app.config['DOCUMENT_STORE_PATH'], app.config['DOCUMENT_MAX_BYTES'])
+
+def document_to_dict(doc: DossierDocument):
+    return {
+        'id': doc.id,
+        'dossier_id': doc.dossier_id,
+        'filename': doc.filename,
+        'sha256': doc.sha256,
+        'size': doc.size,
+        'content_type': doc.content_type,
+        'uploaded_by': doc.uploaded_by_user_id,
+        'uploaded_at': doc.uploaded_at.strftime('%Y-%m-%d %H:%M:%S') if doc.uploaded_at else None,
+    }
+
+def _hasher_busy_response():
+    """
+    Snelle afwijzing als de bcrypt-pool verzadigd is: altijd 503 met Retry-After (ook voor
+    browsers, zodat clients en load balancers de tegendruk zien), HTML toont de loginpagina.
+    """
+    msg = "Het is op dit moment erg druk, probeer het over enkele seconden opnieuw."
+    if request.accept_mimetypes.accept_html:
+        flash(msg, "error")
+        resp = Response(render_template('index.html'), mimetype='text/html')
+    else:
+        resp = jsonify({"error": msg})
+    resp.status_code = 503
+    resp.headers['Retry-After'] = '2'
+    return resp
+
 def user_to_dict(user: User):
     return {
         'id': user.id,
@@ -129,17 +412,1636 @@ def user_to_dict(user: User):
         'created_at': user.created_at.strftime('%Y-%m-%d %H:%M:%S') if user.created_at else None
     }
 
+def normalize_email(email) -> str:
+    return (email or '').strip().lower()
+
+def find_user_by_email(email):
+    """Hoofdletterongevoelig via de expressie-index ix_users_email_lower."""
+    normalized = normalize_email(email)
+    if not normalized:
+        return None
+    return User.query.filter(func.lower(User.email) == normalized).order_by(User.id).first()
+
+USER_PAGE_SIZE = 50
+USER_PAGE_SIZE_MAX = 200
+USER_ORDERS = ('name', 'id')
+
+def _user_search(q: str):
+    prefix = q.strip().lower()
+    if not prefix:
+        return None
+    return or_(_prefix_range(func.lower(User.name), prefix), _prefix_range(func.lower(User.email), prefix))
+
+def user_page(args):
+    """
+    Eén pagina (keyset) gebruikers. args: q (prefix op naam of e-mail, hoofdletterongevoelig),
+    role, approved (true/false), order ('name' of 'id'), limit en cursor.
+    Gooit ValueError bij ongeldige parameters.
+    """
+    order = args.get('order') or 'name'
+    if order not in USER_ORDERS:
+        raise ValueError("order moet 'name' of 'id' zijn.")
+    try:
+        limit = min(max(int(args.get('limit') or USER_PAGE_SIZE), 1), USER_PAGE_SIZE_MAX)
+    except ValueError:
+        raise ValueError("limit moet numeriek zijn.")
+    q = User.query
+    search = _user_search(args.get('q') or '')
+    if search is not None:
+        q = q.filter(search)
+    role = args.get('role')
+    if role:
+        try:
+            q = q.filter(User.role == UserRole(role))
+        except ValueError:
+            raise ValueError(f"Onbekende rol: {role}")
+    approved = args.get('approved')
+    if approved not in (None, ''):
+        q = q.filter(User.is_approved.is_(str(approved).lower() in ('1', 'true', 'ja')))
+
+    sort_name = func.lower(User.name)
+    cursor = args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if order == 'id':
+            if not values or len(values) != 1:
+                raise ValueError("Ongeldige cursor.")
+            q = q.filter(User.id < values[0])
+        else:
+            if not values or len(values) != 2:
+                raise ValueError("Ongeldige cursor.")
+            q = q.filter(or_(sort_name > values[0], and_(sort_name == values[0], User.id > values[1])))
+    if order == 'id':
+        q = q.add_columns(User.id).order_by(User.id.desc())
+    else:
+        # De cursor neemt de sorteerwaarde uit SQL over; Python's str.lower() wijkt af van
+        # SQLite's lower() (dat alleen ASCII omzet), waardoor pagina's zouden overslaan.
+        q = q.add_columns(sort_name).order_by(sort_name, User.id)
+
+    rows = q.limit(limit + 1).all()
+    items, has_more = [user for user, _ in rows[:limit]], len(rows) > limit
+    next_cursor = None
+    if has_more:
+        last, sort_value = rows[limit - 1]
+        next_cursor = encode_cursor([last.id] if order == 'id' else [sort_value, last.id])
+    return items, next_cursor
+
+def user_counts(q: str = ''):
+    """Aantallen per rol en goedkeuringsstatus in één GROUP BY (optioneel binnen een zoekprefix)."""
+    query = db.session.query(User.role, User.is_approved, func.count(User.id)).group_by(User.role, User.is_approved)
+    search = _user_search(q)
+    if search is not None:
+        query = query.filter(search)
+    counts = {"total": 0, "approved": 0, "pending": 0, "by_role": {r.value: 0 for r in UserRole}}
+    for role, approved, n in query:
+        counts["total"] += n
+        counts["approved" if approved else "pending"] += n
+        counts["by_role"][role.value] += n
+    return counts
+
+def model_to_record(obj):
+    """Generieke, JSON-serialiseerbare weergave van een modelrij (alle tabelkolommen)."""
+    record = {}
+    for col in obj.__table__.columns:
+        value = getattr(obj, col.key)
+        if isinstance(value, enum.Enum):
+            value = value.value
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            value = value.isoformat()
+        record[col.key] = value
+    return record
+
+def dossier_to_dict(d: Dossier):
+    return {
+        'id': d.id,
+        'dossier_number': d.dossier_number,
+        'title': d.title,
+        'status': d.status.value if d.status else None,
+        'start_date': d.start_date.strftime('%Y-%m-%d %H:%M:%S') if d.start_date else None,
+        'closed_date': d.closed_date.strftime('%Y-%m-%d %H:%M:%S') if d.closed_date else None,
+        'client_id': d.client_id,
+        'client_name': d.client.name if d.client else None,
+        'previous_dossier_id': d.previous_dossier_id,
+        'archived_at': d.archived_at.strftime('%Y-%m-%d %H:%M:%S') if d.archived_at else None,
+    }
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str):
+    """Geeft de lijst met waarden uit een cursor terug, of None bij een ongeldige cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return values if isinstance(values, list) else None
+    except Exception:
+        return None
+
+def _prefix_range(column, prefix: str):
+    """prefix-match als bereik (column >= p AND column < p'), zodat de unique index bruikbaar is."""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+DOSSIER_PAGE_SIZE = 50
+DOSSIER_PAGE_SIZE_MAX = 200
+DOSSIER_ORDERS = ('id', 'start_date')
+
+def dossier_page(user_id: int, args):
+    """
+    Eén pagina (keyset) van de dossiers waarop user_id VIEW heeft, nieuwste eerst.
+    args: dict-achtig met optioneel status, client_id, number (prefix van dossier_number),
+    order ('id' of 'start_date'), limit en cursor (uit een vorige pagina).
+    Kost per pagina een vast aantal queries (client wordt mee-gejoind), ongeacht de historie.
+    Gooit ValueError bij ongeldige parameters.
+    """
+    order = args.get('order') or 'id'
+    if order not in DOSSIER_ORDERS:
+        raise ValueError("order moet 'id' of 'start_date' zijn.")
+    try:
+        limit = min(max(int(args.get('limit') or DOSSIER_PAGE_SIZE), 1), DOSSIER_PAGE_SIZE_MAX)
+    except ValueError:
+        raise ValueError("limit moet numeriek zijn.")
+
+    q = dossiers_with_permission_query(user_id, 'VIEW').options(joinedload(Dossier.client))
+
+    status = args.get('status')
+    if status:
+        try:
+            q = q.filter(Dossier.status == DossierStatus(status))
+        except ValueError:
+            raise ValueError(f"Onbekende status: {status}")
+    client_id = args.get('client_id')
+    if client_id:
+        try:
+            q = q.filter(Dossier.client_id == int(client_id))
+        except ValueError:
+            raise ValueError("client_id moet numeriek zijn.")
+    number = (args.get('number') or '').strip()
+    if number:
+        q = q.filter(_prefix_range(Dossier.dossier_number, number))
+
+    cursor = args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if order == 'id':
+            if not values or len(values) != 1:
+                raise ValueError("Ongeldige cursor.")
+            q = q.filter(Dossier.id < values[0])
+        else:
+            if not values or len(values) != 2:
+                raise ValueError("Ongeldige cursor.")
+            start = datetime.datetime.fromisoformat(values[0]) if values[0] else None
+            if start is None:
+                # NULL start_date sorteert als laatste: alleen nog NULL's met kleiner id
+                q = q.filter(Dossier.start_date.is_(None), Dossier.id < values[1])
+            else:
+                q = q.filter(or_(
+                    Dossier.start_date < start,
+                    and_(Dossier.start_date == start, Dossier.id < values[1]),
+                    Dossier.start_date.is_(None)
+                ))
+
+    if order == 'id':
+        q = q.order_by(Dossier.id.desc())
+    else:
+        q = q.order_by(Dossier.start_date.is_(None), Dossier.start_date.desc(), Dossier.id.desc())
+
+    rows = q.limit(limit + 1).all()
+    items, has_more = rows[:limit], len(rows) > limit
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        if order == 'id':
+            next_cursor = encode_cursor([last.id])
+        else:
+            next_cursor = encode_cursor([last.start_date.isoformat() if last.start_date else None, last.id])
+    return items, next_cursor
+
+def upsert_statement(table, index_elements, update_columns, expressions=None):
+    """
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE SET <update_columns> = excluded.<kolom>,
+    voor SQLite en PostgreSQL. Bedoeld voor executemany met een lijst parameter-dicts.
+    expressions: optioneel {kolom: fn(table, excluded) -> SQL-expressie}, bijv. om bits te OR-en
+    met de bestaande waarde i.p.v. die te overschrijven.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        stmt = sqlite_dialect.insert(table)
+    elif dialect == 'postgresql':
+        stmt = postgresql_dialect.insert(table)
+    else:
+        raise NotImplementedError(f"Upsert niet ondersteund voor {dialect}")
+    set_ = {col: stmt.excluded[col] for col in update_columns}
+    for col, fn in (expressions or {}).items():
+        set_[col] = fn(table, stmt.excluded)
+    return stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+
 def _next_dossier_number():
+    """
+    Reserveert het volgende dossiernummer van vandaag via dossier_number_sequences.
+    Eén atomaire upsert (+ lezen van de eigen rij) binnen de lopende transactie: de rij blijft
+    gelockt tot de commit van het nieuwe dossier, dus gelijktijdige workers krijgen nooit
+    hetzelfde nummer. Bestaat de dagteller nog niet, dan start hij na het hoogste bestaande
+    nummer van vandaag (via de unique index op dossier_number, geen scan).
+    Aanroepen in dezelfde transactie als de INSERT van het Dossier.
+    """
     today = datetime.datetime.now().strftime("%Y%m%d")
-    last = Dossier.query.filter(Dossier.dossier_number.like(f"D-{today}-%")) \
-                        .order_by(Dossier.dossier_number.desc()).first()
-    seq = 1
-    if last:
+    prefix = f"D-{today}-"
+    db.session.execute(text(
+        "INSERT INTO dossier_number_sequences (day, last_value) "
+        "SELECT :day, COALESCE(CAST(substr(MAX(dossier_number), :start) AS INTEGER), 0) + 1 "
+        "FROM dossiers WHERE dossier_number >= :lo AND dossier_number < :hi "
+        "ON CONFLICT (day) DO UPDATE SET last_value = dossier_number_sequences.last_value + 1"
+    ), {"day": today, "start": len(prefix) + 1, "lo": prefix, "hi": f"D-{today}."})
+    seq = db.session.execute(
+        text("SELECT last_value FROM dossier_number_sequences WHERE day = :day"), {"day": today}
+    ).scalar()
+    return f"{prefix}{seq:04d}"
+
+# -----------------------------------------------------------------------------
+# CATALOGUS: master_controls in het geheugen (per proces), versie via catalog_versions
+# -----------------------------------------------------------------------------
+MASTER_CONTROLS_CATALOG = 'master_controls'
+ACL_CATALOG = 'dossier_acl'   # versie van de ACL's, zie PermissionCache
+
+def catalog_version(name: str = MASTER_CONTROLS_CATALOG) -> int:
+    row = db.session.get(CatalogVersion, name)
+    return row.version if row else 0
+
+def bump_catalog_version(name: str = MASTER_CONTROLS_CATALOG):
+    """
+    Hoogt de versie op binnen de lopende transactie (aanroepen vóór de commit van de import);
+    alle processen laden de catalogus daarna bij hun volgende versiecontrole opnieuw.
+    """
+    updated = db.session.execute(text(
+        "UPDATE catalog_versions SET version = version + 1, updated_at = :now WHERE name = :name"
+    ), {"name": name, "now": datetime.datetime.now()}).rowcount
+    if not updated:
+        db.session.add(CatalogVersion(name=name, version=1))
+        db.session.flush()
+
+def _catalog_rows():
+    columns = [getattr(MasterControl, f) for f in CONTROL_FIELDS]
+    return db.session.query(*columns).order_by(MasterControl.framework, MasterControl.id).all()
+
+framework_catalog = CatalogCache(catalog_version, _catalog_rows, app.config['CATALOG_CHECK_INTERVAL'])
+
+def _catalog_metrics():
+    catalog = framework_catalog._catalog
+    lines = ["# TYPE toverstaf_catalog_loads_total counter", f"toverstaf_catalog_loads_total {framework_catalog.loads}"]
+    if catalog is not None:
+        lines += ["# TYPE toverstaf_catalog_version gauge", f"toverstaf_catalog_version {catalog.version}"]
+    return lines
+
+request_metrics.register_collector(_catalog_metrics)
+
+# -----------------------------------------------------------------------------
+# MAPPING: SOC2 <-> ISO27001 overeenkomsten (TF-IDF index, zie controlmap.py)
+# -----------------------------------------------------------------------------
+_control_mapping = {"index": None, "stats": None}
+_control_mapping_lock = threading.Lock()
+
+def control_mapping_index() -> MappingIndex:
+    """
+    De mapping-index voor de huidige catalogusversie. Volgorde: geheugen, bestand op schijf
+    (CONTROL_MAPPING_PATH), en pas bij een nieuwe catalogusversie een incrementele rebuild
+    (alleen gewijzigde controls worden opnieuw geanalyseerd), die direct weer wordt opgeslagen.
+    """
+    catalog = framework_catalog.get()
+    index = _control_mapping["index"]
+    if index is not None and index.version == catalog.version:
+        return index
+    with _control_mapping_lock:
+        index = _control_mapping["index"]
+        if index is not None and index.version == catalog.version:
+            return index
+        path = app.config['CONTROL_MAPPING_PATH']
+        if index is None:
+            index = MappingIndex.load(path)
+        if index is None or index.version != catalog.version:
+            docs = [(c.id, c.framework, control_text(c)) for c in catalog.by_id.values()]
+            index, stats = MappingIndex.build(docs, catalog.version, previous=index,
+                                              top_k=app.config['CONTROL_MAPPING_TOP_K'])
+            index.save(path)
+            _control_mapping["stats"] = stats
+        _control_mapping["index"] = index
+        return index
+
+def refresh_control_mapping():
+    """Na een import: catalogus opnieuw controleren en de index zo nodig (incrementeel) herbouwen."""
+    framework_catalog.invalidate()
+    control_mapping_index()
+    return _control_mapping["stats"]
+
+def _control_summary(c):
+    key = c.sub if c.framework == 'SOC2' else c.beheersmaatregel_id
+    name = c.tsc_description_series if c.framework == 'SOC2' else c.beheersmaatregel_naam
+    return {"id": c.id, "framework": c.framework, "key": key, "name": name}
+
+# -----------------------------------------------------------------------------
+# SCOPING: framework -> DossierControl / DossierClientControl
+# -----------------------------------------------------------------------------
+FRAMEWORKS = ('SOC2', 'ISO27001')
+# Toegestane scoping-filters -> kolom op MasterControl
+SCOPE_FILTERS = {
+    'series': MasterControl.series,
+    'tsc_series': MasterControl.tsc_series,
+    'sub': MasterControl.sub,
+    'hoofdstuk': MasterControl.hoofdstuk,
+    'beheersmaatregel_id': MasterControl.beheersmaatregel_id,
+}
+
+def _as_list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, (list, tuple)):
+        return [v for v in value if v not in (None, '')]
+    return [v.strip() for v in str(value).split(',') if v.strip()]
+
+def _scope_insert(table, dossier_id: int, conditions, extra_values=None):
+    """INSERT ... SELECT van alle passende master_controls die nog niet in table staan."""
+    extra_values = extra_values or {}
+    already = exists().where(and_(
+        table.c.dossier_id == dossier_id,
+        table.c.master_control_id == MasterControl.id
+    ))
+    cols = [literal(dossier_id).label('dossier_id'), MasterControl.id.label('master_control_id')]
+    cols += [literal(v, table.c[k].type).label(k) for k, v in extra_values.items()]
+    sel = select(*cols).where(and_(*conditions), ~already)
+    stmt = insert(table).from_select(['dossier_id', 'master_control_id'] + list(extra_values), sel)
+    return db.session.execute(stmt).rowcount
+
+def scope_dossier(dossier_id: int, framework: str, filters=None, include_client_controls=True):
+    """
+    Zet alle (gefilterde) MasterControls van een framework in één keer om naar
+    DossierControl (+ optioneel DossierClientControl) rijen: één statement per tabel,
+    één transactie. Idempotent: bestaande controls worden overgeslagen.
+    filters: dict met sleutels uit SCOPE_FILTERS, waarde = string/CSV of lijst.
+    Geeft het aantal ingevoegde rijen per tabel terug.
+    """
+    if framework not in FRAMEWORKS:
+        raise ValueError(f"Onbekend framework: {framework}")
+    conditions = [MasterControl.framework == framework]
+    for key, value in (filters or {}).items():
+        if key not in SCOPE_FILTERS:
+            raise ValueError(f"Onbekend filter: {key}")
+        values = _as_list(value)
+        if values:
+            conditions.append(SCOPE_FILTERS[key].in_(values))
+    try:
+        controls = _scope_insert(
+            DossierControl.__table__, dossier_id, conditions,
+            {'status': ControlStatus.OPEN, 'review_status': 'open'}
+        )
+        client_controls = 0
+        if include_client_controls:
+            client_controls = _scope_insert(DossierClientControl.__table__, dossier_id, conditions)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"dossier_controls": controls, "dossier_client_controls": client_controls}
+
+# -----------------------------------------------------------------------------
+# ROLL-FORWARD: nieuw dossier op basis van dat van vorig jaar
+# -----------------------------------------------------------------------------
+def roll_forward_dossier(source_id: int, actor_id: int, title=None):
+    """
+    Maakt een nieuw dossier (nieuw nummer) als kopie van source_id, in één transactie met
+    één INSERT ... SELECT per tabel:
+      - dossier_controls: dezelfde controls, status OPEN / review 'open', zonder commentaar/antwoorden
+      - dossier_client_controls: inclusief client_response, client_comment en answers
+      - dossier_acl: dezelfde permissies (granted_by = actor); de actor krijgt zo nodig de
+        default-rechten van zijn rol
+    Geeft (nieuw dossier, tellingen) terug.
+    """
+    source = db.session.get(Dossier, source_id)
+    if source is None:
+        raise ValueError("Dossier niet gevonden.")
+    controls, client_controls, acl = (DossierControl.__table__, DossierClientControl.__table__,
+                                      DossierACL.__table__)
+    now = datetime.datetime.now()
+    try:
+        d = Dossier(
+            dossier_number=_next_dossier_number(),
+            title=(title or '').strip() or source.title,
+            status=DossierStatus.NIEUW,
+            client_id=source.client_id,
+            created_by_user_id=actor_id,
+            previous_dossier_id=source.id
+        )
+        db.session.add(d)
+        db.session.flush()
+        counts = {}
+        counts['dossier_controls'] = db.session.execute(insert(controls).from_select(
+            ['dossier_id', 'master_control_id', 'status', 'review_status'],
+            select(literal(d.id), controls.c.master_control_id,
+                   literal(ControlStatus.OPEN, controls.c.status.type), literal('open'))
+            .where(controls.c.dossier_id == source.id)
+        )).rowcount
+        counts['dossier_client_controls'] = db.session.execute(insert(client_controls).from_select(
+            ['dossier_id', 'master_control_id', 'client_response', 'client_comment', 'answers'],
+            select(literal(d.id), client_controls.c.master_control_id, client_controls.c.client_response,
+                   client_controls.c.client_comment, client_controls.c.answers)
+            .where(client_controls.c.dossier_id == source.id)
+        )).rowcount
+        counts['dossier_acl'] = db.session.execute(insert(acl).from_select(
+            ['dossier_id', 'user_id', 'perm_mask', 'permissions', 'granted_by_user_id', 'granted_at'],
+            select(literal(d.id), acl.c.user_id, acl.c.perm_mask, literal(''), literal(actor_id), literal(now))
+            .where(acl.c.dossier_id == source.id)
+        )).rowcount
+        user = db.session.get(User, actor_id)
+        defaults = ROLE_DEFAULTS.get(user.role.value, []) if user else []
+        if defaults and not db.session.query(exists().where(and_(
+                acl.c.dossier_id == d.id, acl.c.user_id == actor_id))).scalar():
+            db.session.execute(insert(acl).values(
+                dossier_id=d.id, user_id=actor_id, perm_mask=perms_to_mask(defaults), permissions='',
+                granted_by_user_id=actor_id, granted_at=now
+            ))
+            counts['dossier_acl'] += 1
+        audit_log.record('dossiers.roll_forward', 'dossiers', entity_id=d.id, dossier_id=d.id,
+                         old_value={'dossier_id': source.id, 'dossier_number': source.dossier_number},
+                         new_value=counts)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_dossier_permissions(dossier_id=d.id)
+    return d, counts
+
+# -----------------------------------------------------------------------------
+# ACL IN BULK: gebruikers x dossiers x permissies
+# -----------------------------------------------------------------------------
+ACL_BULK_MODES = ('add', 'remove', 'replace')
+ACL_BULK_MAX_PAIRS = 10000
+ALL_PERMISSION_BITS = int(sum(Permission))
+
+def _id_list(value, name):
+    if not isinstance(value, list) or not value or not all(isinstance(v, int) for v in value):
+        raise ValueError(f"{name} moet een niet-lege lijst met numerieke id's zijn.")
+    return sorted(set(value))
+
+def bulk_update_acl(actor_id: int, user_ids, dossier_ids, permissions, mode='add', dry_run=False):
+    """
+    Past permissies toe op alle combinaties gebruiker x dossier, in één transactie:
+      add: bits erbij (OR), remove: bits eraf (AND NOT), replace: precies deze permissies.
+    Eén SELECT van de bestaande rijen, daarna één executemany-upsert op uq_dossier_user
+    (bij add/replace) of UPDATE (bij remove) voor alleen de gewijzigde paren. De nieuwe mask
+    wordt in SQL berekend uit de actuele waarde, dus gelijktijdige wijzigingen gaan niet verloren.
+    Paren die op een lege mask uitkomen worden verwijderd; een lege replace op een paar zonder
+    rij telt als ongewijzigd. Geeft een diff per gewijzigd paar terug. Gooit ValueError (ongeldige invoer) of
+    PermissionError (geen MANAGE op een of meer dossiers).
+    """
+    if mode not in ACL_BULK_MODES:
+        raise ValueError(f"mode moet een van {list(ACL_BULK_MODES)} zijn.")
+    user_ids, dossier_ids = _id_list(user_ids, 'users'), _id_list(dossier_ids, 'dossiers')
+    if not isinstance(permissions, list):
+        raise ValueError("permissions moet een lijst met permissienamen zijn.")
+    unknown = [p for p in permissions if p not in Permission.__members__]
+    if unknown:
+        raise ValueError(f"Onbekende permissies: {unknown}")
+    mask = perms_to_mask(permissions)
+    if not mask and mode != 'replace':
+        raise ValueError("permissions mag alleen bij replace leeg zijn.")
+    if len(user_ids) * len(dossier_ids) > ACL_BULK_MAX_PAIRS:
+        raise ValueError(f"Maximaal {ACL_BULK_MAX_PAIRS} combinaties per aanroep.")
+
+    managed = {d_id for (d_id,) in dossiers_with_permission_query(actor_id, 'MANAGE')
+               .filter(Dossier.id.in_(dossier_ids)).with_entities(Dossier.id)}
+    forbidden = [d for d in dossier_ids if d not in managed]
+    if forbidden:
+        raise PermissionError(f"Geen MANAGE-rechten op dossiers {forbidden}")
+    known_users = {u for (u,) in db.session.query(User.id).filter(User.id.in_(user_ids))}
+    missing = [u for u in user_ids if u not in known_users]
+    if missing:
+        raise ValueError(f"Onbekende gebruikers: {missing}")
+
+    acl = DossierACL.__table__
+    current = {(r.dossier_id, r.user_id): r.perm_mask for r in db.session.execute(
+        select(acl.c.dossier_id, acl.c.user_id, acl.c.perm_mask)
+        .where(acl.c.dossier_id.in_(dossier_ids), acl.c.user_id.in_(user_ids))
+    )}
+    diff, unchanged = [], 0
+    for d_id in dossier_ids:
+        for u_id in user_ids:
+            before = current.get((d_id, u_id))
+            if before is None and mode == 'remove':
+                unchanged += 1
+                continue
+            old = before or 0
+            after = {'add': old | mask, 'remove': old & ~mask, 'replace': mask}[mode]
+            if (before is not None and after == old) or (before is None and not after):
+                unchanged += 1
+                continue
+            diff.append({"dossier_id": d_id, "user_id": u_id, "before": mask_to_perms(old) if before is not None
+                         else None, "after": mask_to_perms(after)})
+    result = {"mode": mode, "changed": len(diff), "unchanged": unchanged, "dry_run": dry_run, "diff": diff}
+    if dry_run or not diff:
+        return result
+
+    now = datetime.datetime.utcnow()
+    params = [{"dossier_id": c["dossier_id"], "user_id": c["user_id"], "perm_mask": mask,
+               "keep": ALL_PERMISSION_BITS & ~mask, "permissions": '', "granted_by_user_id": actor_id,
+               "granted_at": now} for c in diff]
+    try:
+        if mode == 'remove':
+            db.session.execute(text(
+                "UPDATE dossier_acl SET perm_mask = perm_mask & :keep, granted_by_user_id = :granted_by_user_id, "
+                "granted_at = :granted_at WHERE dossier_id = :dossier_id AND user_id = :user_id"
+            ), params)
+        elif mask:
+            expressions = {'perm_mask': lambda table, excluded: table.c.perm_mask.op('|')(excluded.perm_mask)} \
+                if mode == 'add' else None
+            db.session.execute(upsert_statement(
+                acl, ['dossier_id', 'user_id'], ['perm_mask', 'granted_by_user_id', 'granted_at'], expressions
+            ), [{k: v for k, v in p.items() if k != 'keep'} for p in params])
+        emptied = [{"dossier_id": c["dossier_id"], "user_id": c["user_id"]} for c in diff if not c["after"]]
+        if emptied:
+            # Een rij zonder permissies heeft geen betekenis: verwijderen in plaats van mask 0 bewaren.
+            db.session.execute(text(
+                "DELETE FROM dossier_acl WHERE dossier_id = :dossier_id AND user_id = :user_id"
+            ), emptied)
+        for c in diff:
+            audit_log.record('dossier_acl.perm_mask', 'dossier_acl', dossier_id=c["dossier_id"],
+                             subject_user_id=c["user_id"], old_value=c["before"], new_value=c["after"])
+        bump_catalog_version(ACL_CATALOG)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    for c in diff:
+        invalidate_dossier_permissions(c["user_id"], c["dossier_id"], publish=False)
+    return result
+
+# -----------------------------------------------------------------------------
+# CLIENT-RESPONSES: bulk upsert van DossierClientControl
+# -----------------------------------------------------------------------------
+CLIENT_RESPONSE_FIELDS = ('client_response', 'client_comment')
+CLIENT_RESPONSE_MAX_ROWS = 5000
+
+def parse_client_response_payload(req):
+    """
+    Leest {"items": [...]} / [...] (JSON) of een CSV-body (text/csv, ';' of ',') met kolommen
+    control_id, client_response, client_comment. Geeft (rows, fields) terug: rows = [(regelnr, dict)],
+    fields = de velden die in deze upload voorkomen (in JSON hoeft niet elke regel ze allemaal
+    te hebben). Gooit ValueError bij een onleesbare payload.
+    """
+    if req.mimetype in ('text/csv', 'application/csv'):
+        body = req.get_data(as_text=True)
+        if body.startswith('\ufeff'):
+            body = body[1:]
+        delimiter = ';' if body.split('\n', 1)[0].count(';') >= body.split('\n', 1)[0].count(',') else ','
+        reader = csv.DictReader(io.StringIO(body), delimiter=delimiter)
+        headers = [h.strip() for h in (reader.fieldnames or [])]
+        if 'control_id' not in headers:
+            raise ValueError("CSV mist de kolom control_id.")
+        fields = [f for f in CLIENT_RESPONSE_FIELDS if f in headers]
+        rows = [(reader.line_num, {k.strip(): v for k, v in row.items() if k}) for row in reader]
+        return rows, fields
+    data = req.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("Verwacht JSON {\"items\": [...]} of een CSV-body.")
+    fields = [f for f in CLIENT_RESPONSE_FIELDS if any(isinstance(i, dict) and f in i for i in items)]
+    return list(enumerate(items, 1)), fields
+
+def bulk_upsert_client_responses(dossier_id: int, rows, fields):
+    """
+    Valideert alle regels tegen de gescopete controls van het dossier en schrijft ze met
+    set-based upserts (uq_dossier_client_control) in één transactie. Alles of niets.
+    Alleen de velden die in een regel staan worden overschreven: regels worden gegroepeerd
+    op hun set velden, met één executemany-upsert per groep.
+    Geeft (resultaat, fouten) terug; fouten per regel.
+    """
+    if not rows:
+        return None, [{"row": None, "errors": ["Geen regels ontvangen."]}]
+    if len(rows) > CLIENT_RESPONSE_MAX_ROWS:
+        return None, [{"row": None, "errors": [f"Maximaal {CLIENT_RESPONSE_MAX_ROWS} regels per upload."]}]
+    if not fields:
+        return None, [{"row": None, "errors": ["Geen velden om bij te werken (client_response/client_comment)."]}]
+
+    # Eén query: control-ID -> master_control_id voor alle gescopete controls van dit dossier
+    scoped = {}
+    for mc_id, sub, bm_id in db.session.query(
+        MasterControl.id, MasterControl.sub, MasterControl.beheersmaatregel_id
+    ).join(DossierControl, DossierControl.master_control_id == MasterControl.id) \
+     .filter(DossierControl.dossier_id == dossier_id):
+        scoped[sub or bm_id] = mc_id
+
+    errors, groups, seen = [], {}, {}
+    for line, row in rows:
+        row_errors = []
+        if not isinstance(row, dict):
+            errors.append({"row": line, "errors": ["Regel moet een object zijn."]})
+            continue
+        control_id = str(row.get('control_id') or '').strip()
+        if not control_id:
+            row_errors.append("control_id is verplicht.")
+        elif control_id not in scoped:
+            row_errors.append(f"Control {control_id} is niet gescoped in dit dossier.")
+        elif control_id in seen:
+            row_errors.append(f"Control {control_id} komt dubbel voor (ook regel {seen[control_id]}).")
+        row_fields = tuple(f for f in fields if f in row)
+        if not row_fields:
+            row_errors.append("Geen velden om bij te werken (client_response/client_comment).")
+        for f in row_fields:
+            if row[f] is not None and not isinstance(row[f], str):
+                row_errors.append(f"Veld {f} moet tekst zijn.")
+        if row_errors:
+            errors.append({"row": line, "control_id": control_id or None, "errors": row_errors})
+            continue
+        seen[control_id] = line
+        values = {f: (row[f].strip() or None) if isinstance(row[f], str) else None for f in row_fields}
+        groups.setdefault(row_fields, []).append(
+            dict(values, dossier_id=dossier_id, master_control_id=scoped[control_id]))
+    if errors:
+        return None, errors
+
+    table = DossierClientControl.__table__
+    existing = {mc_id for (mc_id,) in db.session.query(DossierClientControl.master_control_id)
+                .filter(DossierClientControl.dossier_id == dossier_id)}
+    try:
+        for row_fields, params in groups.items():
+            db.session.execute(upsert_statement(table, ['dossier_id', 'master_control_id'], list(row_fields)),
+                               params)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    total = sum(len(params) for params in groups.values())
+    updated = sum(1 for params in groups.values() for p in params if p['master_control_id'] in existing)
+    return {"inserted": total - updated, "updated": updated, "fields": list(fields)}, []
+
+# -----------------------------------------------------------------------------
+# VOORTGANG: incrementeel bijgehouden tellers per dossier (dossier_progress)
+# -----------------------------------------------------------------------------
+# Per brontabel: tellerkolom -> voorwaarde op de rij ({r} = new/old of de alias in de rebuild).
+# Enums staan als naam in de database (SQLAlchemy Enum).
+PROGRESS_SOURCES = {
+    'dossier_controls': {
+        'controls_total': "1 = 1",
+        'controls_open': f"COALESCE({{r}}.status, '{ControlStatus.OPEN.name}') = '{ControlStatus.OPEN.name}'",
+        'controls_in_uitvoering': f"{{r}}.status = '{ControlStatus.IN_UITVOERING.name}'",
+        'controls_afgerond': f"{{r}}.status = '{ControlStatus.AFGEROND.name}'",
+        'controls_niet_van_toepassing': f"{{r}}.status = '{ControlStatus.NIET_VAN_TOEPASSING.name}'",
+        'review_open': "COALESCE({r}.review_status, 'open') = 'open'",
+        'review_1st': "{r}.review_status = '1st_review'",
+        'review_2nd': "{r}.review_status = '2nd_review'",
+        'review_final': "{r}.review_status = 'final'",
+    },
+    'dossier_tasks': {
+        'tasks_total': "1 = 1",
+        'tasks_open': f"COALESCE({{r}}.status, '{TaskStatus.OPEN.name}') != '{TaskStatus.VOLTOOID.name}'",
+    },
+    'dossier_client_controls': {
+        'client_controls_total': "1 = 1",
+        'client_responses_received': "{r}.client_response IS NOT NULL AND {r}.client_response != ''",
+    },
+}
+# Kolommen waarvan een UPDATE de tellers kan veranderen
+PROGRESS_WATCHED_COLUMNS = {
+    'dossier_controls': ('dossier_id', 'status', 'review_status'),
+    'dossier_tasks': ('dossier_id', 'status'),
+    'dossier_client_controls': ('dossier_id', 'client_response'),
+}
+
+def _progress_case(condition: str, row: str) -> str:
+    return f"CASE WHEN {condition.format(r=row)} THEN 1 ELSE 0 END"
+
+def _progress_update(table: str, row: str, sign: str) -> str:
+    counters = PROGRESS_SOURCES[table]
+    sets = ', '.join(f"{col} = {col} {sign} {_progress_case(cond, row)}" for col, cond in counters.items())
+    return f"UPDATE dossier_progress SET {sets} WHERE dossier_id = {row}.dossier_id;"
+
+def _progress_ensure_row(row: str) -> str:
+    # Geen INSERT OR IGNORE: de conflict-clausule van het buitenste statement (upsert) zou die overrulen
+    return (f"INSERT INTO dossier_progress (dossier_id) SELECT {row}.dossier_id "
+            f"WHERE {row}.dossier_id IS NOT NULL AND NOT EXISTS "
+            f"(SELECT 1 FROM dossier_progress WHERE dossier_id = {row}.dossier_id);")
+
+def _pg_trigger(name: str, table: str, events: str, body: str, when: str = ''):
+    """
+    PostgreSQL: PL/pgSQL-functie name() (CREATE OR REPLACE, dus altijd de actuele body) plus een
+    FOR EACH ROW-trigger met dezelfde naam als die nog ontbreekt. events bijv. 'AFTER INSERT OR DELETE'.
+    """
+    db.session.execute(text(
+        f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN {body} END $$"
+    ))
+    found = db.session.execute(text(
+        "SELECT 1 FROM pg_trigger WHERE tgname = :name AND tgrelid = CAST(:table AS regclass)"
+    ), {"name": name, "table": table}).first()
+    if not found:
+        condition = f" WHEN ({when})" if when else ''
+        db.session.execute(text(
+            f"CREATE TRIGGER {name} {events} ON {table} FOR EACH ROW{condition} EXECUTE FUNCTION {name}()"
+        ))
+    return not found
+
+def _progress_pg_body(table: str) -> str:
+    """Eén functie per tabel voor INSERT/UPDATE/DELETE; ON CONFLICT i.p.v. NOT EXISTS tegen gelijktijdige inserts."""
+    return (f"IF TG_OP <> 'INSERT' THEN {_progress_update(table, 'old', '-')} END IF; "
+            f"IF TG_OP <> 'DELETE' THEN "
+            f"INSERT INTO dossier_progress (dossier_id) SELECT new.dossier_id WHERE new.dossier_id IS NOT NULL "
+            f"ON CONFLICT (dossier_id) DO NOTHING; {_progress_update(table, 'new', '+')} END IF; "
+            f"RETURN NULL;")
+
+def ensure_progress_triggers():
+    """
+    Maakt de triggers aan die dossier_progress bij elke INSERT/UPDATE/DELETE op controls, taken
+    en client-controls met +1/-1 bijwerken; ook set-based INSERT ... SELECT's worden zo
+    meegenomen. SQLite: triggers met de statements inline; PostgreSQL: PL/pgSQL-functies.
+    Bij de eerste keer wordt de tabel volledig opgebouwd. Andere databases: foutmelding in
+    de log, de tellers lopen dan alleen bij met rebuild_dossier_progress() (flask rebuild-progress).
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        created = not db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'dossier_controls_progress_ai'"
+        )).first()
+        for table in PROGRESS_SOURCES:
+            watched = ', '.join(PROGRESS_WATCHED_COLUMNS[table])
+            statements = [
+                f"CREATE TRIGGER IF NOT EXISTS {table}_progress_ai AFTER INSERT ON {table} BEGIN "
+                f"{_progress_ensure_row('new')} {_progress_update(table, 'new', '+')} END",
+                f"CREATE TRIGGER IF NOT EXISTS {table}_progress_ad AFTER DELETE ON {table} BEGIN "
+                f"{_progress_update(table, 'old', '-')} END",
+                f"CREATE TRIGGER IF NOT EXISTS {table}_progress_au AFTER UPDATE OF {watched} ON {table} BEGIN "
+                f"{_progress_update(table, 'old', '-')} {_progress_ensure_row('new')} "
+                f"{_progress_update(table, 'new', '+')} END",
+            ]
+            for stmt in statements:
+                db.session.execute(text(stmt))
+    elif dialect == 'postgresql':
+        created = False
+        for table in PROGRESS_SOURCES:
+            watched = ', '.join(PROGRESS_WATCHED_COLUMNS[table])
+            created |= _pg_trigger(f"{table}_progress", table,
+                                   f"AFTER INSERT OR DELETE OR UPDATE OF {watched}", _progress_pg_body(table))
+    else:
+        app.logger.error("dossier_progress: geen triggers voor %s; draai 'flask rebuild-progress' "
+                         "periodiek, anders lopen de tellers achter.", dialect)
+        return False
+    db.session.commit()
+    if created:
+        rebuild_dossier_progress()
+    return True
+
+def rebuild_dossier_progress(dossier_ids=None):
+    """Herberekent dossier_progress volledig (of voor de gegeven dossiers) met één INSERT ... SELECT."""
+    where, params = '', {}
+    if dossier_ids is not None:
+        dossier_ids = list(dossier_ids)
+        if not dossier_ids:
+            return 0
+        where = f" WHERE d.id IN ({', '.join(f':d{i}' for i in range(len(dossier_ids)))})"
+        params = {f'd{i}': v for i, v in enumerate(dossier_ids)}
+    columns, joins = [], []
+    for idx, (table, counters) in enumerate(PROGRESS_SOURCES.items()):
+        alias = f"s{idx}"
+        sums = ', '.join(f"SUM({_progress_case(cond, 'x')}) AS {col}" for col, cond in counters.items())
+        joins.append(f"LEFT JOIN (SELECT x.dossier_id, {sums} FROM {table} x GROUP BY x.dossier_id) {alias} "
+                     f"ON {alias}.dossier_id = d.id")
+        columns += [(col, f"COALESCE({alias}.{col}, 0)") for col in counters]
+    try:
+        if dossier_ids is None:
+            db.session.execute(text("DELETE FROM dossier_progress"))
+        else:
+            db.session.execute(text(
+                f"DELETE FROM dossier_progress WHERE dossier_id IN ({', '.join(':' + k for k in params)})"
+            ), params)
+        result = db.session.execute(text(
+            f"INSERT INTO dossier_progress (dossier_id, {', '.join(c for c, _ in columns)}) "
+            f"SELECT d.id, {', '.join(e for _, e in columns)} FROM dossiers d {' '.join(joins)}{where}"
+        ), params)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result.rowcount
+
+def progress_to_dict(p: DossierProgress):
+    record = model_to_record(p)
+    record.pop('dossier_id', None)
+    return record
+
+@app.cli.command('rebuild-progress')
+def rebuild_progress_command():
+    """Herbouw dossier_progress volledig (reparatie)."""
+    count = rebuild_dossier_progress()
+    print(f"dossier_progress herbouwd voor {count} dossiers.")
+
+# -----------------------------------------------------------------------------
+# CHANGE FEED: wijzigingen per dossier (dossier_changes), cursor = id
+# -----------------------------------------------------------------------------
+# entity -> (tabel, model, operaties met trigger, kolommen waarvan een UPDATE telt)
+FEED_SOURCES = {
+    'note': ('dossier_notes', DossierNote, ('INSERT', 'UPDATE', 'DELETE'), None),
+    'control': ('dossier_controls', DossierControl, ('UPDATE', 'DELETE'), ('status', 'review_status', 'comments')),
+    'acl': ('dossier_acl', DossierACL, ('INSERT', 'UPDATE', 'DELETE'), ('perm_mask',)),
+    'task': ('dossier_tasks', DossierTask, ('INSERT', 'UPDATE', 'DELETE'), None),
+    'document': ('dossier_documents', DossierDocument, ('INSERT', 'DELETE'), None),
+}
+
+def ensure_change_feed_triggers():
+    """
+    Triggers die iedere wijziging als rij in dossier_changes vastleggen, in dezelfde transactie
+    (dus ook Core-bulkupdates); SQLite inline, PostgreSQL via PL/pgSQL-functies. Nieuwe controls
+    via scoping tellen niet als wijziging. Andere databases: foutmelding in de log, de feed blijft leeg.
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        app.logger.error("dossier_changes: geen triggers voor %s; de change feed blijft leeg.", dialect)
+        return False
+    # changed_at in UTC, zoals prune_dossier_changes() verwacht
+    now = 'CURRENT_TIMESTAMP' if dialect == 'sqlite' else "(now() AT TIME ZONE 'utc')"
+    for entity, (table, _, ops, columns) in FEED_SOURCES.items():
+        for op in ops:
+            row = 'old' if op == 'DELETE' else 'new'
+            of = f" OF {', '.join(columns)}" if op == 'UPDATE' and columns else ''
+            insert = (f"INSERT INTO dossier_changes (dossier_id, entity, entity_id, op, changed_at) "
+                      f"VALUES ({row}.dossier_id, '{entity}', {row}.id, '{op.lower()}', {now});")
+            if dialect == 'sqlite':
+                db.session.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_feed_{op.lower()} AFTER {op}{of} ON {table} "
+                    f"WHEN {row}.dossier_id IS NOT NULL BEGIN {insert} END"
+                ))
+            else:
+                _pg_trigger(f"{table}_feed_{op.lower()}", table, f"AFTER {op}{of}", f"{insert} RETURN NULL;",
+                            when=f"{row}.dossier_id IS NOT NULL")
+    db.session.commit()
+    return True
+
+def _feed_record(entity: str, obj):
+    if entity == 'document':
+        return document_to_dict(obj)
+    record = model_to_record(obj)
+    if entity == 'acl':
+        record['permissions'] = mask_to_perms(obj.perm_mask)
+    return record
+
+def dossier_changes_since(dossier_id: int, since: int, limit=None):
+    """
+    Delta van een dossier na cursor since: per gewijzigd object één item met de actuele
+    gegevens ('upsert') of alleen het id ('delete'). Eén geïndexeerde query op dossier_changes
+    plus één query per soort object.
+    reset=True (zonder changes, cursor = nieuwste wijziging) als de client de delta niet
+    volledig kan krijgen: since=0 (nieuwe client), since ouder dan de bewaartermijn, of een
+    cursor die de feed niet kent. De client laadt dan het dossier één keer volledig en volgt
+    daarna de delta's vanaf de teruggegeven cursor. Een nog lege feed geeft cursor 0 zonder reset.
+    """
+    limit = limit or app.config['FEED_MAX_CHANGES']
+    table = DossierChange.__table__
+    oldest, newest = db.session.execute(select(func.min(table.c.id), func.max(table.c.id))).one()
+    if not since:
+        reset = newest is not None
+    else:
+        reset = oldest is None or since < oldest - 1 or since > newest
+    if reset:
+        return {"cursor": newest or 0, "changes": [], "has_more": False, "reset": True}
+    rows = db.session.execute(select(table.c.id, table.c.entity, table.c.entity_id).where(
+        table.c.dossier_id == dossier_id, table.c.id > since
+    ).order_by(table.c.id).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return {"cursor": since, "changes": [], "has_more": False, "reset": False}
+
+    latest = {}     # (entity, entity_id) -> laatste change-id; volgorde = laatste wijziging
+    for r in rows:
+        latest.pop((r.entity, r.entity_id), None)
+        latest[(r.entity, r.entity_id)] = r.id
+    current = {}
+    for entity in {e for e, _ in latest}:
+        model = FEED_SOURCES[entity][1]
+        ids = [i for e, i in latest if e == entity]
+        current.update({(entity, obj.id): obj for obj in
+                        model.query.filter(model.id.in_(ids), model.dossier_id == dossier_id)})
+    changes = []
+    for (entity, entity_id), change_id in latest.items():
+        obj = current.get((entity, entity_id))
+        item = {"entity": entity, "id": entity_id, "change_id": change_id, "op": "upsert" if obj else "delete"}
+        if obj is not None:
+            item["data"] = _feed_record(entity, obj)
+        changes.append(item)
+    return {"cursor": rows[-1].id, "changes": changes, "has_more": has_more, "reset": False}
+
+def prune_dossier_changes(days=None):
+    """
+    Verwijdert wijzigingen ouder dan de bewaartermijn. De nieuwste rij blijft altijd staan: SQLite
+    geeft anders na een lege tabel id's opnieuw uit en bestaande cursors zouden wijzigingen missen.
+    """
+    table = DossierChange.__table__
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days or app.config['FEED_RETENTION_DAYS'])
+    newest = select(func.max(table.c.id)).scalar_subquery()
+    deleted = db.session.execute(
+        table.delete().where(table.c.changed_at < cutoff, table.c.id < newest)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+@app.cli.command('prune-changes')
+def prune_changes_command():
+    """Ruim dossier_changes ouder dan FEED_RETENTION_DAYS op."""
+    print(f"{prune_dossier_changes()} wijzigingen verwijderd.")
+
+def _feed_metrics():
+    return ["# TYPE toverstaf_feed_subscribers gauge",
+            f"toverstaf_feed_subscribers {change_broker.subscriber_count()}"]
+
+request_metrics.register_collector(_feed_metrics)
+
+# -----------------------------------------------------------------------------
+# ZOEKEN: SQLite FTS5-index over de teksten van master_controls
+# -----------------------------------------------------------------------------
+# External-content FTS5-tabel: de tekst staat alleen in master_controls, de index
+# wordt bijgehouden met triggers (en na een import eventueel volledig herbouwd).
+CONTROL_SEARCH_COLUMNS = ('points_of_focus', 'tsc_description_series',
+                          'beheersmaatregel_naam', 'beheersmaatregel_inhoud')
+CONTROL_SEARCH_LIMIT_MAX = 100
+
+def control_search_available() -> bool:
+    return db.engine.dialect.name == 'sqlite'
+
+def ensure_control_search_index(rebuild=False):
+    """
+    Maakt de FTS5-tabel master_controls_fts + sync-triggers aan als die ontbreken.
+    Bij het aanmaken (of met rebuild=True) wordt de index volledig gevuld vanuit master_controls.
+    Geen-op op andere databases dan SQLite.
+    """
+    if not control_search_available():
+        return False
+    cols = ', '.join(CONTROL_SEARCH_COLUMNS)
+    new_cols = ', '.join(f'new.{c}' for c in CONTROL_SEARCH_COLUMNS)
+    old_cols = ', '.join(f'old.{c}' for c in CONTROL_SEARCH_COLUMNS)
+    created = not db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'master_controls_fts'"
+    )).first()
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS master_controls_fts USING fts5("
+        f"framework UNINDEXED, {cols}, content='master_controls', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS master_controls_fts_ai AFTER INSERT ON master_controls BEGIN "
+        f"INSERT INTO master_controls_fts(rowid, framework, {cols}) VALUES (new.id, new.framework, {new_cols}); END",
+        f"CREATE TRIGGER IF NOT EXISTS master_controls_fts_ad AFTER DELETE ON master_controls BEGIN "
+        f"INSERT INTO master_controls_fts(master_controls_fts, rowid, framework, {cols}) "
+        f"VALUES ('delete', old.id, old.framework, {old_cols}); END",
+        f"CREATE TRIGGER IF NOT EXISTS master_controls_fts_au AFTER UPDATE ON master_controls BEGIN "
+        f"INSERT INTO master_controls_fts(master_controls_fts, rowid, framework, {cols}) "
+        f"VALUES ('delete', old.id, old.framework, {old_cols}); "
+        f"INSERT INTO master_controls_fts(rowid, framework, {cols}) VALUES (new.id, new.framework, {new_cols}); END",
+    ]
+    for stmt in statements:
+        db.session.execute(text(stmt))
+    if created or rebuild:
+        db.session.execute(text("INSERT INTO master_controls_fts(master_controls_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    return True
+
+def _fts_query(q: str):
+    """Zet vrije invoer om naar een veilige FTS5-query: elk woord als prefix-term, AND-gekoppeld."""
+    terms = [t for t in ''.join(ch if ch.isalnum() else ' ' for ch in q).split() if t]
+    return ' '.join(f'"{t}"*' for t in terms)
+
+def search_controls(q: str, framework=None, limit=20):
+    """Gerangschikte (bm25) zoekresultaten met gemarkeerde snippets."""
+    match = _fts_query(q or '')
+    if not match:
+        return []
+    sql = (
+        "SELECT mc.id, mc.framework, mc.sub, mc.tsc_series, mc.beheersmaatregel_id, "
+        "mc.beheersmaatregel_naam, "
+        "snippet(master_controls_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet, "
+        "bm25(master_controls_fts) AS rank "
+        "FROM master_controls_fts JOIN master_controls mc ON mc.id = master_controls_fts.rowid "
+        "WHERE master_controls_fts MATCH :match"
+    )
+    params = {"match": match, "limit": limit}
+    if framework:
+        sql += " AND mc.framework = :framework"
+        params["framework"] = framework
+    sql += " ORDER BY rank LIMIT :limit"
+    rows = db.session.execute(text(sql), params).fetchall()
+    return [{
+        "id": r.id,
+        "framework": r.framework,
+        "control_id": r.sub or r.beheersmaatregel_id,
+        "title": r.beheersmaatregel_naam or r.tsc_series,
+        "snippet": r.snippet,
+        "rank": round(r.rank, 4),
+    } for r in rows]
+
+# -----------------------------------------------------------------------------
+# EXPORT: volledig dossier als gestreamde ZIP / NDJSON
+# -----------------------------------------------------------------------------
+EXPORT_BATCH_SIZE = 500
+
+class _ZipStream:
+    """Write-only, niet-seekbaar 'bestand' voor zipfile; de generator haalt de bytes op."""
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _export_sections(dossier: Dossier):
+    """(naam, query) per onderdeel; queries lopen via de Dossier-relaties en worden in batches gelezen."""
+    controls = db.session.query(DossierControl, MasterControl.framework,
+                                MasterControl.sub, MasterControl.beheersmaatregel_id) \
+        .outerjoin(MasterControl, MasterControl.id == DossierControl.master_control_id) \
+        .filter(with_parent(dossier, Dossier.controls)).order_by(DossierControl.id)
+    client_controls = db.session.query(DossierClientControl, MasterControl.framework,
+                                       MasterControl.sub, MasterControl.beheersmaatregel_id) \
+        .outerjoin(MasterControl, MasterControl.id == DossierClientControl.master_control_id) \
+        .filter(with_parent(dossier, Dossier.dossier_client_controls)).order_by(DossierClientControl.id)
+    return [
+        ('controls', controls),
+        ('client_controls', client_controls),
+        ('notes', DossierNote.query.filter(with_parent(dossier, Dossier.notes)).order_by(DossierNote.id)),
+        ('tasks', DossierTask.query.filter_by(dossier_id=dossier.id).order_by(DossierTask.id)),
+        ('acl', DossierACL.query.filter_by(dossier_id=dossier.id).order_by(DossierACL.id)),
+        ('documents', DossierDocument.query.filter(with_parent(dossier, Dossier.documents))
+                                           .order_by(DossierDocument.id)),
+    ]
+
+def _export_record(section: str, row):
+    if section in ('controls', 'client_controls'):
+        obj, framework, sub, bm_id = row
+        record = model_to_record(obj)
+        record.update(framework=framework, control_id=sub or bm_id)
+        return record
+    record = model_to_record(row)
+    if section == 'acl':
+        record['permissions'] = mask_to_perms(row.perm_mask)
+    return record
+
+def iter_dossier_export(dossier: Dossier):
+    """Levert (sectie, record) voor het hele dossier; geheugen blijft O(EXPORT_BATCH_SIZE)."""
+    yield 'dossier', model_to_record(dossier)
+    for section, query in _export_sections(dossier):
+        for row in query.execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE):
+            yield section, _export_record(section, row)
+
+def _ndjson_line(record) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+
+def generate_dossier_ndjson(dossier: Dossier):
+    for section, record in iter_dossier_export(dossier):
+        yield _ndjson_line({"type": section, "data": record})
+
+def generate_dossier_zip(dossier: Dossier, include_documents=True):
+    """
+    Bouwt de ZIP on-the-fly: per sectie een <sectie>.ndjson, plus iedere unieke blob één keer
+    onder blobs/<sha256> (documents.ndjson verwijst ernaar). Na elke schrijfactie worden de
+    gecomprimeerde bytes direct doorgegeven.
+    """
+    out = _ZipStream()
+    with zipfile.ZipFile(out, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        entry, current, blobs = None, None, []
+        for section, record in iter_dossier_export(dossier):
+            if section != current:
+                if entry is not None:
+                    entry.close()
+                entry = zf.open(f"{section}.ndjson", mode='w', force_zip64=True)
+                current = section
+            if section == 'documents' and record.get('sha256'):
+                record['blob'] = f"blobs/{record['sha256']}"
+                blobs.append((record['sha256'], record['file_path']))
+            entry.write(_ndjson_line(record))
+            yield out.drain()
+        if entry is not None:
+            entry.close()
+        if include_documents:
+            seen = set()
+            for sha256, file_path in blobs:
+                path = os.path.join(document_store.root, file_path)
+                if sha256 in seen or not os.path.exists(path):
+                    continue
+                seen.add(sha256)
+                with open(path, 'rb') as src, zf.open(f"blobs/{sha256}", mode='w', force_zip64=True) as dst:
+                    while True:
+                        chunk = src.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        yield out.drain()
+    yield out.drain()
+
+# -----------------------------------------------------------------------------
+# ARCHIEF: gearchiveerde dossiers koud opslaan (ZIP per dossier), stub blijft staan
+# -----------------------------------------------------------------------------
+# Tabellen met de rijen van een dossier, in insert-volgorde voor restore_dossier. De blobs
+# van documenten blijven in de DocumentStore (content-addressed, mogelijk gedeeld). De ACL
+# blijft bij de stub staan: zo blijft het dossier zichtbaar en kan een MANAGE-houder het
+# terugzetten. Archieven in formaat 1 bevatten de ACL nog wel.
+ARCHIVE_TABLES = (DossierControl, DossierClientControl, DossierNote, DossierTask, DossierDocument)
+ARCHIVE_FORMAT = 2
+
+def _archive_value(value):
+    """Zoals model_to_record, maar enums als naam (zoals in de database) zodat restore ze terugleest."""
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+def _restore_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.datetime.fromisoformat(value)
+    if isinstance(column.type, SAEnum) and column.type.enum_class is not None:
+        return column.type.enum_class[value]
+    return value
+
+def archive_path(archive_file: str) -> str:
+    return os.path.join(app.config['ARCHIVE_PATH'], archive_file)
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _archive_chunks(table, dossier_id: int):
+    """(aantal rijen, NDJSON-bytes) per batch van de rijen van een dossier in table, op id-volgorde."""
+    result = db.session.execute(select(table).where(table.c.dossier_id == dossier_id)
+                                .order_by(table.c.id).execution_options(stream_results=True))
+    for rows in result.partitions(EXPORT_BATCH_SIZE):
+        yield len(rows), b''.join(_ndjson_line({k: _archive_value(v) for k, v in row._mapping.items()})
+                                  for row in rows)
+
+def archive_dossier(dossier_id: int):
+    """
+    Verplaatst alle rijen van een GEARCHIVEERD dossier naar <ARCHIVE_PATH>/dossier-<id>.zip
+    (per tabel een NDJSON-bestand plus manifest.json met kolommen en aantallen) en verwijdert
+    ze daarna uit de tabellen; de dossiers-rij blijft als stub met archive_file/archive_sha256
+    en met zijn ACL.
+    In twee stappen, zodat schrijvers niet op het comprimeren en fsyncen wachten:
+      1. zonder schrijflock de rijen lezen, het ZIP-bestand bouwen en fsyncen (met een
+         SHA-256 per tabel over de NDJSON-regels);
+      2. korte schrijftransactie: stub claimen, de rijen opnieuw serialiseren en tegen de
+         digests controleren (ValueError als het dossier intussen gewijzigd is), het bestand
+         atomair plaatsen, de rijen verwijderen en de stub bijwerken.
+    Geeft {tabel: aantal rijen, 'bytes': grootte} terug. Gooit ValueError als het dossier niet
+    (meer) gearchiveerd kan worden.
+    """
+    dossiers = Dossier.__table__
+    stub = db.session.execute(select(dossiers).where(dossiers.c.id == dossier_id)).first()
+    if stub is None or stub.status != DossierStatus.GEARCHIVEERD or stub.archived_at is not None:
+        raise ValueError("Dossier niet gevonden, niet gearchiveerd of al in het archief.")
+    now = datetime.datetime.now()
+    archive_file = f"dossier-{dossier_id}.zip"
+    path = archive_path(archive_file)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    placed = False
+    counts, digests = {}, {}
+    try:
+        os.makedirs(app.config['ARCHIVE_PATH'], exist_ok=True)
+        with zipfile.ZipFile(tmp, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for model in ARCHIVE_TABLES:
+                table = model.__table__
+                counts[table.name], digest = 0, hashlib.sha256()
+                with zf.open(f"{table.name}.ndjson", mode='w', force_zip64=True) as entry:
+                    for n, chunk in _archive_chunks(table, dossier_id):
+                        entry.write(chunk)
+                        digest.update(chunk)
+                        counts[table.name] += n
+                digests[table.name] = digest.hexdigest()
+            zf.writestr('manifest.json', json.dumps({
+                'format': ARCHIVE_FORMAT,
+                'archived_at': now.isoformat(),
+                'dossier': {k: _archive_value(v) for k, v in stub._mapping.items()},
+                'tables': {m.__table__.name: {'columns': [c.name for c in m.__table__.columns],
+                                              'rows': counts[m.__table__.name]} for m in ARCHIVE_TABLES},
+            }, ensure_ascii=False, indent=1))
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        sha256 = _file_sha256(tmp)
+        db.session.rollback()  # leestransactie afsluiten
+
+        claimed = db.session.execute(dossiers.update().where(
+            dossiers.c.id == dossier_id, dossiers.c.status == DossierStatus.GEARCHIVEERD,
+            dossiers.c.archived_at.is_(None)
+        ).values(archived_at=now, archive_file=archive_file, archive_sha256=sha256, restored_at=None)).rowcount
+        if not claimed:
+            raise ValueError("Dossier niet gevonden, niet gearchiveerd of al in het archief.")
+        for model in ARCHIVE_TABLES:
+            table = model.__table__
+            digest = hashlib.sha256()
+            for _, chunk in _archive_chunks(table, dossier_id):
+                digest.update(chunk)
+            if digest.hexdigest() != digests[table.name]:
+                raise ValueError("Dossier is tijdens het archiveren gewijzigd; probeer het opnieuw.")
+        os.replace(tmp, path)
+        placed = True
+        for model in reversed(ARCHIVE_TABLES):
+            table = model.__table__
+            db.session.execute(table.delete().where(table.c.dossier_id == dossier_id))
+        # Afgeleide rijen (door de triggers bij de DELETE's bijgewerkt) zijn voor de stub niet meer nodig
+        for table in (DossierProgress.__table__, DossierChange.__table__):
+            db.session.execute(table.delete().where(table.c.dossier_id == dossier_id))
+        counts['bytes'] = os.path.getsize(path)
+        audit_log.record('dossiers.archive', 'dossiers', entity_id=dossier_id, dossier_id=dossier_id,
+                         new_value=dict(counts, file=archive_file, sha256=sha256))
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        for leftover in (tmp, path) if placed else (tmp,):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    return counts
+
+def restore_dossier(dossier_id: int):
+    """
+    Zet een gearchiveerd dossier terug: controleert de SHA-256 van het archiefbestand en voegt
+    de rijen per tabel in met executemany, met de oorspronkelijke id's (een id die intussen
+    door een andere rij is ingenomen krijgt een nieuwe). Kolommen die niet meer bestaan worden
+    overgeslagen, nieuwe kolommen krijgen hun default. Verwijdert het bestand na de commit.
+    Geeft {tabel: aantal rijen, 'renumbered': n} terug; ValueError bij een ontbrekend of
+    beschadigd archief.
+    """
+    d = db.session.get(Dossier, dossier_id)
+    if d is None or d.archived_at is None or not d.archive_file:
+        raise ValueError("Dossier niet gevonden of niet in het archief.")
+    path = archive_path(d.archive_file)
+    if not os.path.exists(path) or _file_sha256(path) != d.archive_sha256:
+        raise ValueError(f"Archiefbestand {d.archive_file} ontbreekt of is beschadigd.")
+    counts, renumbered = {}, 0
+    try:
+        with zipfile.ZipFile(path) as zf:
+            manifest = json.loads(zf.read('manifest.json'))
+            if manifest.get('format') not in (1, ARCHIVE_FORMAT) or manifest['dossier']['id'] != dossier_id:
+                raise ValueError(f"Archiefbestand {d.archive_file} hoort niet bij dit dossier.")
+            tables = ((DossierACL,) if manifest['format'] == 1 else ()) + ARCHIVE_TABLES
+            for model in tables:
+                table = model.__table__
+                if table.name not in manifest['tables']:
+                    continue
+                counts[table.name] = 0
+                with zf.open(f"{table.name}.ndjson") as entry:
+                    lines = io.TextIOWrapper(entry, encoding='utf-8')
+                    while True:
+                        batch = [json.loads(line) for _, line in zip(range(EXPORT_BATCH_SIZE), lines)]
+                        if not batch:
+                            break
+                        rows = [{c.name: _restore_value(c, record[c.name]) for c in table.columns
+                                 if c.name in record} for record in batch]
+                        taken = set(db.session.execute(select(table.c.id).where(
+                            table.c.id.in_([r['id'] for r in rows])
+                        )).scalars())
+                        fresh = [r for r in rows if r['id'] not in taken]
+                        moved = [{k: v for k, v in r.items() if k != 'id'} for r in rows if r['id'] in taken]
+                        for group in (fresh, moved):
+                            if group:
+                                db.session.execute(table.insert(), group)
+                        counts[table.name] += len(rows)
+                        renumbered += len(moved)
+                if counts[table.name] != manifest['tables'][table.name]['rows']:
+                    raise ValueError(f"Archiefbestand {d.archive_file}: aantal rijen in {table.name} klopt niet.")
+        d.archived_at, d.archive_file, d.archive_sha256 = None, None, None
+        d.restored_at = datetime.datetime.now()
+        counts['renumbered'] = renumbered
+        audit_log.record('dossiers.restore', 'dossiers', entity_id=dossier_id, dossier_id=dossier_id,
+                         new_value=counts)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_dossier_permissions(dossier_id=dossier_id)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return counts
+
+def archivable_dossier_ids(older_than_days=None, limit=None):
+    """
+    GEARCHIVEERD, nog niet in het archief en minstens ARCHIVE_AFTER_DAYS dagen dicht (closed_date,
+    anders start_date). Teruggezette dossiers blijven na restored_at dezelfde periode 'warm'.
+    """
+    days = app.config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    query = db.session.query(Dossier.id).filter(
+        Dossier.status == DossierStatus.GEARCHIVEERD,
+        Dossier.archived_at.is_(None),
+        func.coalesce(Dossier.closed_date, Dossier.start_date) <= cutoff,
+        or_(Dossier.restored_at.is_(None), Dossier.restored_at <= cutoff)
+    ).order_by(Dossier.id)
+    if limit:
+        query = query.limit(limit)
+    return [row.id for row in query]
+
+def archive_dossiers(older_than_days=None, limit=None, progress=None):
+    """Archiveert de kandidaten één voor één (elk een eigen, korte transactie)."""
+    ids = archivable_dossier_ids(older_than_days, limit)
+    totals = {'dossiers': 0, 'rows': 0, 'bytes': 0, 'failed': []}
+    for idx, dossier_id in enumerate(ids):
+        if progress:
+            progress(idx, len(ids))
         try:
-            seq = int(last.dossier_number.split("-")[-1]) + 1
-        except Exception:
-            seq = 1
-    return f"D-{today}-{seq:04d}"
+            counts = archive_dossier(dossier_id)
+        except ValueError:
+            totals['failed'].append(dossier_id)  # intussen teruggezet of door een ander proces gearchiveerd
+            continue
+        totals['dossiers'] += 1
+        totals['bytes'] += counts.pop('bytes')
+        totals['rows'] += sum(counts.values())
+    return totals
+
+@app.cli.command('archive-dossiers')
+@click.option('--days', type=int, default=None, help="Minimaal aantal dagen gesloten (default ARCHIVE_AFTER_DAYS).")
+@click.option('--limit', type=int, default=None)
+def archive_dossiers_command(days, limit):
+    """Verplaats gearchiveerde dossiers naar het koude archief."""
+    totals = archive_dossiers(days, limit)
+    print(f"{totals['dossiers']} dossiers gearchiveerd ({totals['rows']} rijen, {totals['bytes']} bytes).")
+
+@app.cli.command('restore-dossier')
+@click.argument('dossier_id', type=int)
+def restore_dossier_command(dossier_id):
+    """Zet een dossier uit het koude archief terug."""
+    counts = restore_dossier(dossier_id)
+    print(f"Dossier {dossier_id} teruggezet: {counts}")
+
+# -----------------------------------------------------------------------------
+# WERKPROGRAMMA: vragenlijst per control (2025_lijst tbv app_taken per control)
+# -----------------------------------------------------------------------------
+QUESTIONNAIRE_TARGETS = {
+    'control': DossierControl,
+    'client_control': DossierClientControl,
+}
+
+def questionnaire_template():
+    """De gecompileerde (gecachete, onveranderlijke) vragenlijst-template."""
+    return load_questionnaire(app.config['QUESTIONNAIRE_CSV'])
+
+try:
+    questionnaire_template()  # eenmalig compileren bij het opstarten van het proces
+except QuestionnaireUnavailable as e:
+    app.logger.error("%s; de vragenlijst-routes geven 503 tot het bestand er is (QUESTIONNAIRE_CSV).", e)
+
+@app.errorhandler(QuestionnaireUnavailable)
+def questionnaire_unavailable(e):
+    return jsonify({"error": "De vragenlijst is niet beschikbaar."}), 503
+
+def save_questionnaire_answers(dossier_id: int, target: str, items):
+    """
+    Slaat antwoorden voor veel controls tegelijk op, in één transactie.
+    items: [{"id": <DossierControl/DossierClientControl id>, "answers": {vraag_id: antwoord},
+             "replace": false}]; None als antwoord wist die vraag, replace vervangt de hele set.
+    Alles of niets: bij fouten wordt niets opgeslagen en komt per item de fout terug.
+    Geeft (aantal bijgewerkte controls, fouten) terug.
+    """
+    model = QUESTIONNAIRE_TARGETS.get(target)
+    if model is None:
+        return 0, [{"index": None, "errors": [f"Onbekend target: {target}"]}]
+    if not isinstance(items, list) or not items:
+        return 0, [{"index": None, "errors": ["items moet een niet-lege lijst zijn."]}]
+
+    template = questionnaire_template()
+    errors = []
+    ids = []
+    for idx, item in enumerate(items):
+        item_errors = []
+        row_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(row_id, int):
+            item_errors.append("id (numeriek) is verplicht.")
+        else:
+            item_errors += validate_answers(template, item.get('answers'))
+            ids.append(row_id)
+        if item_errors:
+            errors.append({"index": idx, "id": row_id, "errors": item_errors})
+
+    # Eén query: bestaande antwoorden van precies deze controls binnen dit dossier
+    existing = dict(db.session.query(model.id, model.answers).filter(
+        model.dossier_id == dossier_id, model.id.in_(ids)
+    ).all()) if ids else {}
+    for idx, item in enumerate(items):
+        if isinstance(item, dict) and isinstance(item.get('id'), int) and item['id'] not in existing:
+            errors.append({"index": idx, "id": item['id'], "errors": ["Control hoort niet bij dit dossier."]})
+    if errors:
+        return 0, sorted(errors, key=lambda e: e["index"])
+
+    updates = {}
+    for item in items:
+        base = {} if item.get('replace') else dict(updates.get(item['id']) or existing[item['id']] or {})
+        for qid, value in item['answers'].items():
+            if value is None:
+                base.pop(qid, None)
+            else:
+                base[qid] = value
+        updates[item['id']] = base
+    try:
+        db.session.execute(
+            model.__table__.update().where(model.__table__.c.id == bindparam('row_id')),
+            [{"row_id": row_id, "answers": answers or None} for row_id, answers in updates.items()]
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(updates), []
+
+# -----------------------------------------------------------------------------
+# AUDIT: append-only eventlog (vastleggen in audit.py, hier opvragen)
+# -----------------------------------------------------------------------------
+AUDIT_PAGE_SIZE = 100
+AUDIT_PAGE_SIZE_MAX = 1000
+
+def ensure_audit_append_only():
+    """
+    Triggers die UPDATE/DELETE op audit_events weigeren (SQLite en PostgreSQL). Andere databases:
+    foutmelding in de log; regel het dan met rechten (alleen INSERT/SELECT voor de app-gebruiker).
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        for op in ('UPDATE', 'DELETE'):
+            db.session.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS audit_events_no_{op.lower()} BEFORE {op} ON audit_events "
+                f"BEGIN SELECT RAISE(ABORT, 'audit_events is append-only'); END"
+            ))
+    elif dialect == 'postgresql':
+        _pg_trigger('audit_events_append_only', 'audit_events', 'BEFORE UPDATE OR DELETE',
+                    "RAISE EXCEPTION 'audit_events is append-only';")
+    else:
+        app.logger.error("audit_events: geen append-only-triggers voor %s; beperk de rechten van de "
+                         "app-gebruiker tot INSERT en SELECT.", dialect)
+        return False
+    db.session.commit()
+    return True
+
+def _audit_time(value: str, name: str):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} moet een ISO-datum/tijd zijn, bijv. 2025-01-31T12:00.")
+
+def audit_page(conditions, args):
+    """
+    Eén pagina (keyset op (occurred_at, id), nieuwste eerst) van audit_events.
+    conditions: vaste filters (dossier/gebruiker); args: from, to, action (prefix), limit, cursor.
+    Met de samengestelde indexen (<filter>, occurred_at, id) kost elke pagina hetzelfde,
+    ook bij miljoenen events. Gooit ValueError bij ongeldige parameters.
+    """
+    try:
+        limit = min(max(int(args.get('limit') or AUDIT_PAGE_SIZE), 1), AUDIT_PAGE_SIZE_MAX)
+    except ValueError:
+        raise ValueError("limit moet numeriek zijn.")
+    audit_log.flush()  # events uit de buffer eerst wegschrijven (read-your-writes)
+    q = AuditEvent.query.filter(*conditions)
+    if args.get('from'):
+        q = q.filter(AuditEvent.occurred_at >= _audit_time(args['from'], 'from'))
+    if args.get('to'):
+        q = q.filter(AuditEvent.occurred_at < _audit_time(args['to'], 'to'))
+    action = (args.get('action') or '').strip()
+    if action:
+        q = q.filter(_prefix_range(AuditEvent.action, action))
+    cursor = args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if not values or len(values) != 2:
+            raise ValueError("Ongeldige cursor.")
+        at = _audit_time(values[0], 'cursor')
+        q = q.filter(or_(AuditEvent.occurred_at < at,
+                         and_(AuditEvent.occurred_at == at, AuditEvent.id < values[1])))
+    rows = q.order_by(AuditEvent.occurred_at.desc(), AuditEvent.id.desc()).limit(limit + 1).all()
+    items, has_more = rows[:limit], len(rows) > limit
+    next_cursor = encode_cursor([items[-1].occurred_at.isoformat(), items[-1].id]) if has_more else None
+    return [model_to_record(e) for e in items], next_cursor
+
+def _audit_response(conditions):
+    try:
+        items, next_cursor = audit_page(conditions, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"items": items, "next_cursor": next_cursor}), 200
+
+def _audit_metrics():
+    st = audit_log.stats()
+    return ["# TYPE toverstaf_audit_buffered gauge", f"toverstaf_audit_buffered {st['buffered']}",
+            "# TYPE toverstaf_audit_written_total counter", f"toverstaf_audit_written_total {st['written']}"]
+
+request_metrics.register_collector(_audit_metrics)
+
+# -----------------------------------------------------------------------------
+# JOBS: zware operaties buiten de request-worker (zie jobs.py)
+# -----------------------------------------------------------------------------
+def job_scope_dossier(ctx, dossier_id, framework, filters=None, include_client_controls=True):
+    ctx.progress(0, 1, f"Scoping {framework}")
+    result = scope_dossier(dossier_id, framework, filters, include_client_controls=include_client_controls)
+    ctx.progress(1, 1)
+    return result
+
+def job_import_frameworks(ctx, frameworks=('SOC2', 'ISO27001')):
+    import importer  # importeert zelf 'app'; daarom pas hier
+    paths = {'SOC2': importer.SOC2_CSV, 'ISO27001': importer.ISO27001_CSV}
+    result = {}
+    for idx, framework in enumerate(frameworks):
+        if framework not in paths:
+            raise ValueError(f"Onbekend framework: {framework}")
+        ctx.progress(idx, len(frameworks), f"Import {framework}")
+        result[framework] = importer.import_framework(
+            os.path.join(app.root_path, paths[framework]), framework,
+            progress=lambda counts, fw=framework: ctx.progress(
+                idx, len(frameworks), f"Import {fw}: {sum(counts.values())} rijen")
+        )
+    ctx.progress(len(frameworks), len(frameworks), "Mapping-index bijwerken")
+    refresh_control_mapping()
+    return result
+
+def job_export_dossier(ctx, dossier_id, include_documents=True):
+    d = db.session.get(Dossier, dossier_id)
+    if d is None:
+        raise ValueError("Dossier niet gevonden.")
+    os.makedirs(app.config['JOB_EXPORT_PATH'], exist_ok=True)
+    path = os.path.join(app.config['JOB_EXPORT_PATH'], f"job-{ctx.job_id}.zip")
+    size = 0
+    try:
+        with open(path, 'wb') as f:
+            for chunk in generate_dossier_zip(d, include_documents=include_documents):
+                f.write(chunk)
+                size += len(chunk)
+                ctx.progress(size, message="bytes geschreven")
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return {"file": os.path.basename(path), "size": size, "dossier_number": d.dossier_number}
+
+def job_bulk_acl(ctx, users, dossiers, permissions, mode='add'):
+    ctx.progress(0, 1, f"ACL {mode}: {len(users or [])} gebruikers x {len(dossiers or [])} dossiers")
+    result = bulk_update_acl(ctx.user_id, users, dossiers, permissions, mode=mode)
+    ctx.progress(1, 1)
+    return result
+
+def job_archive_dossiers(ctx, older_than_days=None, limit=None):
+    return archive_dossiers(older_than_days, limit,
+                            progress=lambda done, total: ctx.progress(done, total, "Dossiers archiveren"))
+
+for _job_type, _handler in (('scope_dossier', job_scope_dossier),
+                            ('import_frameworks', job_import_frameworks),
+                            ('export_dossier', job_export_dossier),
+                            ('bulk_acl', job_bulk_acl),
+                            ('archive_dossiers', job_archive_dossiers)):
+    job_runner.register(_job_type, _handler, limit=app.config['JOB_LIMITS'].get(_job_type, 1))
+
+@app.cli.command('run-jobs')
+def run_jobs_command():
+    """Voer achtergrondjobs uit in dit proces (aparte worker; zet dan JOB_AUTOSTART=False op de webservers)."""
+    print(f"Job-worker {job_runner.worker_id} gestart ({', '.join(job_runner.job_types)}).")
+    job_runner.run_forever()
+
+def authorize_job(job_type: str, user_id: int, params: dict):
+    """
+    Geeft een foutmelding terug als de gebruiker dit job-type (met deze params) niet mag starten;
+    ValueError bij ongeldige params.
+    """
+    if job_type == 'import_frameworks':
+        return None if session.get('user_role') == UserRole.BEHEERDER.value else "Alleen beheerders mogen importeren."
+    if job_type == 'archive_dossiers':
+        return None if session.get('user_role') == UserRole.BEHEERDER.value else "Alleen beheerders mogen archiveren."
+    if job_type == 'bulk_acl':
+        dossier_ids = _id_list(params.get('dossiers'), 'dossiers')
+        managed = {d_id for (d_id,) in dossiers_with_permission_query(user_id, 'MANAGE')
+                   .filter(Dossier.id.in_(dossier_ids)).with_entities(Dossier.id)}
+        return None if set(dossier_ids) <= managed else "Toegang geweigerd (ACL)"
+    needed = {'scope_dossier': 'EDIT', 'export_dossier': 'MANAGE'}.get(job_type)
+    if needed is None:
+        return f"Onbekend job-type: {job_type}"
+    dossier_id = params.get('dossier_id')
+    if not isinstance(dossier_id, int) or not has_dossier_permission(user_id, dossier_id, needed):
+        return "Toegang geweigerd (ACL)"
+    return None
+
+def job_to_dict(job: Job):
+    record = model_to_record(job)
+    live = job_runner.live(job.id)
+    if live:
+        record.update(live)
+    return record
+
+def get_visible_job_or_404(job_id: int) -> Job:
+    job = db.session.get(Job, job_id)
+    if job is None or (job.created_by != session.get('user_id')
+                       and session.get('user_role') != UserRole.BEHEERDER.value):
+        abort(404)
+    return job
 
 # -----------------------------------------------------------------------------
 # ROUTES - AUTH / BASIS
@@ -153,10 +2055,23 @@ def index():
 def login():
     data = request.json or request.form
     email = data.get('email')
-    password = data.get('password')
-    user = User.query.filter_by(email=email).first()
+    password = data.get('password') or ''
+    user = find_user_by_email(email)
+
+    try:
+        valid = bool(user and user.is_approved and password_hasher.verify(password, user.password_hash))
+    except HasherBusy:
+        return _hasher_busy_response()
 
-    if user and user.is_approved and checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
+    if valid and password_hasher.needs_rehash(user.password_hash):
+        # work factor gewijzigd: transparant herhashen met het bekende wachtwoord
+        try:
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
+        except HasherBusy:
+            pass  # volgende login opnieuw proberen
+
+    if valid:
         session['user_id'] = user.id
         session['user_role'] = user.role.value  # 'beheerder', 'teamlid', ...
         if request.accept_mimetypes.accept_html:
@@ -180,10 +2095,14 @@ def aanvraag():
     if not name or not email or not password:
         return jsonify({"error": "Alle velden zijn verplicht."}), 400
 
-    if User.query.filter_by(email=email).first():
+    email = normalize_email(email)
+    if find_user_by_email(email):
         return jsonify({"error": "E-mailadres is al in gebruik."}), 409
 
-    hashed_password = hashpw(password.encode('utf-8'), gensalt()).decode('utf-8')
+    try:
+        hashed_password = password_hasher.hash(password)
+    except HasherBusy:
+        return _hasher_busy_response()
     new_user = User(
         name=name,
         email=email,
@@ -200,18 +2119,61 @@ def aanvraag():
 def dashboard():
     return render_template('dashboard.html')
 
+@app.route('/dashboard/progress.json')
+@login_required
+@read_replica.read_only
+def dashboard_progress_json():
+    """
+    Voorberekende voortgang van de zichtbare dossiers, per pagina (zelfde filters/cursor als
+    /dossiers.json): twee queries per pagina, geen GROUP BY over dossier_controls.
+    """
+    try:
+        items, next_cursor = dossier_page(session['user_id'], request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    ids = [d.id for d in items]
+    progress = {p.dossier_id: p for p in DossierProgress.query.filter(DossierProgress.dossier_id.in_(ids))} \
+        if ids else {}
+    return jsonify({
+        "items": [dict(dossier_to_dict(d), progress=progress_to_dict(progress[d.id]) if d.id in progress else None)
+                  for d in items],
+        "next_cursor": next_cursor
+    }), 200
+
 @app.route('/teamledenbeheer')
 @login_required
 @role_required(['beheerder'])
 def teamledenbeheer():
-    approved_users = User.query.filter_by(is_approved=True).all()
-    pending_users = User.query.filter_by(is_approved=False).all()
+    # Alleen de eerste pagina per lijst; verder bladeren/zoeken via /users.json
+    approved_users, approved_cursor = user_page({'approved': 'true'})
+    pending_users, pending_cursor = user_page({'approved': 'false'})
     return render_template(
         'teamledenbeheer.html',
         approved_users=[user_to_dict(u) for u in approved_users],
-        pending_users=[user_to_dict(u) for u in pending_users]
+        pending_users=[user_to_dict(u) for u in pending_users],
+        approved_next_cursor=approved_cursor,
+        pending_next_cursor=pending_cursor,
+        counts=user_counts()
     )
 
+@app.route('/users.json')
+@login_required
+@role_required(['beheerder'])
+@read_replica.read_only
+def users_json():
+    """
+    Gebruikersbeheer: ?q=<prefix naam/e-mail>&role=teamlid&approved=false&order=name&limit=50&cursor=...
+    De eerste pagina (zonder cursor) bevat ook de aantallen per rol/status.
+    """
+    try:
+        items, next_cursor = user_page(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result = {"items": [user_to_dict(u) for u in items], "next_cursor": next_cursor}
+    if not request.args.get('cursor'):
+        result["counts"] = user_counts(request.args.get('q') or '')
+    return jsonify(result), 200
+
 @app.route('/approve_user/<int:user_id>', methods=['POST'])
 @login_required
 @role_required(['beheerder'])
@@ -233,6 +2195,7 @@ def deactivate_user(user_id):
         user.is_approved = False
         user.role = UserRole.PENDING
         db.session.commit()
+        invalidate_dossier_permissions(user_id=user.id)
         return jsonify({"message": f"Gebruiker {user.name} is gedeactiveerd."}), 200
     return jsonify({"error": "Gebruiker niet gevonden."}), 404
 
@@ -266,20 +2229,35 @@ def logout():
 # -----------------------------------------------------------------------------
 @app.route('/dossiers')
 @login_required
+@read_replica.read_only
 def dossiers():
-    """Toont alleen dossiers waarop de huidige gebruiker VIEW-rechten heeft."""
-    uid = session['user_id']
-    # Join via ACL: alle dossiers waar user VIEW in permissions heeft
-    # (SQLite-CSV check: eenvoudige LIKE; voor robuuster gedrag kun je perms parsen in Python)
-    acl_rows = DossierACL.query.filter_by(user_id=uid).all()
-    allowed_ids = []
-    for r in acl_rows:
-        perms = _parse_perms(r.permissions)
-        if 'VIEW' in perms:
-            allowed_ids.append(r.dossier_id)
-    items = Dossier.query.filter(Dossier.id.in_(allowed_ids)).order_by(Dossier.id.desc()).all() if allowed_ids else []
+    """Toont (per pagina) alleen dossiers waarop de huidige gebruiker VIEW-rechten heeft."""
+    try:
+        items, next_cursor = dossier_page(session['user_id'], request.args)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for('dossiers'))
     # Toon een formulier om een nieuw dossier te starten (alleen TP/Dossiermanager)
-    return render_template('dossiers.html', dossiers=items)
+    return render_template(
+        'dossiers.html',
+        dossiers=items,
+        next_cursor=next_cursor,
+        filters=request.args.to_dict()
+    )
+
+@app.route('/dossiers.json')
+@login_required
+@read_replica.read_only
+def dossiers_json():
+    """JSON-tegenhanger van /dossiers met dezelfde filters en cursor-paginatie."""
+    try:
+        items, next_cursor = dossier_page(session['user_id'], request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "items": [dossier_to_dict(d) for d in items],
+        "next_cursor": next_cursor
+    }), 200
 
 @app.route('/dossiers/create', methods=['POST'])
 @login_required
@@ -295,15 +2273,20 @@ def dossiers_create():
         flash("Titel is verplicht.", "error")
         return redirect(url_for('dossiers'))
 
-    d = Dossier(
-        dossier_number=_next_dossier_number(),
-        title=title,
-        status=UserRole.TEAMLID and DossierStatus.NIEUW,  # gewoon standaard NIEUW
-        client_id=int(client_id) if client_id else None,
-        created_by_user_id=session['user_id']
-    )
-    db.session.add(d)
-    db.session.commit()
+    try:
+        # nummer reserveren en dossier invoegen in één transactie
+        d = Dossier(
+            dossier_number=_next_dossier_number(),
+            title=title,
+            status=DossierStatus.NIEUW,
+            client_id=int(client_id) if client_id else None,
+            created_by_user_id=session['user_id']
+        )
+        db.session.add(d)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
 
     # Default ACL voor maker
     grant_default_acl_for_creator(d.id, session['user_id'], session['user_role'])
@@ -311,6 +2294,63 @@ def dossiers_create():
     flash("Dossier aangemaakt.", "success")
     return redirect(url_for('dossier_detail', dossier_id=d.id))
 
+@app.route('/dossiers/<int:dossier_id>/roll_forward', methods=['POST'])
+@login_required
+@require_dossier_permission('MANAGE')
+def dossier_roll_forward(dossier_id):
+    """Nieuw dossier (volgend jaar) op basis van dit dossier: controls, client-antwoorden en ACL."""
+    if session.get('user_role') not in ('tekenend_professional', 'dossiermanager'):
+        if request.accept_mimetypes.accept_html:
+            flash("Alleen tekenend professional of dossiermanager mag een dossier starten.", "error")
+            return redirect(url_for('dossier_detail', dossier_id=dossier_id))
+        return jsonify({"error": "Alleen tekenend professional of dossiermanager mag een dossier starten."}), 403
+    data = request.get_json(silent=True) or request.form
+    try:
+        d, counts = roll_forward_dossier(dossier_id, session['user_id'], title=data.get('title'))
+    except ValueError as e:
+        if request.accept_mimetypes.accept_html:
+            flash(str(e), "error")
+            return redirect(url_for('dossiers'))
+        return jsonify({"error": str(e)}), 404
+    if request.accept_mimetypes.accept_html:
+        flash(f"Dossier {d.dossier_number} aangemaakt ({counts['dossier_controls']} controls).", "success")
+        return redirect(url_for('dossier_detail', dossier_id=d.id))
+    return jsonify({"dossier": dossier_to_dict(d), "copied": counts}), 201
+
+@app.route('/dossiers/<int:dossier_id>/archive', methods=['POST'])
+@login_required
+@require_dossier_permission('MANAGE')
+def dossier_archive(dossier_id):
+    """Gearchiveerd dossier direct naar het koude archief (anders doet archive_dossiers dat later)."""
+    try:
+        counts = archive_dossier(dossier_id)
+    except ValueError as e:
+        if request.accept_mimetypes.accept_html:
+            flash(str(e), "error")
+            return redirect(url_for('dossier_detail', dossier_id=dossier_id))
+        return jsonify({"error": str(e)}), 409
+    if request.accept_mimetypes.accept_html:
+        flash("Dossier naar het archief verplaatst.", "success")
+        return redirect(url_for('dossiers'))
+    return jsonify({"dossier": dossier_to_dict(db.session.get(Dossier, dossier_id)), "archived": counts}), 200
+
+@app.route('/dossiers/<int:dossier_id>/restore', methods=['POST'])
+@login_required
+@require_dossier_permission('MANAGE')
+def dossier_restore(dossier_id):
+    """Dossier uit het koude archief terugzetten; de ACL is bij de stub gebleven."""
+    try:
+        counts = restore_dossier(dossier_id)
+    except ValueError as e:
+        if request.accept_mimetypes.accept_html:
+            flash(str(e), "error")
+            return redirect(url_for('dossier_detail', dossier_id=dossier_id))
+        return jsonify({"error": str(e)}), 409
+    if request.accept_mimetypes.accept_html:
+        flash("Dossier teruggezet uit het archief.", "success")
+        return redirect(url_for('dossier_detail', dossier_id=dossier_id))
+    return jsonify({"dossier": dossier_to_dict(db.session.get(Dossier, dossier_id)), "restored": counts}), 200
+
 @app.route('/dossiers/<int:dossier_id>')
 @login_required
 @require_dossier_permission('VIEW')
@@ -337,7 +2377,7 @@ def dossier_acl_update(dossier_id):
 
     # Lees aangevinkte permissies (checkboxen)
     perms = request.form.getlist('perms')
-    perms_csv = ",".join(sorted(set(perms)))
+    mask = perms_to_mask(perms)
 
     try:
         user_id_int = int(user_id)
@@ -347,20 +2387,312 @@ def dossier_acl_update(dossier_id):
 
     row = DossierACL.query.filter_by(dossier_id=dossier_id, user_id=user_id_int).first()
     if row:
-        row.permissions = perms_csv
+        row.perm_mask = mask
         row.granted_by_user_id = session['user_id']
         row.granted_at = datetime.datetime.utcnow()
     else:
         db.session.add(DossierACL(
             dossier_id=dossier_id,
             user_id=user_id_int,
-            permissions=perms_csv,
+            perm_mask=mask,
             granted_by_user_id=session['user_id']
         ))
     db.session.commit()
+    invalidate_dossier_permissions(user_id_int, dossier_id)
     flash("ACL bijgewerkt.", "success")
     return redirect(url_for('dossier_detail', dossier_id=dossier_id))
 
+@app.route('/dossiers/acl/bulk', methods=['POST'])
+@login_required
+def dossiers_acl_bulk():
+    """
+    {"users": [..], "dossiers": [..], "permissions": ["VIEW", "EDIT"], "mode": "add|remove|replace",
+     "dry_run": false, "async": false} -> diff per gewijzigd paar. Vereist MANAGE op alle dossiers.
+    Met async: 202 met een bulk_acl-job, het resultaat (de diff) via /jobs/<id>.
+    """
+    data = request.get_json(silent=True) or {}
+    if data.get('async') and not data.get('dry_run'):
+        params = {k: data.get(k) for k in ('users', 'dossiers', 'permissions')}
+        params['mode'] = data.get('mode', 'add')
+        try:
+            error = authorize_job('bulk_acl', session['user_id'], params)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if error:
+            return jsonify({"error": error}), 403
+        job = job_runner.submit('bulk_acl', params, created_by=session['user_id'])
+        return jsonify(job_to_dict(job)), 202
+    try:
+        result = bulk_update_acl(session['user_id'], data.get('users'), data.get('dossiers'),
+                                 data.get('permissions'), mode=data.get('mode', 'add'),
+                                 dry_run=bool(data.get('dry_run')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    return jsonify(result), 200
+
+@app.route('/dossiers/<int:dossier_id>/scope', methods=['POST'])
+@login_required
+@require_dossier_permission('EDIT')
+def dossier_scope(dossier_id):
+    """Scope een dossier tegen een framework (SOC2/ISO27001), optioneel gefilterd."""
+    Dossier.query.get_or_404(dossier_id)
+    data = request.get_json(silent=True) or request.form
+    framework = data.get('framework')
+    filters = {}
+    for key in SCOPE_FILTERS:
+        value = data.getlist(key) if hasattr(data, 'getlist') else data.get(key)
+        if value:
+            filters[key] = value
+    include = data.get('include_client_controls', True)
+    if isinstance(include, str):
+        include = include.lower() not in ('0', 'false', 'nee', 'off')
+    if str(data.get('async', '')).lower() in ('1', 'true', 'ja', 'on'):
+        # als achtergrondjob: direct 202 met de job, voortgang via /jobs/<id>
+        if framework not in FRAMEWORKS:
+            return jsonify({"error": f"Onbekend framework: {framework}"}), 400
+        job = job_runner.submit('scope_dossier', {
+            "dossier_id": dossier_id, "framework": framework, "filters": filters,
+            "include_client_controls": bool(include)
+        }, created_by=session['user_id'], dossier_id=dossier_id)
+        if request.accept_mimetypes.accept_html:
+            flash("Scoping is gestart op de achtergrond.", "success")
+            return redirect(url_for('dossier_detail', dossier_id=dossier_id))
+        return jsonify(job_to_dict(job)), 202
+    try:
+        result = scope_dossier(dossier_id, framework, filters, include_client_controls=include)
+    except ValueError as e:
+        if request.accept_mimetypes.accept_html:
+            flash(str(e), "error")
+            return redirect(url_for('dossier_detail', dossier_id=dossier_id))
+        return jsonify({"error": str(e)}), 400
+    if request.accept_mimetypes.accept_html:
+        flash(f"{result['dossier_controls']} controls toegevoegd aan het dossier.", "success")
+        return redirect(url_for('dossier_detail', dossier_id=dossier_id))
+    return jsonify(result), 200
+
+# --- Documenten (content-addressed, gestreamd) ---
+@app.route('/dossiers/<int:dossier_id>/documents', methods=['POST'])
+@login_required
+@require_dossier_permission('EDIT')
+def dossier_document_upload(dossier_id):
+    """
+    Upload een document. Twee vormen:
+      - multipart/form-data met veld 'file' (browserformulier);
+      - ruwe body (application/octet-stream) met ?filename=..., wordt direct gestreamd.
+    De inhoud wordt op SHA-256 gededupliceerd.
+    """
+    Dossier.query.get_or_404(dossier_id)
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({"error": "Bestand is verplicht."}), 400
+        filename, stream, content_type = upload.filename, upload.stream, upload.mimetype
+    else:
+        filename = request.args.get('filename') or request.headers.get('X-Filename')
+        if not filename:
+            return jsonify({"error": "filename is verplicht."}), 400
+        stream, content_type = request.stream, request.mimetype
+    filename = os.path.basename(filename.replace('\\', '/')).strip()
+    if not filename:
+        return jsonify({"error": "Ongeldige bestandsnaam."}), 400
+
+    try:
+        sha256, size, deduplicated = document_store.save_stream(stream)
+    except DocumentTooLarge:
+        return jsonify({"error": "Bestand is te groot."}), 413
+
+    doc = DossierDocument(
+        dossier_id=dossier_id,
+        uploaded_by_user_id=session['user_id'],
+        filename=filename,
+        file_path=document_store.relative_path(sha256),
+        sha256=sha256,
+        size=size,
+        content_type=content_type or 'application/octet-stream'
+    )
+    db.session.add(doc)
+    db.session.commit()
+    if request.accept_mimetypes.accept_html and request.mimetype == 'multipart/form-data':
+        flash("Document geüpload.", "success")
+        return redirect(url_for('dossier_detail', dossier_id=dossier_id))
+    return jsonify(dict(document_to_dict(doc), deduplicated=deduplicated)), 201
+
+@app.route('/dossiers/<int:dossier_id>/documents.json')
+@login_required
+@require_dossier_permission('VIEW')
+@read_replica.read_only
+def dossier_documents_json(dossier_id):
+    docs = DossierDocument.query.filter_by(dossier_id=dossier_id) \
+                                .order_by(DossierDocument.id.desc()).all()
+    return jsonify([document_to_dict(d) for d in docs]), 200
+
+@app.route('/dossiers/<int:dossier_id>/documents/<int:document_id>')
+@login_required
+@require_dossier_permission('VIEW')
+def dossier_document_download(dossier_id, document_id):
+    """Download via send_file: sendfile/X-Sendfile, ETag (= sha256) en HTTP Range-ondersteuning."""
+    doc = DossierDocument.query.filter_by(id=document_id, dossier_id=dossier_id).first_or_404()
+    path = os.path.join(document_store.root, doc.file_path)
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(
+        path,
+        mimetype=doc.content_type or 'application/octet-stream',
+        as_attachment=True,
+        download_name=doc.filename,
+        conditional=True,
+        etag=doc.sha256 or True,
+        max_age=0
+    )
+
+# --- Change feed (polling met cursor of Server-Sent Events) ---
+def _feed_since(value):
+    try:
+        return max(int(value or 0), 0)
+    except ValueError:
+        return None
+
+@app.route('/dossiers/<int:dossier_id>/changes.json')
+@login_required
+@require_dossier_permission('VIEW')
+def dossier_changes_json(dossier_id):
+    """
+    ?since=<cursor>: alleen wat er sinds de vorige cursor is gewijzigd. Zonder since of met
+    since=0: alleen de huidige cursor met reset=True (eerst dossier_detail laden).
+    """
+    since = _feed_since(request.args.get('since', '0'))
+    if since is None:
+        return jsonify({"error": "since moet een numerieke cursor zijn."}), 400
+    return jsonify(dossier_changes_since(dossier_id, since)), 200
+
+@app.route('/dossiers/<int:dossier_id>/changes/stream')
+@login_required
+@require_dossier_permission('VIEW')
+def dossier_changes_stream(dossier_id):
+    """
+    Server-Sent Events: een 'changes'-event per delta (id = cursor). Bezet een worker-thread
+    zolang de stream openstaat; na FEED_SSE_MAX_SECONDS sluit de server en herverbindt de
+    browser automatisch met Last-Event-ID. Zonder Last-Event-ID/since begint de stream met een
+    reset-event (cursor = nieuwste wijziging), net als changes.json.
+    """
+    since = _feed_since(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    if since is None:
+        return jsonify({"error": "since moet een numerieke cursor zijn."}), 400
+    max_seconds = app.config['FEED_SSE_MAX_SECONDS']
+    keepalive = app.config['FEED_SSE_KEEPALIVE']
+
+    def generate(cursor):
+        q = change_broker.subscribe(dossier_id)
+        deadline = time.monotonic() + max_seconds
+        first = True
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                delta = dossier_changes_since(dossier_id, cursor)
+                db.session.remove()  # geen verbinding vasthouden tussen de events
+                if delta["changes"] or delta["reset"] or first:
+                    first = False
+                    cursor = delta["cursor"]
+                    yield f"id: {cursor}\nevent: changes\ndata: {json.dumps(delta, default=str)}\n\n"
+                if delta["has_more"]:
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    q.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            change_broker.unsubscribe(dossier_id, q)
+
+    resp = Response(stream_with_context(generate(since)), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'  # nginx: niet bufferen
+    return resp
+
+# --- Export (dossierreview / archivering) ---
+@app.route('/dossiers/<int:dossier_id>/export')
+@login_required
+@require_dossier_permission('MANAGE')
+def dossier_export(dossier_id):
+    """
+    Gestreamde export van het hele dossier.
+    ?format=zip (default): ZIP met NDJSON per onderdeel + documenten (?documents=0 om die over te slaan)
+    ?format=ndjson: één NDJSON-stroom met {"type": ..., "data": ...} per regel, zonder blobs.
+    """
+    d = Dossier.query.get_or_404(dossier_id)
+    fmt = request.args.get('format', 'zip')
+    safe_number = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in d.dossier_number)
+    if fmt == 'ndjson':
+        body = generate_dossier_ndjson(d)
+        mimetype, filename = 'application/x-ndjson', f"{safe_number}.ndjson"
+    elif fmt == 'zip':
+        include_documents = request.args.get('documents', '1') not in ('0', 'false')
+        body = generate_dossier_zip(d, include_documents=include_documents)
+        mimetype, filename = 'application/zip', f"{safe_number}.zip"
+    else:
+        return jsonify({"error": "format moet 'zip' of 'ndjson' zijn."}), 400
+    resp = Response(stream_with_context(body), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
+
+# --- Client-responses in bulk (JSON of CSV) ---
+@app.route('/dossiers/<int:dossier_id>/client_controls/bulk', methods=['POST'])
+@login_required
+@require_dossier_permission('EDIT')
+def dossier_client_controls_bulk(dossier_id):
+    """Bulk upsert van client_response/client_comment, gesleuteld op control-ID (sub / beheersmaatregel_id)."""
+    Dossier.query.get_or_404(dossier_id)
+    try:
+        rows, fields = parse_client_response_payload(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result, errors = bulk_upsert_client_responses(dossier_id, rows, fields)
+    if errors:
+        return jsonify({"error": "Validatie mislukt, niets opgeslagen.", "rows": errors}), 400
+    return jsonify(result), 200
+
+# --- Werkprogramma (vragenlijst per control) ---
+@app.route('/questionnaire/template.json')
+@login_required
+def questionnaire_template_json():
+    template = questionnaire_template()
+    if request.if_none_match.contains(template.version):
+        return Response(status=304)
+    resp = jsonify(template.to_dict())
+    resp.set_etag(template.version)
+    return resp
+
+@app.route('/dossiers/<int:dossier_id>/questionnaire.json')
+@login_required
+@require_dossier_permission('VIEW')
+def dossier_questionnaire_json(dossier_id):
+    """Alle ingevulde antwoorden van het dossier: ?target=control|client_control"""
+    model = QUESTIONNAIRE_TARGETS.get(request.args.get('target', 'control'))
+    if model is None:
+        return jsonify({"error": "target moet 'control' of 'client_control' zijn."}), 400
+    rows = db.session.query(model.id, model.master_control_id, model.answers).filter(
+        model.dossier_id == dossier_id, model.answers.isnot(None)
+    ).order_by(model.id).all()
+    return jsonify({
+        "template_version": questionnaire_template().version,
+        "items": [{"id": r.id, "master_control_id": r.master_control_id, "answers": r.answers} for r in rows]
+    }), 200
+
+@app.route('/dossiers/<int:dossier_id>/questionnaire', methods=['POST'])
+@login_required
+@require_dossier_permission('EDIT')
+def dossier_questionnaire_save(dossier_id):
+    """Bulk-opslag: {"target": "control", "items": [{"id": .., "answers": {..}, "replace": false}]}"""
+    data = request.get_json(silent=True) or {}
+    updated, errors = save_questionnaire_answers(dossier_id, data.get('target', 'control'), data.get('items'))
+    if errors:
+        return jsonify({"error": "Validatie mislukt, niets opgeslagen.", "items": errors}), 400
+    return jsonify({"updated": updated}), 200
+
 # (optioneel) JSON endpoints voor tooling of testen
 @app.route('/dossiers/<int:dossier_id>/acl.json')
 @login_required
@@ -369,14 +2701,279 @@ def dossier_acl_json(dossier_id):
     rows = DossierACL.query.filter_by(dossier_id=dossier_id).all()
     data = [{
         "user_id": r.user_id,
-        "permissions": _parse_perms(r.permissions),
+        "permissions": mask_to_perms(r.perm_mask),
         "granted_by": r.granted_by_user_id,
         "granted_at": r.granted_at.strftime('%Y-%m-%d %H:%M:%S') if r.granted_at else None
     } for r in rows]
     return jsonify(data), 200
 
+# -----------------------------------------------------------------------------
+# ROUTES - AUDIT
+# -----------------------------------------------------------------------------
+@app.route('/dossiers/<int:dossier_id>/audit.json')
+@login_required
+@require_dossier_permission('MANAGE')
+def dossier_audit_json(dossier_id):
+    """Audittrail van een dossier (ACL, control-status/review, dossierstatus); ?from=&to=&action=&cursor="""
+    return _audit_response([AuditEvent.dossier_id == dossier_id])
+
+@app.route('/audit/users/<int:user_id>.json')
+@login_required
+@role_required(['beheerder'])
+def user_audit_json(user_id):
+    """?as=actor (default: wijzigingen dóór deze gebruiker) of ?as=subject (wijzigingen over deze gebruiker)."""
+    role = request.args.get('as', 'actor')
+    if role not in ('actor', 'subject'):
+        return jsonify({"error": "as moet 'actor' of 'subject' zijn."}), 400
+    column = AuditEvent.actor_id if role == 'actor' else AuditEvent.subject_user_id
+    return _audit_response([column == user_id])
+
+@app.route('/audit.json')
+@login_required
+@role_required(['beheerder'])
+def audit_json():
+    """Alle events in een tijdvak: ?from=2025-01-01&to=2025-02-01&action=users."""
+    return _audit_response([])
+
+# -----------------------------------------------------------------------------
+# ROUTES - JOBS
+# -----------------------------------------------------------------------------
+@app.route('/jobs', methods=['POST'])
+@login_required
+def job_submit():
+    """{"type": "scope_dossier" | "import_frameworks" | "export_dossier" | "bulk_acl" | ..., "params": {...}} -> 202"""
+    data = request.get_json(silent=True) or {}
+    job_type, params = data.get('type'), data.get('params') or {}
+    if job_type not in job_runner.job_types:
+        return jsonify({"error": f"type moet een van {job_runner.job_types} zijn."}), 400
+    if not isinstance(params, dict):
+        return jsonify({"error": "params moet een object zijn."}), 400
+    try:
+        job_runner.check_params(job_type, params)
+        error = authorize_job(job_type, session['user_id'], params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if error:
+        return jsonify({"error": error}), 403
+    job = job_runner.submit(job_type, params, created_by=session['user_id'], dossier_id=params.get('dossier_id'))
+    resp = jsonify(job_to_dict(job))
+    resp.status_code = 202
+    resp.headers['Location'] = url_for('job_status', job_id=job.id)
+    return resp
+
+@app.route('/jobs.json')
+@login_required
+def jobs_json():
+    """Eigen jobs, nieuwste eerst (?status=running, ?limit=50)."""
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    query = Job.query.filter(Job.created_by == session['user_id'])
+    status = request.args.get('status')
+    if status:
+        try:
+            query = query.filter(Job.status == JobStatus(status))
+        except ValueError:
+            return jsonify({"error": f"Onbekende status: {status}"}), 400
+    return jsonify({"items": [job_to_dict(j) for j in query.order_by(Job.id.desc()).limit(limit)]}), 200
+
+@app.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    return jsonify(job_to_dict(get_visible_job_or_404(job_id))), 200
+
+@app.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+def job_cancel(job_id):
+    job = get_visible_job_or_404(job_id)
+    if not job_runner.cancel(job):
+        return jsonify({"error": f"Job is al {job.status.value}."}), 409
+    db.session.refresh(job)
+    return jsonify(job_to_dict(job)), 202
+
+@app.route('/jobs/<int:job_id>/download')
+@login_required
+def job_download(job_id):
+    """Resultaatbestand van een voltooide export-job."""
+    job = get_visible_job_or_404(job_id)
+    if job.status != JobStatus.SUCCEEDED or not (job.result or {}).get('file'):
+        return jsonify({"error": "Geen downloadbaar resultaat."}), 404
+    path = os.path.join(app.config['JOB_EXPORT_PATH'], os.path.basename(job.result['file']))
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype='application/zip', as_attachment=True,
+                     download_name=f"{job.result.get('dossier_number') or job.id}.zip")
+
+# -----------------------------------------------------------------------------
+# ROUTES - CONTROLS
+# -----------------------------------------------------------------------------
+@app.route('/controls/search')
+@login_required
+@read_replica.read_only
+def controls_search():
+    """Full-text zoeken in SOC2/ISO27001-controls: ?q=...&framework=SOC2&limit=20"""
+    if not control_search_available():
+        return jsonify({"error": "Zoeken is alleen beschikbaar op SQLite (FTS5)."}), 501
+    framework = request.args.get('framework')
+    if framework and framework not in FRAMEWORKS:
+        return jsonify({"error": f"Onbekend framework: {framework}"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), CONTROL_SEARCH_LIMIT_MAX)
+    except ValueError:
+        return jsonify({"error": "limit moet numeriek zijn."}), 400
+    results = search_controls(request.args.get('q', ''), framework, limit)
+    return jsonify({"results": results}), 200
+
+# --- Framework-catalogus (uit het geheugen, met ETag / 304) ---
+@app.route('/frameworks')
+@login_required
+def frameworks_json():
+    catalog = framework_catalog.get()
+    etag = f"catalog-{catalog.version}-" + '-'.join(fw.etag for fw in catalog.frameworks.values())
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    resp = jsonify(catalog.summary())
+    resp.set_etag(etag)
+    return resp
+
+@app.route('/frameworks/<name>')
+@login_required
+def framework_json(name):
+    """Alle controls van een framework; filters op de geïndexeerde kolommen, bijv. ?tsc_series=CC1.0"""
+    catalog = framework_catalog.get()
+    fw = catalog.frameworks.get(name.upper())
+    if fw is None:
+        return jsonify({"error": f"Onbekend framework: {name}"}), 404
+    filters = fw.known_filters(request.args.to_dict())
+    etag = fw.filter_etag(filters) if filters else fw.etag
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    if filters:
+        body = fw.render(fw.select(filters), catalog.version)
+    else:
+        body = fw.body  # voorgeserialiseerd
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    return resp
+
+@app.route('/frameworks/<name>/controls/<path:key>')
+@login_required
+def framework_control_json(name, key):
+    """Eén control op sleutel: SOC2 'sub' (bijv. CC1.1.1), ISO27001 'beheersmaatregel_id' (bijv. 4.2.a)."""
+    fw = framework_catalog.get().frameworks.get(name.upper())
+    control = fw.by_key.get(key) if fw else None
+    if control is None:
+        return jsonify({"error": "Control niet gevonden."}), 404
+    etag = fw.filter_etag({fw.key_column: key})
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    resp = jsonify(control.to_dict())
+    resp.set_etag(etag)
+    return resp
+
+@app.route('/controls/<int:control_id>/mappings')
+@login_required
+def control_mappings_json(control_id):
+    """Voorberekende overeenkomsten met het andere framework: ?k=5 (max CONTROL_MAPPING_TOP_K)."""
+    k = min(max(request.args.get('k', 5, type=int), 1), app.config['CONTROL_MAPPING_TOP_K'])
+    index = control_mapping_index()
+    etag = f"mapping-{index.version}-{control_id}-{k}"
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    matches = index.matches(control_id, k)
+    catalog = framework_catalog.get()
+    control = catalog.by_id.get(control_id)
+    if matches is None or control is None:
+        return jsonify({"error": "Control niet gevonden."}), 404
+    resp = jsonify({
+        "control": _control_summary(control),
+        "mappings": [dict(_control_summary(catalog.by_id[mid]), score=round(score, 4))
+                     for mid, score in matches if mid in catalog.by_id]
+    })
+    resp.set_etag(etag)
+    return resp
+
+# -----------------------------------------------------------------------------
+# ROUTES - BEHEER / DIAGNOSTIEK
+# -----------------------------------------------------------------------------
+@app.route('/admin/acl_cache.json')
+@login_required
+@role_required(['beheerder'])
+def acl_cache_stats():
+    """Hit/miss-tellers van de permissiecache (per worker-proces)."""
+    return jsonify(permission_cache.stats()), 200
+
+@app.route('/admin/audit.json')
+@login_required
+@role_required(['beheerder'])
+def admin_audit_stats_json():
+    return jsonify(audit_log.stats()), 200
+
+@app.route('/admin/jobs.json')
+@login_required
+@role_required(['beheerder'])
+def admin_jobs_json():
+    return jsonify(job_runner.stats()), 200
+
+@app.route('/admin/password_hasher.json')
+@login_required
+@role_required(['beheerder'])
+def password_hasher_stats():
+    """Timing van het bcrypt-pad en het aantal afgewezen (503) aanvragen."""
+    return jsonify(password_hasher.stats()), 200
+
+# -----------------------------------------------------------------------------
+# SCHEMA-MIGRATIES (idempotent, bij iedere start)
+# -----------------------------------------------------------------------------
+# Kolommen die na de eerste versie zijn toegevoegd: db.create_all() voegt die niet toe
+# aan bestaande tabellen.
+ADDED_COLUMNS = [
+    MasterControl.__table__.c.content_hash,
+    DossierDocument.__table__.c.sha256,
+    DossierDocument.__table__.c.size,
+    DossierDocument.__table__.c.content_type,
+    DossierControl.__table__.c.answers,
+    DossierClientControl.__table__.c.answers,
+    Dossier.__table__.c.previous_dossier_id,
+    Dossier.__table__.c.archived_at,
+    Dossier.__table__.c.archive_file,
+    Dossier.__table__.c.archive_sha256,
+    Dossier.__table__.c.restored_at,
+]
+# Naast de modelindexen (zie create_missing_indexes): nodig voor ON CONFLICT-upserts op
+# tabellen die van voor de unique constraints zijn
+ADDED_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_dossier_control_idx ON dossier_controls (dossier_id, master_control_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_dossier_client_control_idx "
+    "ON dossier_client_controls (dossier_id, master_control_id)",
+]
+
+def create_missing_indexes():
+    """
+    db.create_all() maakt geen indexen aan op tabellen die al bestaan: alle indexen uit de
+    modellen (Index(...) en index=True) alsnog aanmaken met IF NOT EXISTS (SQLite en PostgreSQL).
+    Niet via checkfirst: de reflectie slaat expressie-indexen als lower(email) over.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            ddl = str(CreateIndex(index).compile(dialect=db.engine.dialect))
+            db.session.execute(text(ddl.replace('INDEX ', 'INDEX IF NOT EXISTS ', 1)))
+
+def migrate_schema():
+    db.create_all()  # maakt nieuwe tabellen zoals dossier_acl aan
+    for column in ADDED_COLUMNS:
+        add_column_if_missing(column.table.name, column.name, column_ddl(column))
+    migrate_acl_to_bitmask()  # CSV-permissies -> perm_mask (idempotent), vóór de index op perm_mask
+    create_missing_indexes()
+    for stmt in ADDED_INDEXES:
+        db.session.execute(text(stmt))
+    db.session.commit()
+    ensure_control_search_index()  # FTS5-index + triggers (alleen SQLite)
+    ensure_progress_triggers()  # dossier_progress-tellers (SQLite en PostgreSQL)
+    ensure_audit_append_only()  # audit_events: geen UPDATE/DELETE (SQLite en PostgreSQL)
+    ensure_change_feed_triggers()  # dossier_changes (SQLite en PostgreSQL)
+
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
+    sys.modules.setdefault('app', sys.modules[__name__])  # importer.py (import-jobs) importeert 'app'
     with app.app_context():
-        db.create_all()  # maakt nieuwe tabellen zoals dossier_acl aan
+        migrate_schema()
     app.run(debug=True)
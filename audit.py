@@ -0,0 +1,191 @@
+# audit.py
+import atexit
+import datetime
+import enum
+import logging
+import threading
+from flask import has_request_context, request, session as flask_session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import db, AuditEvent, DossierACL, User, DossierControl, Dossier, mask_to_perms
+
+logger = logging.getLogger('toverstaf.audit')
+
+# Model -> (geaudite attributen, attribuut met dossier_id, attribuut met de betrokken gebruiker)
+AUDITED = {
+    DossierACL: (('perm_mask',), 'dossier_id', 'user_id'),
+    User: (('role', 'is_approved'), None, 'id'),
+    DossierControl: (('status', 'review_status'), 'dossier_id', None),
+    Dossier: (('status',), 'id', None),
+}
+
+
+def _value(attr, value):
+    if attr == 'perm_mask':
+        return mask_to_perms(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+class AuditLog:
+    """
+    Append-only audittrail met write-behind. Wijzigingen aan de geaudite ORM-attributen (zie
+    AUDITED) worden per flush vastgelegd in session.info, gaan bij de commit naar een buffer in
+    het geheugen (bij een rollback vervallen ze) en worden door een achtergrondthread in batches
+    weggeschreven: bij AUDIT_BATCH_SIZE events of na AUDIT_FLUSH_INTERVAL seconden.
+    De request wacht dus niet op de audit-INSERT; bij een harde crash kunnen de events van de
+    laatste interval verloren gaan (bij een normale stop wordt de buffer geleegd).
+    """
+    def __init__(self, app=None):
+        self.app = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.failed_flushes = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_BATCH_SIZE', 200)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL', 2.0)   # seconden
+        self.app = app
+        self.batch_size = app.config['AUDIT_BATCH_SIZE']
+        self.flush_interval = app.config['AUDIT_FLUSH_INTERVAL']
+        app.extensions['audit'] = self
+        # active_history: bij een set wordt de oude waarde zo nodig eerst geladen, ook als het
+        # attribuut na een commit expired is; anders heeft de history geen 'deleted' en zou de
+        # wijziging zonder event geflusht worden.
+        for model, (attrs, _, _) in AUDITED.items():
+            for attr in attrs:
+                event.listen(getattr(model, attr), 'set', _keep_old_value, active_history=True)
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+        atexit.register(self.flush)
+
+    # --- vastleggen ---
+    @staticmethod
+    def _context(session):
+        """
+        (actor_id, ip). Buiten een request (bijv. in een job) zet de aanroeper de actor via
+        session.info['audit_actor']; die gaat voor de ingelogde gebruiker.
+        """
+        actor_id = session.info.get('audit_actor')
+        if has_request_context():
+            return actor_id or flask_session.get('user_id'), request.remote_addr
+        return actor_id, None
+
+    def record(self, action, entity_type, entity_id=None, dossier_id=None, subject_user_id=None,
+               old_value=None, new_value=None, session=None):
+        """
+        Expliciet event, bijv. voor Core-bulkoperaties die de ORM-events omzeilen. Met session
+        (default db.session) volgt het event de transactie; het wordt pas bij de commit gebufferd.
+        """
+        target = session if session is not None else db.session()
+        actor_id, ip = self._context(target)
+        row = dict(occurred_at=datetime.datetime.now(), actor_id=actor_id, ip=ip, action=action,
+                   entity_type=entity_type, entity_id=entity_id, dossier_id=dossier_id,
+                   subject_user_id=subject_user_id, old_value=old_value, new_value=new_value)
+        target.info.setdefault('audit_pending', []).append(row)
+
+    def _after_flush(self, session, flush_context):
+        pending = []
+        actor_id, ip = self._context(session)
+        now = datetime.datetime.now()
+        changes = [('create', obj) for obj in session.new] + \
+                  [('update', obj) for obj in session.dirty] + \
+                  [('delete', obj) for obj in session.deleted]
+        for kind, obj in changes:
+            spec = AUDITED.get(type(obj))
+            if spec is None:
+                continue
+            attrs, dossier_attr, subject_attr = spec
+            state = inspect(obj)
+            table = obj.__tablename__
+            base = dict(occurred_at=now, actor_id=actor_id, ip=ip, entity_type=table,
+                        # state.identity is bij een create pas na de flush gezet; de PK-waarde al wel
+                        entity_id=state.mapper.primary_key_from_instance(obj)[0],
+                        dossier_id=getattr(obj, dossier_attr) if dossier_attr else None,
+                        subject_user_id=getattr(obj, subject_attr) if subject_attr else None)
+            if kind == 'update':
+                for attr in attrs:
+                    hist = state.attrs[attr].history
+                    if not hist.has_changes():
+                        continue
+                    # Zonder geladen oude waarde (bijv. een rij die nooit geladen is): toch vastleggen, old = None
+                    old = _value(attr, hist.deleted[0]) if hist.deleted else None
+                    new = _value(attr, getattr(obj, attr))
+                    if old != new or not hist.deleted:
+                        pending.append(dict(base, action=f"{table}.{attr}", old_value=old, new_value=new))
+            else:
+                values = {attr: _value(attr, getattr(obj, attr)) for attr in attrs}
+                pending.append(dict(base, action=f"{table}.{kind}",
+                                    old_value=values if kind == 'delete' else None,
+                                    new_value=values if kind == 'create' else None))
+        if pending:
+            session.info.setdefault('audit_pending', []).extend(pending)
+
+    def _after_commit(self, session):
+        pending = session.info.pop('audit_pending', None)
+        if not pending:
+            return
+        with self._lock:
+            self._buffer.extend(pending)
+            full = len(self._buffer) >= self.batch_size
+        self.start()
+        if full:
+            self._wake.set()
+
+    def _after_rollback(self, session):
+        session.info.pop('audit_pending', None)
+
+    # --- wegschrijven ---
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Schrijft de buffer weg (executemany per batch). Ook synchroon aan te roepen, bijv. vóór een query."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        for i in range(0, len(rows), self.batch_size):
+                            conn.execute(AuditEvent.__table__.insert(), rows[i:i + self.batch_size])
+            except Exception:
+                logger.exception("Audit-events konden niet worden weggeschreven; nieuwe poging later")
+                with self._lock:
+                    self._buffer[:0] = rows
+                    self.failed_flushes += 1
+                return 0
+            with self._lock:
+                self.written += len(rows)
+            return len(rows)
+
+    def stats(self):
+        with self._lock:
+            return {"buffered": len(self._buffer), "written": self.written,
+                    "failed_flushes": self.failed_flushes}
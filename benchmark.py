@@ -0,0 +1,252 @@
+# benchmark.py
+"""
+Reproduceerbare load-/benchmarksuite met synthetische auditdata.
+
+Vult een aparte SQLite-database met N gebruikers, M klanten, K dossiers (volledig
+gescoped tegen SOC2 + ISO27001) en een dichte ACL-matrix, en drijft daarna de drukke
+routes aan via de Flask test client. Per scenario: throughput, p50/p95/p99-latency en
+SQL-queries per request. Resultaten gaan naar JSON; met --compare wordt een eerdere run
+als baseline gebruikt en faalt de run bij een regressie.
+
+    python benchmark.py --users 200 --clients 50 --dossiers 500 --output bench.json
+    python benchmark.py --output new.json --compare bench.json --max-regression 20
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+
+from app import app, migrate_schema, scope_dossier, password_hasher
+from importer import import_framework, SOC2_CSV, ISO27001_CSV
+from models import db, User, UserRole, Client, Dossier, DossierACL, DossierStatus, perms_to_mask
+
+BENCH_PASSWORD = 'benchmark'
+PARTNER_EMAIL = 'partner@bench.local'
+
+
+class QueryCounter:
+    """Telt SQL-statements via een engine-event; per request op nul gezet."""
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, 'after_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def reset(self):
+        self.count = 0
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def seed(args, rng):
+    """Synthetische data, in bulk weggeschreven (executemany)."""
+    migrate_schema()
+    import_framework(args.soc2, 'SOC2')
+    import_framework(args.iso27001, 'ISO27001')
+
+    password_hash = password_hasher.hash(BENCH_PASSWORD)
+    now = datetime.datetime.now()
+    users = [{
+        "name": "Partner", "email": PARTNER_EMAIL, "password_hash": password_hash,
+        "role": UserRole.TEKENEND_PROFESSIONAL, "is_approved": True, "created_at": now,
+    }]
+    roles = [UserRole.TEAMLID, UserRole.DOSSIERMANAGER, UserRole.TEKENEND_PROFESSIONAL]
+    users += [{
+        "name": f"Gebruiker {i}", "email": f"user{i}@bench.local", "password_hash": password_hash,
+        "role": rng.choice(roles), "is_approved": True, "created_at": now,
+    } for i in range(1, args.users)]
+    db.session.execute(insert(User.__table__), users)
+
+    db.session.execute(insert(Client.__table__), [{
+        "name": f"Klant {i} B.V.", "client_number": f"BK-{i:05d}", "created_at": now,
+    } for i in range(1, args.clients + 1)])
+
+    statuses = list(DossierStatus)
+    db.session.execute(insert(Dossier.__table__), [{
+        "dossier_number": f"B-{i:06d}", "title": f"Benchmarkdossier {i}",
+        "status": rng.choice(statuses), "start_date": now - datetime.timedelta(days=rng.randint(0, 2000)),
+        "client_id": rng.randint(1, args.clients) if args.clients else None, "created_by_user_id": 1,
+    } for i in range(1, args.dossiers + 1)])
+    db.session.commit()
+
+    full = perms_to_mask(['VIEW', 'EDIT', 'MANAGE', 'REQUEST_DELETE', 'REVIEW_1', 'REVIEW_2'])
+    member = perms_to_mask(['VIEW', 'EDIT'])
+    acl, batch = 0, []
+    for dossier_id in range(1, args.dossiers + 1):
+        batch.append({"dossier_id": dossier_id, "user_id": 1, "perm_mask": full, "granted_at": now})
+        for user_id in range(2, args.users + 1):
+            if rng.random() < args.acl_density:
+                batch.append({"dossier_id": dossier_id, "user_id": user_id, "perm_mask": member, "granted_at": now})
+        if len(batch) >= 5000:
+            db.session.execute(insert(DossierACL.__table__), batch)
+            acl += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(DossierACL.__table__), batch)
+        acl += len(batch)
+    db.session.commit()
+
+    if not args.no_scoping:
+        for dossier_id in range(1, args.dossiers + 1):
+            scope_dossier(dossier_id, 'SOC2')
+            scope_dossier(dossier_id, 'ISO27001')
+    return {"users": args.users, "clients": args.clients, "dossiers": args.dossiers, "acl_rows": acl}
+
+
+def run_scenario(client, counter, name, make_request, n, ok_statuses=(200, 302)):
+    latencies, queries, errors = [], [], 0
+    start = time.perf_counter()
+    for i in range(n):
+        counter.reset()
+        t0 = time.perf_counter()
+        resp = make_request(i)
+        latencies.append(time.perf_counter() - t0)
+        queries.append(counter.count)
+        if resp.status_code not in ok_statuses:
+            errors += 1
+        resp.close()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        "requests": n,
+        "errors": errors,
+        "throughput_rps": round(n / wall, 2) if wall else None,
+        "mean_ms": ms(sum(latencies) / n) if n else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "queries_mean": round(sum(queries) / n, 2) if n else None,
+        "queries_max": max(queries) if queries else None,
+    }
+
+
+def run_benchmarks(args, rng):
+    client = app.test_client()
+    counter = QueryCounter()
+    json_headers = {'Accept': 'application/json'}
+    ids = list(range(1, args.dossiers + 1))
+
+    def login(_):
+        return client.post('/login', json={'email': PARTNER_EMAIL, 'password': BENCH_PASSWORD}, headers=json_headers)
+
+    login(0)
+    scenarios = [
+        ('login', login),
+        ('dossiers', lambda i: client.get('/dossiers')),
+        ('dossiers_json', lambda i: client.get('/dossiers.json', headers=json_headers)),
+        ('dossier_detail', lambda i: client.get(f'/dossiers/{rng.choice(ids)}')),
+        ('acl_json', lambda i: client.get(f'/dossiers/{rng.choice(ids)}/acl.json', headers=json_headers)),
+        ('acl_update', lambda i: client.post(f'/dossiers/{rng.choice(ids)}/acl', data={
+            'user_id': str(rng.randint(2, max(args.users, 2))), 'perms': ['VIEW', 'EDIT']})),
+        ('dossier_create', lambda i: client.post('/dossiers/create', data={
+            'title': f'Nieuw benchmarkdossier {i}', 'client_id': str(rng.randint(1, max(args.clients, 1)))})),
+    ]
+    only = set(args.scenarios.split(',')) if args.scenarios else None
+    results = {}
+    for name, fn in scenarios:
+        if only and name not in only:
+            continue
+        n = args.login_requests if name == 'login' else args.requests
+        results[name] = run_scenario(client, counter, name, fn, n)
+        login(0)  # sessie herstellen na eventuele redirects
+        print(f"{name:16s} {results[name]['throughput_rps']:>9} req/s  p50 {results[name]['p50_ms']:>8} ms  "
+              f"p95 {results[name]['p95_ms']:>8} ms  p99 {results[name]['p99_ms']:>8} ms  "
+              f"{results[name]['queries_mean']:>6} q/req  errors {results[name]['errors']}")
+    return results
+
+
+def compare(results, baseline_path, max_regression_pct):
+    """Vergelijkt p95 en queries per request met een eerdere run; geeft lijst met regressies terug."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f).get('results', {})
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key in ('p95_ms', 'queries_mean'):
+            if base.get(key) and cur.get(key) is not None:
+                delta = (cur[key] - base[key]) / base[key] * 100
+                flag = key == 'queries_mean' and cur[key] > base[key] or delta > max_regression_pct
+                print(f"{name:16s} {key:13s} {base[key]:>10} -> {cur[key]:>10} ({delta:+.1f}%)"
+                      + ("  REGRESSIE" if flag else ""))
+                if flag:
+                    regressions.append({"scenario": name, "metric": key, "baseline": base[key],
+                                        "current": cur[key], "delta_pct": round(delta, 1)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de drukke routes met synthetische data.")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--clients', type=int, default=25)
+    parser.add_argument('--dossiers', type=int, default=200)
+    parser.add_argument('--acl-density', type=float, default=0.1,
+                        help="kans dat een gebruiker ACL heeft op een dossier (de partner heeft ze allemaal)")
+    parser.add_argument('--no-scoping', action='store_true', help="dossiers niet scopen tegen SOC2/ISO27001")
+    parser.add_argument('--requests', type=int, default=200, help="requests per scenario")
+    parser.add_argument('--login-requests', type=int, default=20, help="requests voor het (dure) loginscenario")
+    parser.add_argument('--bcrypt-rounds', type=int, default=None, help="work factor tijdens de benchmark")
+    parser.add_argument('--scenarios', default=None, help="komma-gescheiden subset, bijv. dossiers,acl_json")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', default=None, help="pad voor de benchmarkdatabase (default: tijdelijk bestand)")
+    parser.add_argument('--soc2', default=SOC2_CSV)
+    parser.add_argument('--iso27001', default=ISO27001_CSV)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help="eerdere JSON-resultaten als baseline")
+    parser.add_argument('--max-regression', type=float, default=20.0, help="toegestane p95-toename in procenten")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='toverstaf-bench-'), 'bench.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SLOW_QUERY_MS'] = None  # geen slow-query logging tijdens het meten
+    if args.bcrypt_rounds:
+        password_hasher.rounds = args.bcrypt_rounds
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        volumes = seed(args, rng)
+        seed_seconds = round(time.perf_counter() - t0, 2)
+        print(f"Seed klaar in {seed_seconds}s: {volumes}")
+        results = run_benchmarks(args, rng)
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                        "platform": platform.platform()},
+        "parameters": {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        "volumes": volumes,
+        "seed_seconds": seed_seconds,
+        "results": results,
+    }
+    regressions = []
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        report["regressions"] = regressions
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultaten geschreven naar {args.output}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# catalog.py
+import hashlib
+import json
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+# Kolommen van master_controls die in de catalogus staan (volgorde = tuple-volgorde)
+CONTROL_FIELDS = (
+    'id', 'framework',
+    'series', 'series_description', 'tsc_series', 'tsc_description_series', 'sub', 'points_of_focus',
+    'hoofdstuk', 'naam_hoofdstuk', 'beheersmaatregel_id', 'beheersmaatregel_naam', 'beheersmaatregel_inhoud',
+)
+
+# Per framework: sleutelkolom (uniek) en de kolommen waarop gegroepeerd/gefilterd kan worden
+FRAMEWORK_KEYS = {
+    'SOC2': ('sub', ('series', 'tsc_series')),
+    'ISO27001': ('beheersmaatregel_id', ('hoofdstuk',)),
+}
+
+
+class Control(NamedTuple):
+    id: int
+    framework: str
+    series: Optional[str]
+    series_description: Optional[str]
+    tsc_series: Optional[str]
+    tsc_description_series: Optional[str]
+    sub: Optional[str]
+    points_of_focus: Optional[str]
+    hoofdstuk: Optional[str]
+    naam_hoofdstuk: Optional[str]
+    beheersmaatregel_id: Optional[str]
+    beheersmaatregel_naam: Optional[str]
+    beheersmaatregel_inhoud: Optional[str]
+
+    def to_dict(self):
+        # Lege velden (de kolommen van het andere framework) weglaten
+        return {k: v for k, v in zip(self._fields, self) if v is not None}
+
+
+def _etag(*parts: str) -> str:
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()[:20]
+
+
+class FrameworkIndex:
+    """Alle controls van één framework, met indexen op de sleutel- en groepskolommen."""
+    __slots__ = ('name', 'controls', 'key_column', 'by_key', 'groups', 'etag', 'body')
+
+    def __init__(self, name: str, controls: Tuple[Control, ...], version: int):
+        key_column, group_columns = FRAMEWORK_KEYS.get(name, ('id', ()))
+        self.name = name
+        self.controls = controls
+        self.key_column = key_column
+        self.by_key = {getattr(c, key_column): c for c in controls}
+        self.groups = {}
+        for col in group_columns:
+            index = {}
+            for c in controls:
+                index.setdefault(getattr(c, col), []).append(c)
+            self.groups[col] = {k: tuple(v) for k, v in index.items()}
+        # Volledige respons één keer serialiseren; de ETag volgt de inhoud (sterk)
+        self.body = self.render(controls, version)
+        self.etag = _etag(name, hashlib.sha1(self.body).hexdigest())
+
+    def render(self, controls, version: int) -> bytes:
+        return json.dumps({
+            'framework': self.name, 'catalog_version': version,
+            'count': len(controls), 'controls': [c.to_dict() for c in controls]
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def select(self, filters: Dict[str, str]) -> Tuple[Control, ...]:
+        """
+        Filtert via de groepsindexen (geen scan per filter); onbekende filters -> ValueError.
+        Meerdere filters worden gecombineerd (AND).
+        """
+        result = None
+        for col, value in filters.items():
+            if col == self.key_column:
+                found = self.by_key.get(value)
+                matches = (found,) if found else ()
+            elif col in self.groups:
+                matches = self.groups[col].get(value, ())
+            else:
+                raise ValueError(f"Onbekend filter voor {self.name}: {col}")
+            if result is None:
+                result = matches
+            else:
+                keep = set(matches)
+                result = tuple(c for c in result if c in keep)
+        return self.controls if result is None else result
+
+    def known_filters(self, args: Dict[str, str]) -> Dict[str, str]:
+        """Alleen de parameters die select() kent; overige (bijv. cache-busters als ?_=1) vallen weg."""
+        return {k: v for k, v in args.items() if k == self.key_column or k in self.groups}
+
+    def filter_etag(self, filters: Dict[str, str]) -> str:
+        return _etag(self.etag, *(f"{k}={v}" for k, v in sorted(filters.items())))
+
+
+class Catalog:
+    """Onveranderlijke momentopname van master_controls, per framework geïndexeerd."""
+    __slots__ = ('version', 'frameworks', 'by_id', 'loaded_at')
+
+    def __init__(self, version: int, rows):
+        self.version = version
+        controls = [Control(*row) for row in rows]
+        per_framework = {}
+        for c in controls:
+            per_framework.setdefault(c.framework, []).append(c)
+        self.frameworks = {name: FrameworkIndex(name, tuple(items), version)
+                           for name, items in per_framework.items()}
+        self.by_id = {c.id: c for c in controls}
+        self.loaded_at = time.time()
+
+    def summary(self):
+        return {
+            'catalog_version': self.version,
+            'frameworks': [{'name': fw.name, 'count': len(fw.controls), 'key': fw.key_column,
+                            'groups': sorted(fw.groups), 'etag': fw.etag}
+                           for fw in sorted(self.frameworks.values(), key=lambda f: f.name)]
+        }
+
+
+class CatalogCache:
+    """
+    Houdt één Catalog per proces vast. De versie in de database wordt hooguit eens per
+    check_interval seconden gelezen (één PK-lookup); alleen bij een nieuwe versie wordt
+    de catalogus opnieuw geladen. Thread-safe: lezers zien altijd een complete snapshot.
+    """
+
+    def __init__(self, load_version: Callable[[], int], load_rows: Callable[[], list],
+                 check_interval: float = 5.0):
+        self._load_version = load_version
+        self._load_rows = load_rows
+        self.check_interval = check_interval
+        self._catalog: Optional[Catalog] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self) -> Catalog:
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return catalog
+        with self._lock:
+            if self._catalog is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._catalog
+            version = self._load_version()
+            if self._catalog is None or self._catalog.version != version:
+                self._catalog = Catalog(version, self._load_rows())
+                self.loads += 1
+            self._checked_at = time.monotonic()
+            return self._catalog
+
+    def invalidate(self):
+        """Forceert een versiecontrole bij de volgende get() (bijv. na een import in dit proces)."""
+        with self._lock:
+            self._checked_at = 0.0
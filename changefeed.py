@@ -0,0 +1,94 @@
+# changefeed.py
+import logging
+import queue
+import threading
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from models import db, DossierChange
+
+logger = logging.getLogger('toverstaf.changefeed')
+
+
+class ChangeBroker:
+    """
+    In-process pub/sub voor de dossier change feed. Eén broker-thread leest na iedere commit
+    (en anders elke FEED_POLL_INTERVAL seconden, voor wijzigingen uit andere processen) met
+    één query de nieuwe dossier_changes-rijen en wekt alleen de abonnees van de betrokken
+    dossiers. Abonnees halen daarna zelf hun delta op; de broker bewaart geen data.
+    """
+    def __init__(self, app=None):
+        self.app = None
+        self._subscribers = {}      # dossier_id -> set(Queue)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_id = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FEED_POLL_INTERVAL', 1.0)
+        self.app = app
+        self.poll_interval = app.config['FEED_POLL_INTERVAL']
+        app.extensions['changefeed'] = self
+        event.listen(Session, 'after_commit', lambda session: self.notify())
+
+    def notify(self):
+        if self._subscribers:
+            self._wake.set()
+
+    def subscribe(self, dossier_id: int) -> queue.Queue:
+        """Queue die een signaal krijgt zodra er voor dit dossier nieuwe wijzigingen zijn."""
+        q = queue.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.setdefault(dossier_id, set()).add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='changefeed', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, dossier_id: int, q: queue.Queue):
+        with self._lock:
+            subs = self._subscribers.get(dossier_id)
+            if subs:
+                subs.discard(q)
+                if not subs:
+                    del self._subscribers[dossier_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if not self._subscribers:
+                self._last_id = None    # bij een nieuw abonnement opnieuw vanaf 'nu' beginnen
+                continue
+            try:
+                self._poll()
+            except Exception:
+                logger.exception("Change feed: ophalen van wijzigingen mislukt")
+
+    def _poll(self):
+        table = DossierChange.__table__
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                if self._last_id is None:
+                    self._last_id = conn.execute(select(func.max(table.c.id))).scalar() or 0
+                    return
+                rows = conn.execute(select(table.c.id, table.c.dossier_id).where(
+                    table.c.id > self._last_id
+                ).order_by(table.c.id)).all()
+        if not rows:
+            return
+        self._last_id = rows[-1].id
+        changed = {r.dossier_id for r in rows}
+        with self._lock:
+            targets = [q for d in changed for q in self._subscribers.get(d, ())]
+        for q in targets:
+            try:
+                q.put_nowait(self._last_id)
+            except queue.Full:
+                pass    # er staat al een signaal klaar
@@ -0,0 +1,196 @@
+# controlmap.py
+import hashlib
+import os
+import re
+from collections import Counter
+import numpy as np
+
+TOP_K = 10
+STEM_LENGTH = 5      # woorden worden op hun eerste 5 letters gematcht (organisatie ~ organization)
+MIN_WORD = 3
+BLOCK_ROWS = 1024    # similarity per blok rijen, zodat het geheugen begrensd blijft
+
+# ISO27001 staat in het Nederlands, SOC2 in het Engels: veelvoorkomende Nederlandse
+# (deel)woorden krijgen Engelse termen als extra kenmerk, ook binnen samenstellingen
+# (informatiebeveiligingsrisico -> information, security, risk).
+GLOSSARY = {
+    'beveilig': 'security', 'risico': 'risk', 'toegang': 'access', 'wachtwoord': 'password',
+    'authenticat': 'authentication', 'autoris': 'authorization', 'bevoegd': 'authorization',
+    'leverancier': 'vendor supplier', 'medewerker': 'employee personnel', 'personeel': 'personnel',
+    'beleid': 'policy', 'wijziging': 'change', 'wijzigen': 'change', 'incident': 'incident',
+    'continuïteit': 'continuity', 'continuiteit': 'continuity', 'back-up': 'backup', 'backup': 'backup',
+    'versleutel': 'encryption', 'cryptogra': 'cryptography', 'fysiek': 'physical', 'netwerk': 'network',
+    'bewak': 'monitoring', 'monitor': 'monitoring', 'logging': 'logging', 'kwetsba': 'vulnerability',
+    'bestuur': 'board governance', 'directie': 'management', 'leiderschap': 'leadership',
+    'opleiding': 'training', 'bewustzijn': 'awareness', 'vertrouwelijk': 'confidentiality',
+    'integriteit': 'integrity', 'beschikbaar': 'availability', 'bedrijfsmiddel': 'assets',
+    'apparatuur': 'equipment', 'gegevens': 'data', 'verwijder': 'disposal', 'vernietig': 'disposal',
+    'classificat': 'classification', 'eigenaar': 'owner', 'eigenaren': 'owner',
+    'verantwoordelijk': 'responsibilities', 'doelstelling': 'objectives', 'communic': 'communication',
+    'afwijking': 'deviations', 'corrigerend': 'corrective', 'verbeter': 'improvement',
+    'evalu': 'evaluates', 'beoordel': 'assessment', 'naleving': 'compliance', 'wettelijk': 'legal',
+    'dienstverl': 'service', 'ontwikkel': 'development', 'configurat': 'configuration',
+    'capaciteit': 'capacity', 'malware': 'malware', 'kwaadaardig': 'malware', 'herstel': 'recovery',
+    'gebeurtenis': 'events', 'melding': 'reporting', 'melden': 'reporting', 'screening': 'screening',
+    'dienstverband': 'employment', 'beëindig': 'termination', 'disciplin': 'disciplinary',
+    'ondersteun': 'support', 'fraude': 'fraud', 'dreiging': 'threats', 'maatregel': 'controls',
+}
+_GLOSSARY_ITEMS = tuple((nl, tuple(en.split())) for nl, en in GLOSSARY.items())
+
+STOPWORDS = frozenset("""
+the and for with from that this are its all any has have been into such other which their
+them they when where while should must shall will can may also not but than then there these
+those each both more most over under about within between through entity entitys
+de het een van voor met aan die dat dit zijn moet moeten worden wordt door als ook over niet
+naar bij uit zich haar hun deze welke wanneer tot onder tegen binnen tussen inzake alle andere
+organisatie bijv inclusief zover waar
+""".split())
+
+_WORD = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)?")
+
+
+def control_text(control) -> str:
+    """Tekst van een catalogus-Control waarop gematcht wordt (lege velden tellen niet mee)."""
+    parts = (control.tsc_description_series, control.points_of_focus,
+             control.naam_hoofdstuk, control.beheersmaatregel_naam, control.beheersmaatregel_inhoud)
+    return ' '.join(p for p in parts if p)
+
+
+def text_features(text: str) -> Counter:
+    """Term-frequenties: woordstammen (eerste STEM_LENGTH letters) plus Engelse glossariumtermen."""
+    counts = Counter()
+    for word in _WORD.findall(text.lower()):
+        if len(word) < MIN_WORD or word in STOPWORDS:
+            continue
+        counts[word[:STEM_LENGTH]] += 1
+        for nl, terms in _GLOSSARY_ITEMS:
+            if nl in word:
+                for term in terms:
+                    counts[term[:STEM_LENGTH]] += 1
+    return counts
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class MappingIndex:
+    """
+    Voorberekende top-k overeenkomsten tussen controls van verschillende frameworks
+    (TF-IDF, cosine similarity met NumPy). De term-frequenties per control worden bewaard
+    zodat een rebuild alleen gewijzigde/nieuwe controls opnieuw hoeft te analyseren.
+    """
+    __slots__ = ('version', 'ids', 'frameworks', 'hashes', 'vocab', 'doc_ptr', 'feat_idx', 'counts',
+                 'top_idx', 'top_score', '_pos')
+
+    ARRAYS = ('ids', 'frameworks', 'hashes', 'vocab', 'doc_ptr', 'feat_idx', 'counts', 'top_idx', 'top_score')
+
+    def __init__(self, version, **arrays):
+        self.version = int(version)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self._pos = {int(control_id): i for i, control_id in enumerate(self.ids)}
+
+    # --- opbouwen ---
+    def _features_of(self, i: int) -> Counter:
+        start, end = self.doc_ptr[i], self.doc_ptr[i + 1]
+        return Counter(dict(zip(self.vocab[self.feat_idx[start:end]].tolist(),
+                                self.counts[start:end].tolist())))
+
+    @classmethod
+    def build(cls, docs, version, previous=None, top_k=TOP_K):
+        """
+        docs: iterable van (control_id, framework, tekst). previous: vorige MappingIndex;
+        controls met dezelfde id en teksthash worden daaruit hergebruikt.
+        Geeft (index, {"reused": n, "analyzed": n}) terug.
+        """
+        docs = list(docs)
+        known = {}
+        if previous is not None:
+            known = {(int(cid), h): i for i, (cid, h) in enumerate(zip(previous.ids, previous.hashes))}
+        features, hashes, stats = [], [], {"reused": 0, "analyzed": 0}
+        for control_id, _, text in docs:
+            digest = _text_hash(text)
+            hashes.append(digest)
+            i = known.get((control_id, digest))
+            if i is not None:
+                features.append(previous._features_of(i))
+                stats["reused"] += 1
+            else:
+                features.append(text_features(text))
+                stats["analyzed"] += 1
+
+        vocab = sorted(set().union(*features)) if features else []
+        col = {term: j for j, term in enumerate(vocab)}
+        doc_ptr = np.zeros(len(docs) + 1, dtype=np.int64)
+        doc_ptr[1:] = np.cumsum([len(f) for f in features])
+        feat_idx = np.fromiter((col[t] for f in features for t in f), dtype=np.int32, count=int(doc_ptr[-1]))
+        counts = np.fromiter((n for f in features for n in f.values()), dtype=np.float32, count=int(doc_ptr[-1]))
+        ids = np.array([d[0] for d in docs], dtype=np.int64)
+        frameworks = np.array([d[1] for d in docs], dtype=str)
+        top_idx, top_score = cls._top_k(frameworks, doc_ptr, feat_idx, counts, len(vocab), top_k)
+        index = cls(version, ids=ids, frameworks=frameworks, hashes=np.array(hashes, dtype=str),
+                    vocab=np.array(vocab, dtype=str), doc_ptr=doc_ptr, feat_idx=feat_idx, counts=counts,
+                    top_idx=top_idx, top_score=top_score)
+        return index, stats
+
+    @staticmethod
+    def _top_k(frameworks, doc_ptr, feat_idx, counts, n_features, top_k):
+        n = len(frameworks)
+        top_idx = np.full((n, top_k), -1, dtype=np.int32)
+        top_score = np.zeros((n, top_k), dtype=np.float32)
+        if n == 0 or n_features == 0:
+            return top_idx, top_score
+        rows = np.repeat(np.arange(n), np.diff(doc_ptr))
+        df = np.bincount(feat_idx, minlength=n_features)
+        idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+        weights = (1.0 + np.log(counts)) * idf[feat_idx]          # sublineaire tf * idf
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n))
+        norms[norms == 0] = 1.0
+        # Alleen termen die in >= 2 controls voorkomen kunnen bijdragen aan een overeenkomst
+        shared = df >= 2
+        colmap = np.cumsum(shared) - 1
+        keep = shared[feat_idx]
+        matrix = np.zeros((n, int(shared.sum())), dtype=np.float32)
+        matrix[rows[keep], colmap[feat_idx[keep]]] = (weights[keep] / norms[rows[keep]])
+        _, fw_codes = np.unique(frameworks, return_inverse=True)
+        k = min(top_k, n)
+        for start in range(0, n, BLOCK_ROWS):
+            block = matrix[start:start + BLOCK_ROWS] @ matrix.T
+            block[fw_codes[start:start + BLOCK_ROWS, None] == fw_codes[None, :]] = -1.0  # zelfde framework
+            best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(block, best, axis=1)
+            order = np.argsort(-scores, axis=1)
+            best, scores = np.take_along_axis(best, order, axis=1), np.take_along_axis(scores, order, axis=1)
+            best[scores <= 0] = -1
+            top_idx[start:start + BLOCK_ROWS, :k] = best
+            top_score[start:start + BLOCK_ROWS, :k] = np.clip(scores, 0, None)
+        return top_idx, top_score
+
+    # --- opvragen ---
+    def matches(self, control_id: int, k: int = TOP_K):
+        """[(control_id, score)] van het andere framework, beste eerst; None als de control onbekend is."""
+        i = self._pos.get(control_id)
+        if i is None:
+            return None
+        return [(int(self.ids[j]), float(s))
+                for j, s in zip(self.top_idx[i, :k], self.top_score[i, :k]) if j >= 0]
+
+    # --- persistentie ---
+    def save(self, path: str):
+        """Atomair wegschrijven (tijdelijk bestand + rename), zodat lezers nooit een half bestand zien."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, version=np.int64(self.version),
+                                **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Leest een index van schijf; None als het bestand ontbreekt of onleesbaar is."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls(int(data['version']), **{name: data[name] for name in cls.ARRAYS})
+        except (OSError, KeyError, ValueError):
+            return None
@@ -0,0 +1,135 @@
+# dbconfig.py
+import os
+import sqlite3
+from functools import wraps
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.engine import Engine
+
+DEFAULT_DATABASE_URL = 'sqlite:///audit_applicatie.db'
+
+# PRAGMA -> (omgevingsvariabele, default). Worden bij iedere nieuwe SQLite-verbinding gezet.
+SQLITE_PRAGMAS = {
+    'journal_mode': ('SQLITE_JOURNAL_MODE', 'WAL'),     # lezers blokkeren schrijvers niet meer
+    'synchronous': ('SQLITE_SYNCHRONOUS', 'NORMAL'),    # veilig in WAL-modus, veel minder fsyncs
+    'busy_timeout': ('SQLITE_BUSY_TIMEOUT_MS', '5000'), # wachten op een lock i.p.v. "database is locked"
+    'mmap_size': ('SQLITE_MMAP_SIZE', str(256 * 1024 ** 2)),
+    'cache_size': ('SQLITE_CACHE_SIZE', '-65536'),      # negatief = KiB, dus 64 MiB page cache
+}
+
+# Pool-instellingen voor server-databases (PostgreSQL e.d.): SQLAlchemy-optie -> (env, type)
+POOL_OPTIONS = {
+    'pool_size': ('DB_POOL_SIZE', int),
+    'max_overflow': ('DB_MAX_OVERFLOW', int),
+    'pool_timeout': ('DB_POOL_TIMEOUT', int),
+    'pool_recycle': ('DB_POOL_RECYCLE', int),
+}
+
+_active_pragmas = {}
+
+
+def normalize_url(url: str) -> str:
+    # Heroku/oudere tooling gebruikt nog 'postgres://', SQLAlchemy 1.4 niet meer
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url: str) -> dict:
+    """SQLAlchemy engine-opties voor url, uit de omgeving (alleen pooling voor niet-SQLite)."""
+    if url.startswith('sqlite'):
+        return {}
+    options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') not in ('0', 'false')}
+    for option, (env, cast) in POOL_OPTIONS.items():
+        if os.environ.get(env):
+            options[option] = cast(os.environ[env])
+    return options
+
+
+def sqlite_pragmas() -> dict:
+    """Actieve PRAGMA's; een lege omgevingsvariabele schakelt de betreffende PRAGMA uit."""
+    pragmas = {}
+    for pragma, (env, default) in SQLITE_PRAGMAS.items():
+        value = os.environ.get(env, default)
+        if value:
+            pragmas[pragma] = value
+    return pragmas
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection) or not _active_pragmas:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in _active_pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_database(app):
+    """
+    Stelt de database in vanuit de omgeving:
+      DATABASE_URL       primaire database (default sqlite:///audit_applicatie.db)
+      DATABASE_READ_URL  optionele read-replica voor routes met @read_replica.read_only
+      DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+      SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE
+    """
+    url = normalize_url(os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    app.config['DATABASE_READ_URL'] = normalize_url(os.environ.get('DATABASE_READ_URL') or '') or None
+    _active_pragmas.clear()
+    _active_pragmas.update(sqlite_pragmas())
+    app.config['SQLITE_PRAGMAS'] = dict(_active_pragmas)
+
+
+class RoutingSession(SignallingSession):
+    """Session die SELECT's naar de read-engine van de lopende request stuurt (zie ReadReplica)."""
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        engine = g.get('_read_engine') if has_app_context() else None
+        if engine is not None and not self._flushing and getattr(clause, 'is_select', False):
+            return engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+class ReadReplica:
+    """
+    Stuurt de SELECT's van read-only routes naar een aparte read-engine (DATABASE_READ_URL),
+    zodat lijst-/zoekverkeer onafhankelijk van de schrijvende database schaalt. Schrijfacties
+    blijven altijd op de primaire database. Zonder DATABASE_READ_URL is de decorator een no-op.
+    """
+    def __init__(self, app=None):
+        self._engine = None
+        self.url = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.url = app.config.get('DATABASE_READ_URL')
+
+    @property
+    def engine(self):
+        if self.url and self._engine is None:
+            self._engine = create_engine(self.url, **engine_options(self.url))
+        return self._engine
+
+    def read_only(self, f):
+        """Decorator: SELECT's in deze route (na de ACL-check) lopen via de read-engine."""
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not self.url:
+                return f(*args, **kwargs)
+            g._read_engine = self.engine
+            try:
+                return f(*args, **kwargs)
+            finally:
+                g._read_engine = None
+        return wrapper
@@ -0,0 +1,65 @@
+# documentstore.py
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+class DocumentTooLarge(Exception):
+    """De upload overschrijdt het ingestelde maximum."""
+
+
+class DocumentStore:
+    """
+    Content-addressed opslag van documenten op schijf: <root>/<ab>/<cd>/<sha256>.
+    Uploads worden in blokken gestreamd naar een tijdelijk bestand terwijl de SHA-256
+    wordt berekend, en daarna atomair op hun plek gezet. Identieke inhoud wordt maar
+    één keer opgeslagen, hoe vaak hij ook aan dossiers hangt.
+    """
+    def __init__(self, root, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def relative_path(self, sha256: str) -> str:
+        return os.path.join(sha256[:2], sha256[2:4], sha256)
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, self.relative_path(sha256))
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path_for(sha256))
+
+    def save_stream(self, stream, chunk_size=CHUNK_SIZE):
+        """
+        Leest stream blok voor blok (nooit het hele bestand in het geheugen).
+        Geeft (sha256, size, deduplicated) terug.
+        """
+        tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if self.max_bytes is not None and size > self.max_bytes:
+                        raise DocumentTooLarge()
+                    digest.update(chunk)
+                    out.write(chunk)
+            sha256 = digest.hexdigest()
+            target = self.path_for(sha256)
+            if os.path.exists(target):
+                os.remove(tmp_path)
+                return sha256, size, True
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)  # atomair; gelijktijdige upload van dezelfde inhoud is onschadelijk
+            return sha256, size, False
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -1,9 +1,34 @@
 # importer.py
+import argparse
 import csv
-import os
+import hashlib
 from bcrypt import hashpw, gensalt
-from models import db, SOC2FrameworkControl, ISO27001FrameworkControl, User, UserRole, Client, MasterControl, ContactPerson
-from app import app  # reuse the same Flask app & db
+from sqlalchemy import text
+from models import db, User, UserRole, Client, MasterControl, ContactPerson
+from app import app, migrate_schema, bump_catalog_version, refresh_control_mapping  # reuse the same Flask app & db
+
+SOC2_CSV = 'SOC2 framework.csv'
+ISO27001_CSV = 'ISO27001 framework.csv'
+BATCH_SIZE = 500
+
+# Framework -> (sleutelkolom, {modelkolom: CSV-header})
+FRAMEWORK_MAPPINGS = {
+    'SOC2': ('sub', {
+        'series': 'Series#',
+        'series_description': 'Series_description',
+        'tsc_series': 'TSC_serie',
+        'tsc_description_series': 'TSC_description_serie',
+        'sub': 'Sub',
+        'points_of_focus': 'Points of focus',
+    }),
+    'ISO27001': ('beheersmaatregel_id', {
+        'hoofdstuk': 'Hoofdstuk',
+        'naam_hoofdstuk': 'Naam_hoofdstuk',
+        'beheersmaatregel_id': 'Beheersmaatregel_ID',
+        'beheersmaatregel_naam': 'Beheersmaatregel_naam',
+        'beheersmaatregel_inhoud': 'Beheersmaatregel_inhoud',
+    }),
+}
 
 def create_initial_data():
     """Creëert de initiële admin-gebruiker en testklant."""
@@ -36,66 +61,138 @@ def create_initial_data():
                 client_id=test_client.id,
                 name="Jan van Veen",
                 email="jan.vanveen@testklant.nl",
-                phone_number="06-12345678",
-                is_primary=True
+                phone="06-12345678"
             )
             db.session.add(test_contact)
-            db.session.commit()
             print("Initial test client and contact person created.")
+        db.session.commit()
 
 
-def import_csv_to_db(filepath, model):
-    """Hulpfunctie om CSV-bestanden in de database te importeren."""
-    with open(filepath, 'r', encoding='utf-8') as file:
+def content_hash(framework, values):
+    """Stabiele SHA-256 over de geïmporteerde velden van één control."""
+    h = hashlib.sha256(framework.encode('utf-8'))
+    for key in sorted(values):
+        h.update(b'\x1f' + key.encode('utf-8') + b'=' + (values[key] or '').encode('utf-8'))
+    return h.hexdigest()
+
+
+def iter_framework_rows(filepath, framework):
+    """Leest een framework-CSV regel voor regel en levert dicts met modelkolommen."""
+    key_column, mapping = FRAMEWORK_MAPPINGS[framework]
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as file:
         reader = csv.DictReader(file, delimiter=';')
-        rows_to_add = []
+        missing = [h for h in mapping.values() if h not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{filepath}: ontbrekende kolommen {missing}")
         for row in reader:
-            if model.__name__ == 'MasterControl':
-                if filepath == 'SOC2 framework.csv':
-                    rows_to_add.append(MasterControl(
-                        framework="SOC2",
-                        series=row.get('Series'),
-                        series_description=row.get('Series description'),
-                        tsc_series=row.get('TSC Series'),
-                        tsc_description_series=row.get('TSC description Series'),
-                        sub=row.get('Sub'),
-                        points_of_focus=row.get('Points of focus')
-                    ))
-                else:  # ISO27001 file
-                    rows_to_add.append(MasterControl(
-                        framework="ISO27001",
-                        hoofdstuk=row.get('hoofdstuk'),
-                        naam_hoofdstuk=row.get('naam_hoofdstuk'),
-                        beheersmaatregel_id=row.get('beheersmaatregel_id'),
-                        beheersmaatregel_naam=row.get('beheersmaatregel_naam'),
-                        beheersmaatregel_inhoud=row.get('beheersmaatregel_inhoud')
-                    ))
-            else: # For specific framework tables
-                rows_to_add.append(model(**row))
-
-        db.session.bulk_save_objects(rows_to_add)
+            values = {col: (row.get(header) or '').strip() or None for col, header in mapping.items()}
+            if not values[key_column]:
+                continue  # lege regel of regel zonder control-ID
+            yield values
+
+
+def import_framework(filepath, framework, batch_size=BATCH_SIZE, progress=None):
+    """
+    Incrementele import van één framework-CSV in master_controls, gesleuteld op het
+    control-ID (SOC2: sub, ISO27001: beheersmaatregel_id). De CSV wordt gestreamd en
+    per batch met executemany weggeschreven; rijen met een ongewijzigde content_hash
+    worden overgeslagen. Bestaande id's blijven behouden, dus dossiers blijven intact.
+    Bij wijzigingen wordt de catalogusversie opgehoogd (in-memory catalogus van de app).
+    progress: optionele callback(counts), na iedere batch aangeroepen (achtergrondjobs).
+    Geeft tellingen terug: inserted / updated / unchanged.
+    """
+    key_column, mapping = FRAMEWORK_MAPPINGS[framework]
+    key_attr = getattr(MasterControl, key_column)
+    # Eén query: bestaande sleutels + hashes van dit framework (enkele honderden rijen)
+    existing = {
+        key: (mc_id, digest) for mc_id, key, digest in db.session.query(
+            MasterControl.id, key_attr, MasterControl.content_hash
+        ).filter(MasterControl.framework == framework)
+    }
+    columns = list(mapping)
+    insert_stmt = text(
+        f"INSERT INTO master_controls (framework, {', '.join(columns)}, content_hash) "
+        f"VALUES (:framework, {', '.join(':' + c for c in columns)}, :content_hash)"
+    )
+    update_stmt = text(
+        f"UPDATE master_controls SET {', '.join(f'{c} = :{c}' for c in columns)}, "
+        f"content_hash = :content_hash WHERE id = :id"
+    )
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    inserts, updates = [], []
+    seen = set()  # dubbele ID's in de CSV: eerste regel wint
+
+    def flush():
+        if inserts:
+            db.session.execute(insert_stmt, inserts)
+            counts["inserted"] += len(inserts)
+            inserts.clear()
+        if updates:
+            db.session.execute(update_stmt, updates)
+            counts["updated"] += len(updates)
+            updates.clear()
+
+    try:
+        for values in iter_framework_rows(filepath, framework):
+            key = values[key_column]
+            if key in seen:
+                continue
+            seen.add(key)
+            digest = content_hash(framework, values)
+            params = dict(values, framework=framework, content_hash=digest)
+            known = existing.get(key)
+            if known is None:
+                inserts.append(params)
+            elif known[1] == digest:
+                counts["unchanged"] += 1
+            else:
+                params['id'] = known[0]
+                updates.append(params)
+            if len(inserts) + len(updates) >= batch_size:
+                flush()
+                if progress:
+                    progress(counts)
+        flush()
+        if counts["inserted"] or counts["updated"]:
+            bump_catalog_version()  # zelfde transactie: app-processen herladen hun catalogus
         db.session.commit()
-        print(f"Imported {len(rows_to_add)} rows from {filepath} into {model.__name__}")
+    except Exception:
+        db.session.rollback()
+        raise
+    print(f"{framework} ({filepath}): {counts['inserted']} inserted, "
+          f"{counts['updated']} updated, {counts['unchanged']} unchanged")
+    return counts
 
-def main():
-    with app.app_context():
-        if os.path.exists("audit_applicatie.db"):
-            os.remove("audit_applicatie.db")
-            print("Existing database file removed.")
 
-        db.create_all()
-        print("Database schema created.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importeer SOC2/ISO27001 frameworks (incrementeel).")
+    parser.add_argument('--soc2', default=SOC2_CSV, help="pad naar de SOC2 CSV")
+    parser.add_argument('--iso27001', default=ISO27001_CSV, help="pad naar de ISO27001 CSV")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--skip-initial-data', action='store_true',
+                        help="geen admin-gebruiker / testklant aanmaken")
+    args = parser.parse_args(argv)
 
-        # Import CSVs
-        # import_csv_to_db('SOC2 framework.csv', SOC2FrameworkControl)
-        # import_csv_to_db('ISO27001 framework.csv', ISO27001FrameworkControl)
-        import_csv_to_db('SOC2 framework.csv', MasterControl)
-        import_csv_to_db('ISO27001 framework.csv', MasterControl)
+    with app.app_context():
+        # maakt alleen ontbrekende tabellen/kolommen aan; bestaande data blijft staan.
+        # De FTS5-index bestaat daarna al, zodat de triggers alle wijzigingen meenemen.
+        migrate_schema()
+        print("Database schema up-to-date.")
+
+        results = {
+            'SOC2': import_framework(args.soc2, 'SOC2', args.batch_size),
+            'ISO27001': import_framework(args.iso27001, 'ISO27001', args.batch_size),
+        }
+        # SOC2 <-> ISO27001 mapping-index: alleen gewijzigde controls opnieuw analyseren
+        stats = refresh_control_mapping()
+        if stats:
+            print(f"Mapping-index bijgewerkt: {stats['analyzed']} geanalyseerd, {stats['reused']} hergebruikt")
 
-        # Create initial data
+    if not args.skip_initial_data:
         create_initial_data()
-        
+
     print("Database initialization complete.")
+    return results
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,278 @@
+# jobs.py
+import datetime
+import inspect
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func, select, update
+from models import db, Job, JobStatus
+
+logger = logging.getLogger('toverstaf.jobs')
+
+
+class JobCancelled(Exception):
+    """Wordt in de handler opgegooid (via JobContext.progress) als de job geannuleerd is."""
+
+
+class JobContext:
+    """
+    Wordt aan de handler meegegeven. progress() werkt alleen het geheugen bij (goedkoop,
+    ook midden in een transactie); de dispatcher schrijft de voortgang periodiek weg.
+    """
+    def __init__(self, job_id: int, cancel_event: threading.Event, live: dict, user_id=None):
+        self.job_id = job_id
+        self.user_id = user_id      # Job.created_by: namens wie de job draait
+        self._cancel = cancel_event
+        self._live = live
+
+    def progress(self, done: int, total=None, message=None):
+        self._live['progress_done'] = done
+        if total is not None:
+            self._live['progress_total'] = total
+        if message is not None:
+            self._live['progress_message'] = message[:255]
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+
+class JobRunner:
+    """
+    Lichtgewicht job-systeem zonder externe broker: jobs staan in de tabel 'jobs', een
+    dispatcher-thread claimt ze (atomaire UPDATE, met een limiet per job-type over alle
+    processen) en voert ze uit in een thread-pool. Per tick worden voortgang en heartbeat
+    van de lopende jobs weggeschreven en annuleringen uit andere processen opgepikt; jobs van
+    een gestopt proces (geen heartbeat) worden op FAILED gezet.
+    """
+    def __init__(self, app=None):
+        self.app = None
+        self._handlers = {}       # job_type -> (handler, limit)
+        self._running = {}        # job_id -> (job_type, cancel Event, live dict)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pool = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKERS', 4)            # max. gelijktijdige jobs per proces
+        app.config.setdefault('JOB_POLL_INTERVAL', 1.0)    # seconden tussen dispatcher-ticks
+        app.config.setdefault('JOB_STALE_SECONDS', 120)    # zonder heartbeat -> FAILED
+        # False als alleen een aparte worker (flask run-jobs) jobs uitvoert, niet de webprocessen
+        app.config.setdefault('JOB_AUTOSTART', True)
+        self.app = app
+        self.max_workers = app.config['JOB_WORKERS']
+        self.poll_interval = app.config['JOB_POLL_INTERVAL']
+        self.stale_seconds = app.config['JOB_STALE_SECONDS']
+        self.autostart = app.config['JOB_AUTOSTART']
+        app.extensions['jobs'] = self
+        if self.autostart:
+            # Bij de eerste request van ieder (ge-forkt) proces, zodat jobs die na een herstart
+            # nog QUEUED staan of van een gestopt proces zijn niet op een nieuwe submit wachten
+            app.before_request(self._autostart)
+
+    def register(self, job_type: str, handler, limit: int = 1):
+        """handler(ctx, **params) -> JSON-serialiseerbaar resultaat."""
+        self._handlers[job_type] = (handler, limit)
+
+    @property
+    def job_types(self):
+        return sorted(self._handlers)
+
+    def check_params(self, job_type: str, params: dict):
+        """ValueError bij onbekende of ontbrekende parameters t.o.v. de signatuur van de handler."""
+        if job_type not in self._handlers:
+            raise ValueError(f"Onbekend job-type: {job_type}")
+        parameters = list(inspect.signature(self._handlers[job_type][0]).parameters.values())[1:]  # zonder ctx
+        if any(p.kind is p.VAR_KEYWORD for p in parameters):
+            return
+        names = {p.name for p in parameters if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)}
+        unknown = sorted(set(params) - names)
+        if unknown:
+            raise ValueError(f"Onbekende parameters voor {job_type}: {unknown}")
+        missing = [p.name for p in parameters if p.name in names and p.default is p.empty and p.name not in params]
+        if missing:
+            raise ValueError(f"Ontbrekende parameters voor {job_type}: {missing}")
+
+    # --- API voor routes ---
+    def submit(self, job_type: str, params=None, created_by=None, dossier_id=None) -> Job:
+        self.check_params(job_type, params or {})
+        job = Job(job_type=job_type, params=params or {}, created_by=created_by,
+                  dossier_id=dossier_id, status=JobStatus.QUEUED)
+        db.session.add(job)
+        db.session.commit()
+        if self.autostart:
+            self.start()
+        self._wake.set()
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        """Wachtend: direct CANCELLED. Lopend: cancel_requested, de handler stopt bij de volgende progress()."""
+        table = Job.__table__
+        now = datetime.datetime.now()
+        if db.session.execute(update(table).where(
+                table.c.id == job.id, table.c.status == JobStatus.QUEUED
+        ).values(status=JobStatus.CANCELLED, finished_at=now)).rowcount:
+            db.session.commit()
+            return True
+        requested = db.session.execute(update(table).where(
+            table.c.id == job.id, table.c.status == JobStatus.RUNNING
+        ).values(cancel_requested=True)).rowcount
+        db.session.commit()
+        with self._lock:
+            local = self._running.get(job.id)
+        if local:
+            local[1].set()
+        return bool(requested)
+
+    def live(self, job_id: int):
+        """Actuele (nog niet weggeschreven) voortgang als de job in dit proces draait."""
+        with self._lock:
+            local = self._running.get(job_id)
+            return dict(local[2]) if local else None
+
+    def stats(self):
+        with self._lock:
+            running = [job_type for job_type, _, _ in self._running.values()]
+        return {"worker": self.worker_id, "max_workers": self.max_workers,
+                "running": {t: running.count(t) for t in set(running)},
+                "limits": {t: limit for t, (_, limit) in self._handlers.items()}}
+
+    # --- Dispatcher ---
+    def _autostart(self):
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            self._thread = threading.Thread(target=self._loop, name='job-dispatcher', daemon=True)
+            self._thread.start()
+
+    def run_forever(self):
+        """Dispatcher in de voorgrond, voor een aparte worker (flask run-jobs)."""
+        self.start()
+        self._wake.set()
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    self.tick()
+            except Exception:
+                logger.exception("Job-dispatcher tick mislukt")
+
+    def tick(self):
+        self._sync_running()
+        self._reap_stale()
+        self._dispatch()
+
+    def _sync_running(self):
+        with self._lock:
+            snapshot = {job_id: (event, dict(live)) for job_id, (_, event, live) in self._running.items()}
+        if not snapshot:
+            return
+        table = Job.__table__
+        now = datetime.datetime.now()
+        with db.engine.begin() as conn:
+            for job_id, (_, live) in snapshot.items():
+                conn.execute(update(table).where(table.c.id == job_id).values(heartbeat_at=now, **live))
+            cancelled = conn.execute(select(table.c.id).where(
+                table.c.id.in_(list(snapshot)), table.c.cancel_requested.is_(True)
+            )).scalars().all()
+        for job_id in cancelled:
+            snapshot[job_id][0].set()
+
+    def _reap_stale(self):
+        table = Job.__table__
+        now = datetime.datetime.now()
+        with db.engine.begin() as conn:
+            conn.execute(update(table).where(
+                table.c.status == JobStatus.RUNNING,
+                table.c.heartbeat_at < now - datetime.timedelta(seconds=self.stale_seconds)
+            ).values(status=JobStatus.FAILED, finished_at=now, error="Worker gestopt (geen heartbeat)."))
+
+    def _dispatch(self):
+        table = Job.__table__
+        with self._lock:
+            free = self.max_workers - len(self._running)
+            local = [job_type for job_type, _, _ in self._running.values()]
+        if free <= 0 or not self._handlers:
+            return
+        with db.engine.connect() as conn:
+            queued = conn.execute(select(table.c.id, table.c.job_type, table.c.params, table.c.created_by).where(
+                table.c.status == JobStatus.QUEUED, table.c.job_type.in_(list(self._handlers))
+            ).order_by(table.c.id).limit(free * 4)).all()
+        for job_id, job_type, params, created_by in queued:
+            if free <= 0:
+                break
+            limit = self._handlers[job_type][1]
+            if local.count(job_type) >= limit or not self._claim(job_id, job_type, limit):
+                continue
+            free -= 1
+            local.append(job_type)
+            event, live = threading.Event(), {}
+            with self._lock:
+                self._running[job_id] = (job_type, event, live)
+            self._pool.submit(self._run, job_id, job_type, params or {}, event, live, created_by)
+
+    def _claim(self, job_id: int, job_type: str, limit: int) -> bool:
+        """
+        Atomair QUEUED -> RUNNING, alleen als er voor dit type (over alle processen) plek is.
+        Op SQLite serialiseert de UPDATE zelf (databaselock). Onder READ COMMITTED zouden twee
+        processen allebei 'running < limit' kunnen zien; daarom eerst een rijlock op alle
+        wachtende/lopende jobs van dit type (vaste volgorde), zodat claims per type na elkaar gaan.
+        """
+        table = Job.__table__
+        running = select(func.count()).select_from(table).where(
+            table.c.job_type == job_type, table.c.status == JobStatus.RUNNING
+        ).scalar_subquery()
+        now = datetime.datetime.now()
+        with db.engine.begin() as conn:
+            if conn.dialect.name != 'sqlite':
+                conn.execute(select(table.c.id).where(
+                    table.c.job_type == job_type, table.c.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+                ).order_by(table.c.id).with_for_update()).all()
+            return conn.execute(update(table).where(
+                table.c.id == job_id, table.c.status == JobStatus.QUEUED, running < limit
+            ).values(status=JobStatus.RUNNING, worker=self.worker_id, started_at=now,
+                     heartbeat_at=now)).rowcount == 1
+
+    def _run(self, job_id, job_type, params, event, live, created_by=None):
+        handler = self._handlers[job_type][0]
+        values = {}
+        with self.app.app_context():
+            db.session.info['audit_actor'] = created_by   # audittrail: namens de indiener
+            try:
+                result = handler(JobContext(job_id, event, live, user_id=created_by), **params)
+                values = dict(status=JobStatus.SUCCEEDED, result=result)
+            except JobCancelled:
+                db.session.rollback()
+                values = dict(status=JobStatus.CANCELLED)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("Job %s (%s) mislukt", job_id, job_type)
+                values = dict(status=JobStatus.FAILED, error=str(e)[:1000] or e.__class__.__name__)
+            finally:
+                with self._lock:
+                    self._running.pop(job_id, None)
+                table = Job.__table__
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(update(table).where(table.c.id == job_id).values(
+                            finished_at=datetime.datetime.now(), **live, **values
+                        ))
+                except Exception:
+                    logger.exception("Status van job %s kon niet worden opgeslagen", job_id)
+                self._wake.set()
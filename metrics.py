@@ -0,0 +1,143 @@
+# metrics.py
+import bisect
+import logging
+import threading
+import time
+from flask import g, request, Response, has_app_context, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('toverstaf.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500)
+
+
+class Histogram:
+    """Prometheus-achtige histogram per label (hier: endpoint), thread-safe, per proces."""
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                series["counts"][idx] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, series["counts"]):
+                    cumulative += n
+                    lines.append(f'{self.name}_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{endpoint="{label}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{endpoint="{label}"}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{endpoint="{label}"}} {series["count"]}')
+        return lines
+
+
+class RequestMetrics:
+    """
+    Meet per request de wandkloktijd, het aantal SQL-statements en de totale SQL-tijd
+    (Flask before/after_request + SQLAlchemy cursor-events), logt trage queries en
+    serveert alles als Prometheus-tekst op /metrics.
+    Waarden gelden per worker-proces.
+    """
+    def __init__(self, app=None):
+        self.request_duration = Histogram(
+            'toverstaf_request_duration_seconds', 'Wandkloktijd per request.', LATENCY_BUCKETS)
+        self.sql_queries = Histogram(
+            'toverstaf_request_sql_queries', 'Aantal SQL-statements per request.', QUERY_COUNT_BUCKETS)
+        self.sql_duration = Histogram(
+            'toverstaf_request_sql_duration_seconds', 'Totale SQL-tijd per request.', LATENCY_BUCKETS)
+        self.slow_queries = 0
+        self._collectors = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_TOKEN', None)      # indien gezet: vereist 'Authorization: Bearer <token>'
+        app.config.setdefault('SLOW_QUERY_MS', 200)
+        app.config.setdefault('SLOW_REQUEST_MS', 1000)
+        self.app = app
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def register_collector(self, fn):
+        """fn() -> lijst met extra Prometheus-regels (bijv. cache-tellers)."""
+        self._collectors.append(fn)
+
+    # --- Flask hooks ---
+    def _before_request(self):
+        g._metrics = {"start": time.perf_counter(), "queries": 0, "sql_time": 0.0}
+
+    def _after_request(self, response):
+        m = g.pop('_metrics', None)
+        if m is None or request.endpoint == 'metrics':
+            return response
+        elapsed = time.perf_counter() - m["start"]
+        endpoint = request.endpoint or 'unknown'
+        self.request_duration.observe(endpoint, elapsed)
+        self.sql_queries.observe(endpoint, m["queries"])
+        self.sql_duration.observe(endpoint, m["sql_time"])
+        if elapsed * 1000 >= self.app.config['SLOW_REQUEST_MS']:
+            logger.warning("Trage request %s %s: %.1f ms, %d queries (%.1f ms SQL)",
+                           request.method, request.path, elapsed * 1000, m["queries"], m["sql_time"] * 1000)
+        return response
+
+    # --- SQLAlchemy hooks ---
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_metrics_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        m = g.get('_metrics') if has_app_context() else None
+        if m is not None:
+            m["queries"] += 1
+            m["sql_time"] += elapsed
+        threshold = self.app.config['SLOW_QUERY_MS']
+        if threshold is not None and elapsed * 1000 >= threshold:
+            with self._lock:
+                self.slow_queries += 1
+            endpoint = request.endpoint if m is not None else None
+            logger.warning("Trage query (%.1f ms, endpoint=%s): %s",
+                           elapsed * 1000, endpoint, ' '.join(statement.split())[:1000])
+
+    # --- /metrics ---
+    def render(self):
+        lines = []
+        for hist in (self.request_duration, self.sql_queries, self.sql_duration):
+            lines.extend(hist.render())
+        lines += ["# HELP toverstaf_slow_queries_total Aantal queries boven SLOW_QUERY_MS.",
+                  "# TYPE toverstaf_slow_queries_total counter",
+                  f"toverstaf_slow_queries_total {self.slow_queries}"]
+        for fn in self._collectors:
+            lines.extend(fn())
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        if not self.app.config['METRICS_ENABLED']:
+            abort(404)
+        token = self.app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f"Bearer {token}":
+            abort(401)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
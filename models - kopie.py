@@ -1,11 +1,11 @@
 # models.py
 import datetime
 import enum
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Boolean, UniqueConstraint
+from dbconfig import RoutingSQLAlchemy
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Boolean, UniqueConstraint, Index, JSON, func
 from sqlalchemy.orm import relationship
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()  # Flask-SQLAlchemy met optionele read-replica-routing
 
 # ----------------------------
 # ENUMS
@@ -35,6 +35,40 @@ class TaskStatus(enum.Enum):
     IN_UITVOERING = "in_uitvoering"
     VOLTOOID = "voltooid"
 
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class Permission(enum.IntFlag):
+    """Dossierpermissies als bits, zodat de ACL-check in SQL kan (perm_mask & bit)."""
+    VIEW = 1
+    EDIT = 2
+    MANAGE = 4
+    REQUEST_DELETE = 8
+    REVIEW_1 = 16
+    REVIEW_2 = 32
+    APPROVE_DOCUMENT = 64
+    DELETE = 128
+
+def perms_to_mask(names):
+    """Zet een lijst of CSV-string met permissienamen om naar een bitmask (onbekende namen worden genegeerd)."""
+    if isinstance(names, str):
+        names = names.split(',')
+    mask = 0
+    for name in names or []:
+        name = (name or '').strip()
+        if name in Permission.__members__:
+            mask |= Permission[name]
+    return int(mask)
+
+def mask_to_perms(mask):
+    """Zet een bitmask terug om naar een gesorteerde lijst permissienamen."""
+    mask = int(mask or 0)
+    return sorted(p.name for p in Permission if mask & p)
+
 # ----------------------------
 # MODELS
 # ----------------------------
@@ -53,6 +87,13 @@ class User(db.Model):
     dossier_notes = relationship('DossierNote', back_populates='author')
     dossier_tasks = relationship('DossierTask', back_populates='assigned_to_user')
 
+    __table_args__ = (
+        # e-mail wordt hoofdletterongevoelig opgezocht (login/aanvraag), naam/e-mail prefix-gezocht
+        Index('ix_users_email_lower', func.lower(email)),
+        Index('ix_users_name_lower', func.lower(name)),
+        Index('ix_users_role_approved', 'role', 'is_approved'),
+    )
+
     def __repr__(self):
         return f"<User(name='{self.name}', role='{self.role.value}')>"
 
@@ -98,6 +139,14 @@ class Dossier(db.Model):
     closed_date = Column(DateTime, nullable=True)
     client_id = Column(Integer, ForeignKey('clients.id'))
     created_by_user_id = Column(Integer, ForeignKey('users.id'))
+    # Dossier van vorig jaar waaruit dit dossier is doorgerold (zie roll_forward_dossier)
+    previous_dossier_id = Column(Integer, ForeignKey('dossiers.id'), nullable=True)
+    # Koude archivering: de onderliggende rijen staan dan in <ARCHIVE_PATH>/<archive_file> en
+    # deze rij is alleen nog een stub (zie archive_dossier / restore_dossier)
+    archived_at = Column(DateTime, nullable=True)
+    archive_file = Column(String, nullable=True)
+    archive_sha256 = Column(String(64), nullable=True)
+    restored_at = Column(DateTime, nullable=True)
 
     # Relaties
     client = relationship('Client', back_populates='dossiers')
@@ -107,9 +156,21 @@ class Dossier(db.Model):
     dossier_client_controls = relationship('DossierClientControl', back_populates='dossier')
     created_by_user = relationship('User', foreign_keys=[created_by_user_id])
 
+    __table_args__ = (
+        # keyset-paginatie op (start_date, id) en filter op klant
+        Index('ix_dossiers_start_date_id', 'start_date', 'id'),
+        Index('ix_dossiers_client_id', 'client_id'),
+    )
+
     def __repr__(self):
         return f"<Dossier(title='{self.title}')>"
 
+class DossierNumberSequence(db.Model):
+    """Teller per dag voor dossiernummers (D-YYYYMMDD-NNNN), atomair opgehoogd bij het aanmaken."""
+    __tablename__ = 'dossier_number_sequences'
+    day = Column(String(8), primary_key=True)  # 'YYYYMMDD'
+    last_value = Column(Integer, nullable=False, default=0)
+
 class DossierControl(db.Model):
     __tablename__ = 'dossier_controls'
     id = Column(Integer, primary_key=True)
@@ -118,11 +179,17 @@ class DossierControl(db.Model):
     status = Column(Enum(ControlStatus), default=ControlStatus.OPEN)
     review_status = Column(String)  # 'open', '1st_review', '2nd_review', 'final'
     comments = Column(String)
+    # Werkprogramma-antwoorden als {vraag_id: antwoord} (zie questionnaire.py), één kolom i.p.v. rij per antwoord
+    answers = Column(JSON)
 
     # Relaties
     dossier = relationship('Dossier', back_populates='controls')
     master_control = relationship('MasterControl')
 
+    __table_args__ = (
+        UniqueConstraint('dossier_id', 'master_control_id', name='uq_dossier_control'),
+    )
+
     def __repr__(self):
         return f"<DossierControl(dossier_id='{self.dossier_id}', control_id='{self.master_control_id}')>"
 
@@ -139,7 +206,8 @@ class DossierNote(db.Model):
     author = relationship('User', back_populates='dossier_notes')
 
     def __repr__(self):
-        return f"<DossierNote(id='{self.id}', author='{self.author.name}')>"
+        # geen self.author: dat zou per repr een lazy load (N+1) veroorzaken
+        return f"<DossierNote(id='{self.id}', author_id='{self.author_id}')>"
 
 class DossierDocument(db.Model):
     __tablename__ = 'dossier_documents'
@@ -147,7 +215,10 @@ class DossierDocument(db.Model):
     dossier_id = Column(Integer, ForeignKey('dossiers.id'))
     uploaded_by_user_id = Column(Integer, ForeignKey('users.id'))
     filename = Column(String, nullable=False)
-    file_path = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)  # pad van de blob, relatief t.o.v. de DocumentStore
+    sha256 = Column(String(64), index=True)     # content-adres; meerdere documenten kunnen één blob delen
+    size = Column(Integer)
+    content_type = Column(String)
     uploaded_at = Column(DateTime, default=datetime.datetime.now)
 
     # Relaties
@@ -164,18 +235,23 @@ class DossierClientControl(db.Model):
     master_control_id = Column(Integer, ForeignKey('master_controls.id'), nullable=False)
     client_response = Column(String)
     client_comment = Column(String)
+    answers = Column(JSON)  # {vraag_id: antwoord}
 
     # Relaties
     dossier = relationship('Dossier', back_populates='dossier_client_controls')
     master_control = relationship('MasterControl', foreign_keys=[master_control_id])
 
+    __table_args__ = (
+        UniqueConstraint('dossier_id', 'master_control_id', name='uq_dossier_client_control'),
+    )
+
     def __repr__(self):
         return f"<DossierClientControl(dossier_id={self.dossier_id}, control_id={self.master_control_id})>"
 
 class MasterControl(db.Model):
     __tablename__ = 'master_controls'
     id = Column(Integer, primary_key=True)
-    framework = Column(String, nullable=False)
+    framework = Column(String, nullable=False, index=True)
 
     # SOC2 velden
     series = Column(String, nullable=True)
@@ -192,9 +268,98 @@ class MasterControl(db.Model):
     beheersmaatregel_naam = Column(String, nullable=True)
     beheersmaatregel_inhoud = Column(String, nullable=True)
 
+    # SHA-256 over de geïmporteerde velden; de importer slaat ongewijzigde rijen hiermee over
+    content_hash = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        Index('ix_master_controls_framework_sub', 'framework', 'sub'),
+        Index('ix_master_controls_framework_bm_id', 'framework', 'beheersmaatregel_id'),
+    )
+
     def __repr__(self):
         return f"<MasterControl(framework='{self.framework}', id='{self.id}')>"
 
+class Job(db.Model):
+    """Achtergrondtaak (import, scoping, export, ...), uitgevoerd door de JobRunner (jobs.py)."""
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True)
+    job_type = Column(String(50), nullable=False)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    params = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    progress_message = Column(String(255), nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    worker = Column(String(100), nullable=True)       # host:pid van het proces dat de job uitvoert
+    created_by = Column(Integer, ForeignKey('users.id'), nullable=True)
+    dossier_id = Column(Integer, ForeignKey('dossiers.id'), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_jobs_status_type', 'status', 'job_type'),
+        Index('ix_jobs_created_by_id', 'created_by', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, type='{self.job_type}', status='{self.status}')>"
+
+class AuditEvent(db.Model):
+    """
+    Append-only audittrail (wie wijzigde wat, wanneer). Wordt via de write-behind buffer in
+    audit.py in batches weggeschreven; op SQLite voorkomen triggers UPDATE/DELETE.
+    """
+    __tablename__ = 'audit_events'
+    id = Column(Integer, primary_key=True)
+    occurred_at = Column(DateTime, nullable=False)
+    actor_id = Column(Integer, nullable=True)           # geen FK: events blijven ook na verwijderen
+    action = Column(String(50), nullable=False)         # bijv. 'dossier_acl.perm_mask', 'users.role'
+    entity_type = Column(String(50), nullable=False)
+    entity_id = Column(Integer, nullable=True)
+    dossier_id = Column(Integer, nullable=True)
+    subject_user_id = Column(Integer, nullable=True)    # de gebruiker waar het event over gaat
+    old_value = Column(JSON, nullable=True)
+    new_value = Column(JSON, nullable=True)
+    ip = Column(String(45), nullable=True)
+
+    __table_args__ = (
+        Index('ix_audit_events_time', 'occurred_at', 'id'),
+        Index('ix_audit_events_dossier_time', 'dossier_id', 'occurred_at', 'id'),
+        Index('ix_audit_events_actor_time', 'actor_id', 'occurred_at', 'id'),
+        Index('ix_audit_events_subject_time', 'subject_user_id', 'occurred_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<AuditEvent(id={self.id}, action='{self.action}', entity_id={self.entity_id})>"
+
+class DossierChange(db.Model):
+    """
+    Change feed per dossier: één rij per wijziging (via SQLite-triggers), id is de cursor.
+    Bevat alleen verwijzingen; de actuele gegevens worden bij het ophalen erbij gezocht.
+    """
+    __tablename__ = 'dossier_changes'
+    id = Column(Integer, primary_key=True)
+    dossier_id = Column(Integer, nullable=False)
+    entity = Column(String(20), nullable=False)      # 'note', 'control', 'acl', 'task', 'document'
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)          # 'insert', 'update', 'delete'
+    changed_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+    __table_args__ = (
+        Index('ix_dossier_changes_dossier_id', 'dossier_id', 'id'),
+    )
+
+class CatalogVersion(db.Model):
+    """Versieteller van referentiedata (o.a. 'master_controls'); de importer hoogt hem op bij wijzigingen."""
+    __tablename__ = 'catalog_versions'
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+
 class SOC2FrameworkControl(db.Model):
     __tablename__ = 'soc2_framework_controls'
     id = Column(Integer, primary_key=True)
@@ -229,6 +394,34 @@ class DossierTask(db.Model):
     dossier = relationship('Dossier')
     assigned_to_user = relationship('User', back_populates='dossier_tasks')
 
+class DossierProgress(db.Model):
+    """
+    Voorberekende voortgangstellers per dossier voor het dashboard. Wordt incrementeel
+    bijgehouden door triggers op dossier_controls / dossier_tasks / dossier_client_controls
+    (zie ensure_progress_triggers) en kan volledig herbouwd worden (rebuild_dossier_progress).
+    """
+    __tablename__ = 'dossier_progress'
+    dossier_id = Column(Integer, ForeignKey('dossiers.id'), primary_key=True)
+
+    controls_total = Column(Integer, nullable=False, default=0, server_default='0')
+    controls_open = Column(Integer, nullable=False, default=0, server_default='0')
+    controls_in_uitvoering = Column(Integer, nullable=False, default=0, server_default='0')
+    controls_afgerond = Column(Integer, nullable=False, default=0, server_default='0')
+    controls_niet_van_toepassing = Column(Integer, nullable=False, default=0, server_default='0')
+
+    review_open = Column(Integer, nullable=False, default=0, server_default='0')      # review_status NULL of 'open'
+    review_1st = Column(Integer, nullable=False, default=0, server_default='0')
+    review_2nd = Column(Integer, nullable=False, default=0, server_default='0')
+    review_final = Column(Integer, nullable=False, default=0, server_default='0')
+
+    tasks_total = Column(Integer, nullable=False, default=0, server_default='0')
+    tasks_open = Column(Integer, nullable=False, default=0, server_default='0')       # alles behalve VOLTOOID
+
+    client_controls_total = Column(Integer, nullable=False, default=0, server_default='0')
+    client_responses_received = Column(Integer, nullable=False, default=0, server_default='0')
+
+    dossier = relationship('Dossier')
+
 # === NIEUW: Per-dossier ACL ===================================================
 class DossierACL(db.Model):
     __tablename__ = 'dossier_acl'
@@ -237,7 +430,11 @@ class DossierACL(db.Model):
     dossier_id = Column(Integer, ForeignKey('dossiers.id'), nullable=False)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
 
-    # CSV met permissies, bijv: "VIEW,EDIT,MANAGE,REQUEST_DELETE"
+    # Permissies als bitmask (zie Permission), bijv. VIEW|EDIT = 3
+    perm_mask = Column(Integer, nullable=False, default=0)
+
+    # LEGACY: CSV met permissies, bijv: "VIEW,EDIT,MANAGE,REQUEST_DELETE".
+    # Wordt alleen nog gelezen door migrate_acl_to_bitmask() en daarna leeggemaakt.
     permissions = Column(String, nullable=False, default='')
 
     granted_by_user_id = Column(Integer, ForeignKey('users.id'))
@@ -249,4 +446,10 @@ class DossierACL(db.Model):
 
     __table_args__ = (
         UniqueConstraint('dossier_id', 'user_id', name='uq_dossier_user'),
+        # "Welke dossiers mag gebruiker X zien" start bij user_id
+        Index('ix_dossier_acl_user_dossier', 'user_id', 'dossier_id', 'perm_mask'),
     )
+
+    @property
+    def permission_names(self):
+        return mask_to_perms(self.perm_mask)
@@ -0,0 +1,88 @@
+# passwords.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from bcrypt import checkpw, hashpw, gensalt
+
+
+class HasherBusy(Exception):
+    """De hash-pool en de wachtrij zijn vol (of de hash duurde te lang); de aanroeper moet 503 teruggeven."""
+
+
+class PasswordHasher:
+    """
+    bcrypt-hashing in een begrensde thread-pool (bcrypt geeft de GIL vrij tijdens het rekenen).
+    Maximaal max_workers hashes tegelijk en max_queue wachtenden; daarboven direct HasherBusy,
+    zodat een piek aan logins de overige routes niet uithongert.
+    """
+    def __init__(self, rounds=12, max_workers=4, max_queue=32, timeout=30):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._stats = {
+            op: {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            for op in ('hash', 'verify')
+        }
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _run(self, op, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Het slot komt pas vrij als bcrypt echt klaar is, ook als de aanroeper na een timeout
+        # al is opgegeven; anders rekenen er meer hashes dan workers + wachtrij.
+        future.add_done_callback(lambda f: self._release(op, start))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy() from None
+
+    def _release(self, op=None, start=None):
+        self._slots.release()
+        with self._lock:
+            self.in_flight -= 1
+            if op is not None:
+                elapsed = (time.perf_counter() - start) * 1000
+                s = self._stats[op]
+                s["count"] += 1
+                s["total_ms"] += elapsed
+                s["max_ms"] = max(s["max_ms"], elapsed)
+
+    def hash(self, password: str) -> str:
+        salt = gensalt(rounds=self.rounds)
+        return self._run('hash', hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            return self._run('verify', checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:  # ongeldige/lege hash in de database
+            return False
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True als de hash met een andere work factor is gemaakt dan nu geconfigureerd."""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    def stats(self):
+        with self._lock:
+            ops = {
+                op: dict(s, avg_ms=round(s["total_ms"] / s["count"], 2) if s["count"] else None,
+                         total_ms=round(s["total_ms"], 2), max_ms=round(s["max_ms"], 2))
+                for op, s in self._stats.items()
+            }
+            return {"rounds": self.rounds, "in_flight": self.in_flight,
+                    "rejected": self.rejected, "ops": ops}
@@ -0,0 +1,155 @@
+# questionnaire.py
+import csv
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+QUESTION_MARKER = 'Vraag'
+CHOICE_MARKER = 'Methodiek'
+
+
+class QuestionnaireUnavailable(Exception):
+    """Het vragenlijst-CSV ontbreekt; de aanroeper moet 503 teruggeven."""
+
+
+@dataclass(frozen=True)
+class Question:
+    id: str                         # stabiel: hash van sectietitel + vraagtekst, niet van de positie
+    text: str                       # eerste regel van de vraag
+    help: Optional[str] = None      # eventuele toelichting (volgende regels)
+    kind: str = 'text'              # 'text' of 'choice'
+    options: Tuple[str, ...] = ()
+
+    def to_dict(self):
+        d = {'id': self.id, 'text': self.text, 'kind': self.kind}
+        if self.help:
+            d['help'] = self.help
+        if self.options:
+            d['options'] = list(self.options)
+        return d
+
+
+@dataclass(frozen=True)
+class Section:
+    id: str
+    title: str
+    group: Optional[str]
+    questions: Tuple[Question, ...]
+
+    def to_dict(self):
+        return {'id': self.id, 'title': self.title, 'group': self.group,
+                'questions': [q.to_dict() for q in self.questions]}
+
+
+@dataclass(frozen=True)
+class QuestionnaireTemplate:
+    version: str                    # hash over alle vraag-ID's; wijzigt alleen als de vragenset wijzigt
+    sections: Tuple[Section, ...]
+
+    @property
+    def questions(self):
+        return {q.id: q for s in self.sections for q in s.questions}
+
+    def to_dict(self):
+        return {'version': self.version, 'sections': [s.to_dict() for s in self.sections]}
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(text.split()).lower()
+
+
+def _stable_id(prefix: str, *parts: str) -> str:
+    digest = hashlib.sha1('\n'.join(_normalize(p) for p in parts).encode('utf-8')).hexdigest()
+    return f"{prefix}_{digest[:10]}"
+
+
+def _question(section_title: str, raw: str) -> Question:
+    lines = [line.strip() for line in raw.strip().strip('"').splitlines() if line.strip()]
+    return Question(
+        id=_stable_id('q', section_title, raw),
+        text=lines[0],
+        help='\n'.join(lines[1:]) or None
+    )
+
+
+def _blocks(path):
+    """Leest de CSV (één tekstveld per regel, komma's zijn geen scheidingsteken) als blokken tussen lege regels."""
+    block = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.reader(f):
+            value = ','.join(row).strip()
+            if not value:
+                if block:
+                    yield block
+                block = []
+                continue
+            block.append(value)
+    if block:
+        yield block
+
+
+def parse_questionnaire(path) -> QuestionnaireTemplate:
+    """
+    Zet de '2025_lijst tbv app_taken per control'-CSV om naar een onveranderlijke template.
+    Een blok dat met 'Vraag' begint bevat vragen voor de lopende sectie, een blok met
+    'Methodiek' een keuzelijst; elk ander blok opent een nieuwe sectie (titel + evt. vragen).
+    Een sectie zonder vragen wordt de groepstitel van de volgende sectie.
+    """
+    sections = []   # [title, group, [questions]]
+    for block in _blocks(path):
+        head, rest = block[0], block[1:]
+        if head == QUESTION_MARKER and sections:
+            sections[-1][2].extend(_question(sections[-1][0], q) for q in rest)
+        elif head == CHOICE_MARKER and sections:
+            title = sections[-1][0]
+            sections[-1][2].append(Question(
+                id=_stable_id('q', title, head), text=head, kind='choice', options=tuple(rest)
+            ))
+        else:
+            group = None
+            if sections and not sections[-1][2]:
+                group = sections.pop()[0]
+            if rest and rest[0] == QUESTION_MARKER:
+                rest = rest[1:]
+            sections.append([head, group, [_question(head, q) for q in rest]])
+
+    compiled = tuple(
+        Section(id=_stable_id('s', title), title=title, group=group, questions=tuple(questions))
+        for title, group, questions in sections if questions
+    )
+    version = hashlib.sha1(
+        ','.join(q.id for s in compiled for q in s.questions).encode('utf-8')
+    ).hexdigest()[:12]
+    return QuestionnaireTemplate(version=version, sections=compiled)
+
+
+@lru_cache(maxsize=None)
+def load_questionnaire(path) -> QuestionnaireTemplate:
+    """Eén keer per proces parsen; daarna altijd dezelfde (onveranderlijke) template."""
+    if not os.path.exists(path):
+        raise QuestionnaireUnavailable(f"Vragenlijst niet gevonden: {path}")
+    return parse_questionnaire(path)
+
+
+def validate_answers(template: QuestionnaireTemplate, answers):
+    """Geeft een lijst met foutmeldingen terug (leeg = geldig)."""
+    if not isinstance(answers, dict):
+        return ["answers moet een object {vraag_id: antwoord} zijn."]
+    questions = template.questions
+    errors = []
+    for qid, value in answers.items():
+        q = questions.get(qid)
+        if q is None:
+            errors.append(f"Onbekende vraag: {qid}")
+        elif value is None:
+            continue  # None = antwoord wissen
+        elif q.kind == 'choice':
+            values = value if isinstance(value, list) else [value]
+            bad = [v for v in values if v not in q.options]
+            if bad:
+                errors.append(f"Ongeldige keuze voor {qid}: {bad}")
+        elif not isinstance(value, (str, int, float, bool)):
+            errors.append(f"Antwoord op {qid} moet tekst, getal of ja/nee zijn.")
+    return errors
@@ -0,0 +1,191 @@
+# tests/test_acl.py
+import time
+
+import pytest
+
+import app as A
+from models import db, DossierACL, Permission, perms_to_mask, mask_to_perms, UserRole
+
+from conftest import login
+
+
+def test_perms_to_mask_and_back():
+    assert perms_to_mask(['VIEW', 'EDIT']) == Permission.VIEW | Permission.EDIT == 3
+    assert perms_to_mask('VIEW, MANAGE') == 5
+    assert perms_to_mask(['VIEW', 'ONBEKEND', None]) == 1
+    assert perms_to_mask(None) == 0
+    assert mask_to_perms(3) == ['EDIT', 'VIEW']
+    assert mask_to_perms(0) == []
+    assert mask_to_perms(perms_to_mask(['REVIEW_2', 'DELETE'])) == ['DELETE', 'REVIEW_2']
+
+
+def test_sql_mask_check(make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    d1, d2 = make_dossier(owner), make_dossier(owner)
+    db.session.add_all([
+        DossierACL(dossier_id=d1.id, user_id=member.id, perm_mask=perms_to_mask(['VIEW'])),
+        DossierACL(dossier_id=d2.id, user_id=member.id, perm_mask=perms_to_mask(['VIEW', 'EDIT'])),
+    ])
+    db.session.commit()
+
+    def visible(needed):
+        return sorted(d.id for d in A.dossiers_with_permission_query(member.id, needed))
+
+    assert visible('VIEW') == [d1.id, d2.id]
+    assert visible('EDIT') == [d2.id]
+    assert visible(['VIEW', 'MANAGE']) == []
+    assert A.has_dossier_permission(member.id, d2.id, ['VIEW', 'EDIT'])
+    assert not A.has_dossier_permission(member.id, d1.id, 'EDIT')
+
+
+def test_legacy_csv_permissions_are_migrated(make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    d = make_dossier(owner)
+    db.session.add(DossierACL(dossier_id=d.id, user_id=member.id, permissions='VIEW,EDIT', perm_mask=0))
+    db.session.commit()
+    A.migrate_acl_to_bitmask()
+    db.session.expire_all()
+    assert mask_to_perms(DossierACL.query.filter_by(user_id=member.id).one().perm_mask) == ['EDIT', 'VIEW']
+
+
+def test_permission_cache_invalidation():
+    cache = A.PermissionCache(maxsize=10, ttl=60)
+    for key in [(1, 1), (1, 2), (2, 1)]:
+        cache.set(key, 7)
+    assert cache.get((1, 2)) == 7
+    assert cache.invalidate(user_id=1, dossier_id=2) == 1
+    assert cache.get((1, 2)) is None
+    cache.set((1, 2), 7)
+    assert cache.invalidate(user_id=1) == 2
+    assert cache.get((2, 1)) == 7
+    assert cache.invalidate(dossier_id=1) == 1
+    assert cache.stats()['size'] == 0
+
+
+def test_permission_cache_ttl_and_size():
+    cache = A.PermissionCache(maxsize=2, ttl=0.01)
+    cache.set((1, 1), 1)
+    cache.set((1, 2), 1)
+    cache.set((1, 3), 1)
+    assert cache.stats()['size'] == 2
+    time.sleep(0.02)
+    assert cache.get((1, 3)) is None
+
+
+def test_acl_change_invalidates_cached_mask(client, make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    d = make_dossier(owner)
+    assert A.get_dossier_mask(member.id, d.id) == 0  # nu gecachet als 0
+    login(client, owner)
+    client.post(f"/dossiers/{d.id}/acl", data={'user_id': member.id, 'perms': ['VIEW']})
+    assert A.get_dossier_mask(member.id, d.id) == perms_to_mask(['VIEW'])
+
+
+def test_bulk_acl_invalidates_cached_mask(make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    d = make_dossier(owner)
+    assert A.get_dossier_mask(member.id, d.id) == 0
+    A.bulk_update_acl(owner.id, [member.id], [d.id], ['VIEW'], mode='add')
+    assert A.get_dossier_mask(member.id, d.id) == perms_to_mask(['VIEW'])
+
+
+def test_permission_cache_sync():
+    cache = A.PermissionCache(maxsize=10, ttl=60)
+    assert not cache.sync(1)  # eerste versie: niets te legen
+    cache.set((1, 1), 7)
+    assert not cache.sync(1) and cache.get((1, 1)) == 7
+    assert cache.sync(2)
+    assert cache.get((1, 1)) is None
+
+
+def test_acl_change_in_other_process_reaches_cache(make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    d = make_dossier(owner)
+    assert A.get_dossier_mask(member.id, d.id) == 0
+
+    # Een andere worker wijzigt de ACL: alleen de database en de gedeelde versie veranderen.
+    db.session.add(DossierACL(dossier_id=d.id, user_id=member.id, perm_mask=perms_to_mask(['VIEW'])))
+    A.bump_catalog_version(A.ACL_CATALOG)
+    db.session.commit()
+    assert A.get_dossier_mask(member.id, d.id) == 0  # zelfde request: memo
+
+    A.g.pop('_acl_masks')  # volgende request
+    assert A.get_dossier_mask(member.id, d.id) == perms_to_mask(['VIEW'])
+
+
+def test_invalidation_publishes_acl_version(make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    d = make_dossier(owner)
+    before = A.catalog_version(A.ACL_CATALOG)
+    A.bulk_update_acl(owner.id, [member.id], [d.id], ['VIEW'], mode='add')
+    assert A.catalog_version(A.ACL_CATALOG) == before + 1
+    A.invalidate_dossier_permissions(user_id=member.id)
+    assert A.catalog_version(A.ACL_CATALOG) == before + 2
+
+
+def _masks(dossier_ids, user_ids):
+    rows = DossierACL.query.filter(DossierACL.dossier_id.in_(dossier_ids), DossierACL.user_id.in_(user_ids))
+    return {(r.dossier_id, r.user_id): mask_to_perms(r.perm_mask) for r in rows}
+
+
+def test_bulk_acl_add_remove_replace(make_user, make_dossier):
+    owner = make_user('Eigenaar')
+    a, b = make_user('A', UserRole.TEAMLID), make_user('B', UserRole.TEAMLID)
+    d1, d2 = make_dossier(owner), make_dossier(owner)
+    users, dossiers = [a.id, b.id], [d1.id, d2.id]
+
+    result = A.bulk_update_acl(owner.id, users, dossiers, ['VIEW'], mode='add')
+    assert result['changed'] == 4
+    result = A.bulk_update_acl(owner.id, users, dossiers, ['VIEW', 'EDIT'], mode='add')
+    assert result['changed'] == 4
+    assert set(map(tuple, _masks(dossiers, users).values())) == {('EDIT', 'VIEW')}
+
+    result = A.bulk_update_acl(owner.id, [a.id], dossiers, ['EDIT'], mode='remove')
+    assert result['changed'] == 2
+    assert _masks(dossiers, [a.id]) == {(d1.id, a.id): ['VIEW'], (d2.id, a.id): ['VIEW']}
+
+    result = A.bulk_update_acl(owner.id, [b.id], [d1.id], ['MANAGE'], mode='replace')
+    assert result['diff'] == [{"dossier_id": d1.id, "user_id": b.id, "before": ['EDIT', 'VIEW'], "after": ['MANAGE']}]
+    assert _masks([d1.id], [b.id]) == {(d1.id, b.id): ['MANAGE']}
+
+    # Opnieuw hetzelfde: niets te doen
+    assert A.bulk_update_acl(owner.id, [b.id], [d1.id], ['MANAGE'], mode='replace')['changed'] == 0
+
+
+def test_bulk_acl_dry_run_and_permissions(make_user, make_dossier):
+    owner, other = make_user('Eigenaar'), make_user('Ander')
+    member = make_user('Lid', UserRole.TEAMLID)
+    d, foreign = make_dossier(owner), make_dossier(other)
+
+    result = A.bulk_update_acl(owner.id, [member.id], [d.id], ['VIEW'], dry_run=True)
+    assert result['changed'] == 1 and result['dry_run']
+    assert _masks([d.id], [member.id]) == {}
+
+    with pytest.raises(PermissionError):
+        A.bulk_update_acl(owner.id, [member.id], [d.id, foreign.id], ['VIEW'])
+    with pytest.raises(ValueError):
+        A.bulk_update_acl(owner.id, [member.id], [d.id], ['VIEW'], mode='toggle')
+    with pytest.raises(ValueError):
+        A.bulk_update_acl(owner.id, [member.id], [d.id], [], mode='add')
+
+
+def test_bulk_acl_empty_replace_deletes_rows(make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    d1, d2 = make_dossier(owner), make_dossier(owner)
+    A.bulk_update_acl(owner.id, [member.id], [d1.id], ['VIEW'], mode='add')
+
+    result = A.bulk_update_acl(owner.id, [member.id], [d1.id, d2.id], [], mode='replace')
+    assert result['changed'] == 1 and result['unchanged'] == 1
+    assert result['diff'] == [{"dossier_id": d1.id, "user_id": member.id, "before": ['VIEW'], "after": []}]
+    assert _masks([d1.id, d2.id], [member.id]) == {}
+    assert A.get_dossier_mask(member.id, d1.id) == 0
+
+
+def test_bulk_acl_remove_last_permission_deletes_row(make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    d = make_dossier(owner)
+    A.bulk_update_acl(owner.id, [member.id], [d.id], ['VIEW', 'EDIT'], mode='add')
+    A.bulk_update_acl(owner.id, [member.id], [d.id], ['EDIT'], mode='remove')
+    assert _masks([d.id], [member.id]) == {(d.id, member.id): ['VIEW']}
+    A.bulk_update_acl(owner.id, [member.id], [d.id], ['VIEW'], mode='remove')
+    assert _masks([d.id], [member.id]) == {}
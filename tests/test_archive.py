@@ -0,0 +1,154 @@
+# tests/test_archive.py
+import os
+
+import pytest
+
+import app as A
+from models import (
+    db, Dossier, DossierStatus, DossierNote, DossierTask, DossierDocument, DossierControl,
+    DossierProgress, ControlStatus, TaskStatus
+)
+from sqlalchemy import select
+
+from conftest import login
+
+
+def _snapshot(dossier_id):
+    result = {}
+    for model in A.ARCHIVE_TABLES:
+        table = model.__table__
+        result[table.name] = sorted(tuple(row) for row in db.session.execute(
+            select(table).where(table.c.dossier_id == dossier_id)))
+    return result
+
+
+@pytest.fixture
+def archived_dossier(make_user, make_dossier, soc2_controls):
+    owner = make_user()
+    d = make_dossier(owner, status=DossierStatus.GEARCHIVEERD)
+    A.scope_dossier(d.id, 'SOC2')
+    control = DossierControl.query.filter_by(dossier_id=d.id).first()
+    control.status, control.answers = ControlStatus.AFGEROND, {'q1': 'ja'}
+    db.session.add_all([
+        DossierNote(dossier_id=d.id, author_id=owner.id, content='Notitie met é'),
+        DossierTask(dossier_id=d.id, assigned_to=owner.id, title='Taak', status=TaskStatus.OPEN),
+        DossierDocument(dossier_id=d.id, uploaded_by_user_id=owner.id, filename='a.pdf',
+                        file_path='ab/cd/abcd', sha256='ab' * 32, size=3),
+    ])
+    db.session.commit()
+    return d
+
+
+def test_archive_restore_round_trip(archived_dossier):
+    d_id = archived_dossier.id
+    before = _snapshot(d_id)
+    progress_before = A.progress_to_dict(db.session.get(DossierProgress, d_id))
+
+    counts = A.archive_dossier(d_id)
+    assert counts['dossier_controls'] == 5 and counts['dossier_notes'] == 1 and counts['bytes'] > 0
+    assert all(rows == [] for rows in _snapshot(d_id).values())
+    assert db.session.get(DossierProgress, d_id) is None
+    stub = db.session.get(Dossier, d_id)
+    assert stub.archived_at is not None
+    assert os.path.exists(A.archive_path(stub.archive_file))
+    assert A.has_dossier_permission(stub.created_by_user_id, d_id, 'MANAGE')   # ACL blijft bij de stub
+
+    restored = A.restore_dossier(d_id)
+    assert restored['renumbered'] == 0
+    assert _snapshot(d_id) == before
+    assert A.progress_to_dict(db.session.get(DossierProgress, d_id)) == progress_before
+    stub = db.session.get(Dossier, d_id)
+    assert stub.archived_at is None and stub.archive_file is None and stub.restored_at is not None
+    assert A.has_dossier_permission(stub.created_by_user_id, d_id, 'VIEW')
+
+
+def test_restore_renumbers_reused_ids(archived_dossier, make_user, make_dossier):
+    d_id = archived_dossier.id
+    note_id = DossierNote.query.filter_by(dossier_id=d_id).one().id
+    A.archive_dossier(d_id)
+    other = make_dossier(make_user('Ander'))
+    db.session.add(DossierNote(id=note_id, dossier_id=other.id, author_id=other.created_by_user_id, content='x'))
+    db.session.commit()
+
+    assert A.restore_dossier(d_id)['renumbered'] == 1
+    notes = DossierNote.query.filter_by(dossier_id=d_id).all()
+    assert [n.content for n in notes] == ['Notitie met é'] and notes[0].id != note_id
+
+
+def test_only_archived_dossiers_can_be_archived_once(make_user, make_dossier, archived_dossier):
+    active = make_dossier(make_user('Actief'))
+    with pytest.raises(ValueError):
+        A.archive_dossier(active.id)
+    A.archive_dossier(archived_dossier.id)
+    with pytest.raises(ValueError):
+        A.archive_dossier(archived_dossier.id)
+
+
+def test_archive_aborts_when_dossier_changes_meanwhile(archived_dossier, monkeypatch):
+    d_id = archived_dossier.id
+    real_fsync = os.fsync
+
+    def fsync_and_edit(fd):
+        real_fsync(fd)
+        with db.engine.begin() as conn:   # andere schrijver tussen snapshot en schrijftransactie
+            conn.execute(DossierNote.__table__.update().values(content='gewijzigd'))
+
+    monkeypatch.setattr(A.os, 'fsync', fsync_and_edit)
+    with pytest.raises(ValueError):
+        A.archive_dossier(d_id)
+    assert db.session.get(Dossier, d_id).archived_at is None
+    assert DossierNote.query.filter_by(dossier_id=d_id).one().content == 'gewijzigd'
+    assert not os.path.exists(A.archive_path(f"dossier-{d_id}.zip"))
+
+
+def test_restore_rejects_damaged_archive(archived_dossier):
+    d_id = archived_dossier.id
+    A.archive_dossier(d_id)
+    with open(A.archive_path(db.session.get(Dossier, d_id).archive_file), 'ab') as f:
+        f.write(b'x')
+    with pytest.raises(ValueError):
+        A.restore_dossier(d_id)
+    assert db.session.get(Dossier, d_id).archived_at is not None
+
+
+def test_archive_dossiers_respects_age(archived_dossier):
+    assert A.archivable_dossier_ids(older_than_days=1) == []
+    totals = A.archive_dossiers(older_than_days=0)
+    assert totals['dossiers'] == 1 and totals['failed'] == []
+    assert A.archivable_dossier_ids(older_than_days=0) == []
+
+
+def test_archive_and_restore_through_the_api(client, archived_dossier):
+    d_id = archived_dossier.id
+    login(client, db.session.get(Dossier, d_id).created_by_user)
+    resp = client.post(f"/dossiers/{d_id}/archive")
+    assert resp.status_code == 200 and resp.get_json()['archived']['dossier_controls'] == 5
+
+    # de stub blijft in de lijst staan, met archived_at
+    items = client.get('/dossiers.json').get_json()['items']
+    assert [(i['id'], i['archived_at'] is not None) for i in items] == [(d_id, True)]
+    assert client.post(f"/dossiers/{d_id}/archive").status_code == 409
+
+    resp = client.post(f"/dossiers/{d_id}/restore")
+    assert resp.status_code == 200 and resp.get_json()['dossier']['archived_at'] is None
+    assert DossierControl.query.filter_by(dossier_id=d_id).count() == 5
+    assert client.post(f"/dossiers/{d_id}/restore").status_code == 409
+
+
+def test_restore_requires_manage(client, archived_dossier, make_user):
+    A.archive_dossier(archived_dossier.id)
+    login(client, make_user('Ander'))
+    assert client.post(f"/dossiers/{archived_dossier.id}/restore").status_code == 403
+
+
+def test_restore_reads_format_1_archives_with_acl(archived_dossier, monkeypatch):
+    d_id = archived_dossier.id
+    owner_id = archived_dossier.created_by_user_id
+    with monkeypatch.context() as m:   # formaat 1 nam de ACL mee in het archief
+        m.setattr(A, 'ARCHIVE_TABLES', (A.DossierACL,) + A.ARCHIVE_TABLES)
+        m.setattr(A, 'ARCHIVE_FORMAT', 1)
+        A.archive_dossier(d_id)
+    assert not A.has_dossier_permission(owner_id, d_id, 'VIEW')
+    A.restore_dossier(d_id)
+    assert A.has_dossier_permission(owner_id, d_id, 'MANAGE')
+    assert DossierControl.query.filter_by(dossier_id=d_id).count() == 5
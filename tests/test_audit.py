@@ -0,0 +1,77 @@
+# tests/test_audit.py
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DatabaseError
+
+import app as A
+from models import db, AuditEvent, UserRole
+
+
+def _events(action):
+    A.audit_log.flush()
+    return AuditEvent.query.filter_by(action=action).order_by(AuditEvent.id).all()
+
+
+def test_role_change_is_audited_with_old_value(make_user):
+    user = make_user(role=UserRole.DOSSIERMANAGER)
+    db.session.refresh(user)
+    user.role = UserRole.TEAMLID
+    db.session.commit()
+    events = _events('users.role')
+    assert [(e.old_value, e.new_value) for e in events] == [
+        (UserRole.DOSSIERMANAGER.value, UserRole.TEAMLID.value)]
+
+
+def test_change_to_expired_attribute_is_audited(make_user):
+    user = make_user(role=UserRole.DOSSIERMANAGER)   # na de commit zijn de attributen expired
+    user.role = UserRole.TEAMLID
+    db.session.commit()
+    events = _events('users.role')
+    assert [(e.old_value, e.new_value) for e in events] == [
+        (UserRole.DOSSIERMANAGER.value, UserRole.TEAMLID.value)]
+
+
+def test_unchanged_value_is_not_audited(make_user):
+    user = make_user(role=UserRole.DOSSIERMANAGER)
+    user.role = UserRole.DOSSIERMANAGER
+    db.session.commit()
+    assert _events('users.role') == []
+
+
+def test_rolled_back_changes_are_not_audited(make_user):
+    user = make_user()
+    user.is_approved = False
+    db.session.flush()
+    db.session.rollback()
+    assert _events('users.is_approved') == []
+
+
+def test_audit_events_are_append_only(make_user):
+    A.audit_log.record('test.event', 'users', entity_id=1)
+    db.session.commit()                     # het event volgt de transactie
+    A.audit_log.flush()
+    assert AuditEvent.query.count() == 1
+    with pytest.raises(DatabaseError):
+        db.session.execute(text("UPDATE audit_events SET action = 'x'"))
+    db.session.rollback()
+    with pytest.raises(DatabaseError):
+        db.session.execute(text("DELETE FROM audit_events"))
+    db.session.rollback()
+
+
+def test_create_event_has_entity_id(make_user):
+    user_id = make_user().id
+    events = _events('users.create')
+    assert [(e.entity_id, e.subject_user_id) for e in events] == [(user_id, user_id)]
+
+
+def test_append_only_on_postgres_and_unsupported_databases(app, monkeypatch, caplog):
+    created = []
+    monkeypatch.setattr(A, '_pg_trigger', lambda *args, **kwargs: created.append(args))
+    monkeypatch.setattr(db.engine.dialect, 'name', 'postgresql')
+    assert A.ensure_audit_append_only()
+    assert created == [('audit_events_append_only', 'audit_events', 'BEFORE UPDATE OR DELETE',
+                        "RAISE EXCEPTION 'audit_events is append-only';")]
+    monkeypatch.setattr(db.engine.dialect, 'name', 'mysql')
+    assert A.ensure_audit_append_only() is False
+    assert 'append-only' in caplog.text
@@ -0,0 +1,47 @@
+# tests/test_catalog.py
+import app as A
+from models import db, MasterControl
+
+from conftest import login
+
+
+def test_catalog_reloads_only_on_new_version(app, soc2_controls):
+    A.bump_catalog_version()
+    db.session.commit()
+    catalog = A.framework_catalog.get()
+    assert len(catalog.frameworks['SOC2'].controls) == 5
+    loads = A.framework_catalog.loads
+
+    A.framework_catalog.invalidate()
+    assert A.framework_catalog.get() is catalog and A.framework_catalog.loads == loads
+
+    db.session.add(MasterControl(framework='SOC2', series='CC2', tsc_series='CC2.1', sub='CC2.1.1'))
+    A.bump_catalog_version()
+    db.session.commit()
+    A.framework_catalog.invalidate()
+    assert len(A.framework_catalog.get().frameworks['SOC2'].controls) == 6
+    assert A.framework_catalog.loads == loads + 1
+
+
+def test_framework_routes_use_etags(client, make_user, soc2_controls):
+    login(client, make_user())
+    resp = client.get('/frameworks/soc2')
+    assert resp.status_code == 200 and resp.get_json()['count'] == 5
+    etag = resp.headers['ETag']
+    assert client.get('/frameworks/SOC2', headers={'If-None-Match': etag}).status_code == 304
+
+    resp = client.get('/frameworks/SOC2?tsc_series=CC1.1&sub=CC1.1.2')
+    assert [c['sub'] for c in resp.get_json()['controls']] == ['CC1.1.2']
+    assert resp.headers['ETag'] != etag
+    # Onbekende parameters (cache-busters e.d.) worden genegeerd
+    resp = client.get('/frameworks/SOC2?_=1&kleur=rood')
+    assert resp.status_code == 200 and resp.headers['ETag'] == etag
+    resp = client.get('/frameworks/SOC2?sub=CC1.1.2&_=1')
+    assert [c['sub'] for c in resp.get_json()['controls']] == ['CC1.1.2']
+    assert client.get('/frameworks/NEN7510').status_code == 404
+
+    resp = client.get('/frameworks/SOC2/controls/CC1.1.3')
+    assert resp.get_json()['points_of_focus'] == 'Punt 3'
+    assert client.get('/frameworks/SOC2/controls/CC1.1.3',
+                      headers={'If-None-Match': resp.headers['ETag']}).status_code == 304
+    assert client.get('/frameworks/SOC2/controls/CC9.9.9').status_code == 404
@@ -0,0 +1,100 @@
+# tests/test_changefeed.py
+import datetime
+
+import app as A
+from models import db, Dossier, DossierChange, DossierNote
+
+from conftest import login
+
+
+def _add_notes(dossier, n):
+    notes = [DossierNote(dossier_id=dossier.id, author_id=dossier.created_by_user_id, content=f"n{i}")
+             for i in range(n)]
+    db.session.add_all(notes)
+    db.session.commit()
+    return notes
+
+
+def test_empty_feed_has_cursor_zero_without_reset(make_user):
+    d = Dossier(dossier_number=A._next_dossier_number(), title='Leeg', created_by_user_id=make_user().id)
+    db.session.add(d)   # zonder ACL-rij, dus nog geen wijzigingen
+    db.session.commit()
+    assert A.dossier_changes_since(d.id, 0) == {"cursor": 0, "changes": [], "has_more": False, "reset": False}
+
+
+def test_new_client_gets_reset_and_current_cursor(make_user, make_dossier):
+    d = make_dossier(make_user())
+    _add_notes(d, 3)
+    newest = db.session.query(db.func.max(DossierChange.id)).scalar()
+    delta = A.dossier_changes_since(d.id, 0)
+    assert delta == {"cursor": newest, "changes": [], "has_more": False, "reset": True}
+
+    # daarna alleen nieuwe wijzigingen, één item per object
+    note = _add_notes(d, 1)[0]
+    note.content = 'aangepast'
+    db.session.commit()
+    delta = A.dossier_changes_since(d.id, newest)
+    assert not delta["reset"]
+    assert [(c["entity"], c["id"], c["op"]) for c in delta["changes"]] == [("note", note.id, "upsert")]
+    assert delta["changes"][0]["data"]["content"] == 'aangepast'
+    assert A.dossier_changes_since(d.id, delta["cursor"])["changes"] == []
+
+
+def test_deleted_objects_and_paging(make_user, make_dossier):
+    d = make_dossier(make_user())
+    notes = _add_notes(d, 3)
+    deleted_id = notes[0].id
+    db.session.delete(notes[0])
+    db.session.commit()
+    delta = A.dossier_changes_since(d.id, 1, limit=2)
+    assert delta["has_more"]
+    rest = A.dossier_changes_since(d.id, delta["cursor"])
+    ops = {(c["id"], c["op"]) for c in delta["changes"] + rest["changes"]}
+    assert (deleted_id, "delete") in ops
+
+
+def test_stale_or_unknown_cursor_resets(make_user, make_dossier):
+    d = make_dossier(make_user())
+    _add_notes(d, 3)
+    db.session.execute(DossierChange.__table__.update().values(changed_at=datetime.datetime(2000, 1, 1)))
+    db.session.commit()
+    total = DossierChange.query.count()
+    assert A.prune_dossier_changes() == total - 1
+    newest = db.session.query(db.func.max(DossierChange.id)).scalar()
+    assert DossierChange.query.count() == 1   # de nieuwste rij blijft staan
+
+    assert A.dossier_changes_since(d.id, 1)["reset"]
+    assert A.dossier_changes_since(d.id, newest + 10)["reset"]
+    current = A.dossier_changes_since(d.id, newest)
+    assert not current["reset"] and current["cursor"] == newest
+
+
+def test_changes_json_route(client, make_user, make_dossier):
+    user = make_user()
+    d = make_dossier(user)
+    _add_notes(d, 2)
+    login(client, user)
+    body = client.get(f"/dossiers/{d.id}/changes.json").get_json()
+    assert body["reset"] and body["changes"] == []
+    assert client.get(f"/dossiers/{d.id}/changes.json?since=x").status_code == 400
+    body = client.get(f"/dossiers/{d.id}/changes.json?since={body['cursor']}").get_json()
+    assert body["changes"] == [] and not body["reset"]
+
+
+def test_postgres_triggers_cover_every_feed_source(app, monkeypatch):
+    created = []
+    monkeypatch.setattr(db.engine.dialect, 'name', 'postgresql')
+    monkeypatch.setattr(A, '_pg_trigger', lambda name, table, events, body, when='': created.append(
+        (name, events, body, when)))
+    assert A.ensure_change_feed_triggers()
+    expected = {f"{table}_feed_{op.lower()}" for table, _, ops, _ in A.FEED_SOURCES.values() for op in ops}
+    assert {c[0] for c in created} == expected
+    name, events, body, when = next(c for c in created if c[0] == 'dossier_notes_feed_delete')
+    assert events == 'AFTER DELETE' and when == 'old.dossier_id IS NOT NULL'
+    assert "VALUES (old.dossier_id, 'note', old.id, 'delete', (now() AT TIME ZONE 'utc'));" in body
+
+
+def test_unsupported_database_logs_an_error(app, monkeypatch, caplog):
+    monkeypatch.setattr(db.engine.dialect, 'name', 'mysql')
+    assert A.ensure_change_feed_triggers() is False
+    assert 'dossier_changes' in caplog.text
@@ -0,0 +1,56 @@
+# tests/test_controlmap.py
+import app as A
+from controlmap import MappingIndex, text_features
+from models import db, MasterControl
+
+from conftest import login
+
+DOCS = [
+    (1, 'SOC2', 'Restricts logical access with passwords and authentication.'),
+    (2, 'SOC2', 'Backup and recovery of data.'),
+    (3, 'ISO27001', 'Toegang tot systemen wordt beveiligd met wachtwoorden.'),
+    (4, 'ISO27001', 'Back-up en herstel van gegevens worden periodiek getest.'),
+]
+
+
+def test_glossary_maps_dutch_terms_to_english_stems():
+    features = text_features('Informatiebeveiligingsrisico en wachtwoorden')
+    assert {'secur', 'risk', 'passw'} <= set(features)
+
+
+def test_matches_are_cross_framework_and_ranked():
+    index, stats = MappingIndex.build(DOCS, version=1, top_k=2)
+    assert stats == {'reused': 0, 'analyzed': 4}
+    assert [cid for cid, _ in index.matches(1)][0] == 3
+    assert [cid for cid, _ in index.matches(4)][0] == 2
+    assert all(cid in (3, 4) for cid, _ in index.matches(2))
+    assert index.matches(99) is None
+
+
+def test_rebuild_reuses_unchanged_controls_and_roundtrips(tmp_path):
+    index, _ = MappingIndex.build(DOCS, version=1)
+    changed = DOCS[:3] + [(4, 'ISO27001', 'Incidenten melden.')]
+    rebuilt, stats = MappingIndex.build(changed, version=2, previous=index)
+    assert stats == {'reused': 3, 'analyzed': 1}
+    path = str(tmp_path / 'mapping.npz')
+    rebuilt.save(path)
+    loaded = MappingIndex.load(path)
+    assert loaded.version == 2 and loaded.matches(1) == rebuilt.matches(1)
+    assert MappingIndex.load(str(tmp_path / 'ontbreekt.npz')) is None
+
+
+def test_mappings_route(client, make_user):
+    soc2 = MasterControl(framework='SOC2', sub='CC6.1.1', tsc_description_series='Logical access',
+                         points_of_focus='Restricts access with passwords.')
+    iso = MasterControl(framework='ISO27001', beheersmaatregel_id='5.17', beheersmaatregel_naam='Wachtwoorden',
+                        beheersmaatregel_inhoud='Toegang met wachtwoorden wordt beheerst.')
+    db.session.add_all([soc2, iso])
+    A.bump_catalog_version()
+    db.session.commit()
+    login(client, make_user())
+    resp = client.get(f"/controls/{soc2.id}/mappings?k=3")
+    body = resp.get_json()
+    assert body['control']['key'] == 'CC6.1.1'
+    assert [m['key'] for m in body['mappings']] == ['5.17']
+    assert client.get(f"/controls/{soc2.id}/mappings?k=3", headers={'If-None-Match': resp.headers['ETag']}).status_code == 304
+    assert client.get('/controls/999/mappings').status_code == 404
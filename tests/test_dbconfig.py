@@ -0,0 +1,40 @@
+# tests/test_dbconfig.py
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+import app as A
+import dbconfig
+from models import db, DossierClientControl
+
+
+def test_normalize_url():
+    assert dbconfig.normalize_url('postgres://u:p@db/toverstaf') == 'postgresql://u:p@db/toverstaf'
+    assert dbconfig.normalize_url('sqlite:///x.db') == 'sqlite:///x.db'
+
+
+def test_engine_options_from_environment(monkeypatch):
+    assert dbconfig.engine_options('sqlite:///x.db') == {}
+    monkeypatch.setenv('DB_POOL_SIZE', '20')
+    monkeypatch.setenv('DB_POOL_PRE_PING', '0')
+    options = dbconfig.engine_options('postgresql://db/toverstaf')
+    assert options == {'pool_pre_ping': False, 'pool_size': 20}
+
+
+def test_empty_variable_disables_pragma(monkeypatch):
+    monkeypatch.setenv('SQLITE_MMAP_SIZE', '')
+    monkeypatch.setenv('SQLITE_SYNCHRONOUS', 'FULL')
+    pragmas = dbconfig.sqlite_pragmas()
+    assert 'mmap_size' not in pragmas and pragmas['synchronous'] == 'FULL'
+
+
+def test_pragmas_are_applied_to_new_connections(app):
+    assert db.session.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+    assert db.session.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_upsert_statement_compiles_for_postgresql(app, monkeypatch):
+    monkeypatch.setattr(db.engine, 'dialect', postgresql.dialect())
+    stmt = A.upsert_statement(DossierClientControl.__table__, ['dossier_id', 'master_control_id'],
+                              ['client_response'])
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert 'ON CONFLICT (dossier_id, master_control_id) DO UPDATE SET client_response = excluded.client_response' in sql
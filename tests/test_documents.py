@@ -0,0 +1,48 @@
+# tests/test_documents.py
+import hashlib
+import io
+import os
+
+import pytest
+
+import app as A
+from documentstore import DocumentStore, DocumentTooLarge
+from models import DossierDocument
+
+from conftest import login
+
+
+def test_store_deduplicates_identical_content(tmp_path):
+    store = DocumentStore(str(tmp_path))
+    data = b'jaarrekening' * 1000
+    sha256, size, deduplicated = store.save_stream(io.BytesIO(data), chunk_size=100)
+    assert (sha256, size, deduplicated) == (hashlib.sha256(data).hexdigest(), len(data), False)
+    assert store.save_stream(io.BytesIO(data))[2] is True
+    with open(store.path_for(sha256), 'rb') as f:
+        assert f.read() == data
+    assert os.listdir(tmp_path / 'tmp') == []
+
+
+def test_store_rejects_too_large_upload_without_leftovers(tmp_path):
+    store = DocumentStore(str(tmp_path), max_bytes=10)
+    with pytest.raises(DocumentTooLarge):
+        store.save_stream(io.BytesIO(b'x' * 11), chunk_size=4)
+    assert os.listdir(tmp_path / 'tmp') == []
+    assert sorted(os.listdir(tmp_path)) == ['tmp']
+
+
+def test_upload_and_download_share_one_blob(client, make_user, make_dossier, tmp_path, monkeypatch):
+    monkeypatch.setattr(A.document_store, 'root', str(tmp_path / 'documents'))
+    user = make_user()
+    d = make_dossier(user)
+    login(client, user)
+    url = f"/dossiers/{d.id}/documents?filename=rapport.pdf"
+    first = client.post(url, data=b'%PDF-inhoud', content_type='application/pdf').get_json()
+    second = client.post(url, data=b'%PDF-inhoud', content_type='application/pdf').get_json()
+    assert not first['deduplicated'] and second['deduplicated'] and first['sha256'] == second['sha256']
+    assert DossierDocument.query.count() == 2
+
+    resp = client.get(f"/dossiers/{d.id}/documents/{first['id']}")
+    assert resp.data == b'%PDF-inhoud' and resp.headers['ETag'].strip('"') == first['sha256']
+    resp = client.get(f"/dossiers/{d.id}/documents/{first['id']}", headers={'Range': 'bytes=0-3'})
+    assert resp.status_code == 206 and resp.data == b'%PDF'
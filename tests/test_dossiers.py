@@ -0,0 +1,135 @@
+# tests/test_dossiers.py
+import datetime
+
+import pytest
+
+import app as A
+from models import (
+    db, DossierControl, DossierClientControl, DossierNumberSequence, MasterControl, Dossier
+)
+
+from conftest import login
+
+
+def test_next_dossier_number_is_sequential(make_user, make_dossier):
+    owner = make_user()
+    prefix = f"D-{datetime.datetime.now():%Y%m%d}-"
+    numbers = [make_dossier(owner).dossier_number for _ in range(3)]
+    assert numbers == [f"{prefix}0001", f"{prefix}0002", f"{prefix}0003"]
+
+
+def test_next_dossier_number_resumes_after_existing_numbers(make_user, make_dossier):
+    owner = make_user()
+    make_dossier(owner)
+    make_dossier(owner)
+    # Zonder dagteller (bijv. na een migratie) verder na het hoogste bestaande nummer
+    DossierNumberSequence.query.delete()
+    db.session.commit()
+    assert make_dossier(owner).dossier_number.endswith('-0003')
+    assert Dossier.query.count() == 3
+
+
+def test_scope_dossier_is_idempotent(make_user, make_dossier, soc2_controls):
+    d = make_dossier(make_user())
+    assert A.scope_dossier(d.id, 'SOC2') == {"dossier_controls": 5, "dossier_client_controls": 5}
+    assert A.scope_dossier(d.id, 'SOC2') == {"dossier_controls": 0, "dossier_client_controls": 0}
+    assert DossierControl.query.filter_by(dossier_id=d.id).count() == 5
+    assert DossierClientControl.query.filter_by(dossier_id=d.id).count() == 5
+
+
+def test_scope_dossier_filters(make_user, make_dossier, soc2_controls):
+    d = make_dossier(make_user())
+    assert A.scope_dossier(d.id, 'SOC2', filters={'sub': 'CC1.1.1, CC1.1.2'},
+                           include_client_controls=False) == {"dossier_controls": 2, "dossier_client_controls": 0}
+    assert A.scope_dossier(d.id, 'SOC2', filters={'tsc_series': ['CC1.1']})["dossier_controls"] == 3
+
+
+def test_scope_dossier_rejects_unknown_framework_and_filter(make_user, make_dossier, soc2_controls):
+    d = make_dossier(make_user())
+    with pytest.raises(ValueError):
+        A.scope_dossier(d.id, 'NEN7510')
+    with pytest.raises(ValueError):
+        A.scope_dossier(d.id, 'SOC2', {'kleur': 'rood'})
+    assert DossierControl.query.count() == 0
+
+
+def test_scope_route_requires_edit(client, make_user, make_dossier, soc2_controls):
+    owner, other = make_user('Eigenaar'), make_user('Ander')
+    d = make_dossier(owner)
+    login(client, other)
+    assert client.post(f"/dossiers/{d.id}/scope", json={'framework': 'SOC2'}).status_code == 403
+    login(client, owner)
+    resp = client.post(f"/dossiers/{d.id}/scope", json={'framework': 'SOC2', 'sub': ['CC1.1.3']})
+    assert resp.status_code == 200 and resp.get_json()['dossier_controls'] == 1
+
+
+def _client_rows(dossier_id):
+    rows = db.session.query(MasterControl.sub, DossierClientControl.client_response,
+                            DossierClientControl.client_comment) \
+        .join(MasterControl, MasterControl.id == DossierClientControl.master_control_id) \
+        .filter(DossierClientControl.dossier_id == dossier_id)
+    return {sub: (response, comment) for sub, response, comment in rows}
+
+
+def test_client_bulk_upsert_inserts_and_updates(make_user, make_dossier, soc2_controls):
+    d = make_dossier(make_user())
+    A.scope_dossier(d.id, 'SOC2', include_client_controls=False)
+    fields = ['client_response', 'client_comment']
+    result, errors = A.bulk_upsert_client_responses(d.id, [
+        (1, {'control_id': 'CC1.1.1', 'client_response': 'Ja', 'client_comment': 'Zie beleid'}),
+        (2, {'control_id': 'CC1.1.2', 'client_response': ' Nee ', 'client_comment': ''}),
+    ], fields)
+    assert errors == [] and result['inserted'] == 2 and result['updated'] == 0
+    assert _client_rows(d.id) == {'CC1.1.1': ('Ja', 'Zie beleid'), 'CC1.1.2': ('Nee', None)}
+
+    result, errors = A.bulk_upsert_client_responses(d.id, [
+        (1, {'control_id': 'CC1.1.1', 'client_response': 'Deels', 'client_comment': None}),
+    ], fields)
+    assert result['updated'] == 1
+    assert _client_rows(d.id)['CC1.1.1'] == ('Deels', None)
+
+
+def test_client_bulk_upsert_only_overwrites_present_fields(make_user, make_dossier, soc2_controls):
+    d = make_dossier(make_user())
+    A.scope_dossier(d.id, 'SOC2')
+    fields = ['client_response', 'client_comment']
+    A.bulk_upsert_client_responses(d.id, [
+        (1, {'control_id': 'CC1.1.1', 'client_response': 'R1', 'client_comment': 'C1'}),
+        (2, {'control_id': 'CC1.1.2', 'client_response': 'R2', 'client_comment': 'C2'}),
+    ], fields)
+    result, errors = A.bulk_upsert_client_responses(d.id, [
+        (1, {'control_id': 'CC1.1.1', 'client_comment': 'nieuw'}),
+        (2, {'control_id': 'CC1.1.2', 'client_response': 'nieuw'}),
+    ], fields)
+    assert errors == [] and result['updated'] == 2
+    rows = _client_rows(d.id)
+    assert rows['CC1.1.1'] == ('R1', 'nieuw')
+    assert rows['CC1.1.2'] == ('nieuw', 'C2')
+
+
+def test_client_bulk_upsert_is_all_or_nothing(make_user, make_dossier, soc2_controls):
+    d = make_dossier(make_user())
+    A.scope_dossier(d.id, 'SOC2', filters={'sub': ['CC1.1.1', 'CC1.1.2']}, include_client_controls=False)
+    result, errors = A.bulk_upsert_client_responses(d.id, [
+        (1, {'control_id': 'CC1.1.1', 'client_response': 'Ja'}),
+        (2, {'control_id': 'CC1.1.5', 'client_response': 'Ja'}),     # niet gescoped
+        (3, {'control_id': 'CC1.1.1', 'client_response': 'Nee'}),    # dubbel
+        (4, {'control_id': 'CC1.1.2', 'client_response': 42}),        # geen tekst
+        (5, {'control_id': 'CC1.1.2'}),                               # niets om bij te werken
+    ], ['client_response'])
+    assert result is None
+    assert [e['row'] for e in errors] == [2, 3, 4, 5]
+    assert DossierClientControl.query.count() == 0
+
+
+def test_client_bulk_route_accepts_csv(client, make_user, make_dossier, soc2_controls):
+    user = make_user()
+    d = make_dossier(user)
+    A.scope_dossier(d.id, 'SOC2', include_client_controls=False)
+    login(client, user)
+    body = '\ufeffcontrol_id;client_response\nCC1.1.1;Ja\nCC1.1.2;Nee\n'
+    resp = client.post(f"/dossiers/{d.id}/client_controls/bulk", data=body.encode('utf-8'), content_type='text/csv')
+    assert resp.status_code == 200 and resp.get_json()['inserted'] == 2
+    assert _client_rows(d.id) == {'CC1.1.1': ('Ja', None), 'CC1.1.2': ('Nee', None)}
+    resp = client.post(f"/dossiers/{d.id}/client_controls/bulk", data=b'id;x\n1;2\n', content_type='text/csv')
+    assert resp.status_code == 400
@@ -0,0 +1,46 @@
+# tests/test_export.py
+import io
+import json
+import zipfile
+
+import app as A
+from models import db, DossierNote
+
+from conftest import login
+
+
+def _notes(dossier, n):
+    db.session.add_all([DossierNote(dossier_id=dossier.id, author_id=dossier.created_by_user_id, content=f"notitie {i}")
+                        for i in range(n)])
+    db.session.commit()
+
+
+def test_ndjson_export_streams_every_section(make_user, make_dossier, soc2_controls, monkeypatch):
+    monkeypatch.setattr(A, 'EXPORT_BATCH_SIZE', 2)
+    d = make_dossier(make_user())
+    A.scope_dossier(d.id, 'SOC2')
+    _notes(d, 3)
+    lines = [json.loads(line) for line in A.generate_dossier_ndjson(d)]
+    types = [line['type'] for line in lines]
+    assert types[0] == 'dossier' and lines[0]['data']['id'] == d.id
+    assert types.count('controls') == 5 and types.count('client_controls') == 5
+    assert types.count('notes') == 3 and types.count('acl') == 1
+    control = next(line['data'] for line in lines if line['type'] == 'controls')
+    assert control['framework'] == 'SOC2' and control['control_id'].startswith('CC1.1.')
+    acl = next(line['data'] for line in lines if line['type'] == 'acl')
+    assert 'MANAGE' in acl['permissions']
+
+
+def test_zip_export_route(client, make_user, make_dossier):
+    user = make_user()
+    d = make_dossier(user)
+    _notes(d, 2)
+    login(client, user)
+    resp = client.get(f"/dossiers/{d.id}/export?format=zip&documents=0")
+    assert resp.status_code == 200 and resp.mimetype == 'application/zip'
+    assert d.dossier_number in resp.headers['Content-Disposition']
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert {'dossier.ndjson', 'notes.ndjson', 'acl.ndjson'} <= set(zf.namelist())
+        notes = [json.loads(line) for line in zf.read('notes.ndjson').decode('utf-8').splitlines()]
+    assert [n['content'] for n in notes] == ['notitie 0', 'notitie 1']
+    assert client.get(f"/dossiers/{d.id}/export?format=pdf").status_code == 400
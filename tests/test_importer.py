@@ -0,0 +1,59 @@
+# tests/test_importer.py
+import pytest
+from sqlalchemy import inspect, text
+
+import app as A
+import importer
+from models import db, MasterControl
+
+HEADER = "Series#;Series_description;TSC_serie;TSC_description_serie;Sub;Points of focus\n"
+
+
+def _write_soc2(path, rows):
+    path.write_text(HEADER + ''.join(f"CC1;Control Environment;CC1.1;Integriteit;{sub};{focus}\n"
+                                     for sub, focus in rows), encoding='utf-8')
+    return str(path)
+
+
+def test_import_is_incremental_and_keeps_ids(app, tmp_path):
+    csv_path = _write_soc2(tmp_path / 'soc2.csv', [('CC1.1.1', 'Tone at the top'), ('CC1.1.2', 'Standards')])
+    assert importer.import_framework(csv_path, 'SOC2') == {"inserted": 2, "updated": 0, "unchanged": 0}
+    ids = dict(db.session.query(MasterControl.sub, MasterControl.id))
+
+    # Zelfde bestand opnieuw: niets te doen
+    assert importer.import_framework(csv_path, 'SOC2') == {"inserted": 0, "updated": 0, "unchanged": 2}
+
+    # Eén gewijzigde tekst, één nieuwe control, een dubbele regel en een lege regel
+    _write_soc2(tmp_path / 'soc2.csv', [('CC1.1.1', 'Tone at the top (herzien)'), ('CC1.1.2', 'Standards'),
+                                        ('CC1.1.3', 'Evaluates'), ('CC1.1.3', 'dubbel'), ('', '')])
+    assert importer.import_framework(csv_path, 'SOC2', batch_size=1) == {"inserted": 1, "updated": 1, "unchanged": 1}
+    after = dict(db.session.query(MasterControl.sub, MasterControl.id))
+    assert after['CC1.1.1'] == ids['CC1.1.1'] and after['CC1.1.2'] == ids['CC1.1.2']
+    controls = {c.sub: c for c in MasterControl.query}
+    assert controls['CC1.1.1'].points_of_focus == 'Tone at the top (herzien)'
+    assert controls['CC1.1.3'].points_of_focus == 'Evaluates'
+
+
+def test_import_rejects_missing_columns(app, tmp_path):
+    path = tmp_path / 'iso.csv'
+    path.write_text("Hoofdstuk;Naam_hoofdstuk\n4;Context\n", encoding='utf-8')
+    with pytest.raises(ValueError, match='Beheersmaatregel_ID'):
+        importer.import_framework(str(path), 'ISO27001')
+    assert MasterControl.query.count() == 0
+
+
+def test_content_hash_ignores_key_order():
+    a = importer.content_hash('SOC2', {'sub': 'CC1', 'points_of_focus': 'x'})
+    b = importer.content_hash('SOC2', {'points_of_focus': 'x', 'sub': 'CC1'})
+    assert a == b != importer.content_hash('ISO27001', {'sub': 'CC1', 'points_of_focus': 'x'})
+
+
+def test_migrate_schema_adds_master_control_indexes_to_existing_table(app):
+    wanted = {ix.name for ix in MasterControl.__table__.indexes}
+    assert {'ix_master_controls_framework', 'ix_master_controls_framework_sub',
+            'ix_master_controls_framework_bm_id'} <= wanted
+    for name in wanted:   # zoals een database van voor deze indexen
+        db.session.execute(text(f"DROP INDEX {name}"))
+    db.session.commit()
+    A.migrate_schema()
+    assert wanted <= {ix['name'] for ix in inspect(db.engine).get_indexes('master_controls')}
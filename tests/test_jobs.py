@@ -0,0 +1,94 @@
+# tests/test_jobs.py
+import threading
+
+import pytest
+
+import app as A
+from models import db, Job, JobStatus, DossierControl, UserRole, AuditEvent
+
+from conftest import login
+
+
+def test_submit_queues_and_cancels(client, make_user, make_dossier, monkeypatch):
+    monkeypatch.setattr(A.job_runner, 'start', lambda: None)   # geen dispatcher-thread in de test
+    user = make_user()
+    d = make_dossier(user)
+    login(client, user)
+    resp = client.post('/jobs', json={'type': 'scope_dossier', 'params': {'dossier_id': d.id, 'framework': 'SOC2'}})
+    assert resp.status_code == 202
+    job = db.session.get(Job, resp.get_json()['id'])
+    assert job.status == JobStatus.QUEUED
+    assert client.post(f'/jobs/{job.id}/cancel').status_code == 202
+    db.session.refresh(job)
+    assert job.status == JobStatus.CANCELLED
+    assert client.post(f'/jobs/{job.id}/cancel').status_code == 409
+
+
+def test_claimed_job_runs_handler_and_stores_result(client, make_user, make_dossier, soc2_controls, monkeypatch):
+    monkeypatch.setattr(A.job_runner, 'start', lambda: None)
+    user = make_user()
+    d = make_dossier(user)
+    dossier_id = d.id
+    params = {'dossier_id': dossier_id, 'framework': 'SOC2'}
+    job = A.job_runner.submit('scope_dossier', params, created_by=user.id, dossier_id=dossier_id)
+    assert A.job_runner._claim(job.id, 'scope_dossier', 1)
+    assert not A.job_runner._claim(job.id, 'scope_dossier', 1)
+    job_id = job.id
+    A.job_runner._run(job_id, 'scope_dossier', params, threading.Event(), {})   # eigen app-context
+    job = db.session.get(Job, job_id)
+    assert job.status == JobStatus.SUCCEEDED and job.finished_at is not None
+    assert DossierControl.query.filter_by(dossier_id=dossier_id).count() == len(soc2_controls)
+
+
+def test_submit_rejects_unknown_type(client, make_user):
+    user = make_user()
+    login(client, user)
+    assert client.post('/jobs', json={'type': 'bestaat_niet'}).status_code == 400
+    assert Job.query.count() == 0
+
+
+def test_submit_queues_without_autostart_and_cancels(client, make_user, make_dossier):
+    user = make_user()
+    d = make_dossier(user)
+    login(client, user)
+    resp = client.post('/jobs', json={'type': 'scope_dossier', 'params': {'dossier_id': d.id, 'framework': 'SOC2'}})
+    assert resp.status_code == 202
+    job = db.session.get(Job, resp.get_json()['id'])
+    assert job.status == JobStatus.QUEUED and A.job_runner._thread is None
+    assert A.job_runner.cancel(job)
+    db.session.refresh(job)
+    assert job.status == JobStatus.CANCELLED
+
+
+def test_job_changes_are_audited_as_submitter(make_user, make_dossier):
+    owner = make_user('Eigenaar')
+    member = make_user('Lid', UserRole.TEAMLID)
+    owner_id, d_id = owner.id, make_dossier(owner).id
+    params = {'users': [member.id], 'dossiers': [d_id], 'permissions': ['VIEW']}
+    job_id = A.job_runner.submit('bulk_acl', params, created_by=owner_id).id
+    A.job_runner._run(job_id, 'bulk_acl', params, threading.Event(), {}, created_by=owner_id)
+    A.audit_log.flush()
+    events = AuditEvent.query.filter_by(action='dossier_acl.perm_mask').all()
+    assert [(e.actor_id, e.dossier_id) for e in events] == [(owner_id, d_id)]
+
+
+def test_check_params_against_handler_signature(app):
+    A.job_runner.check_params('scope_dossier', {'dossier_id': 1, 'framework': 'SOC2'})
+    with pytest.raises(ValueError):
+        A.job_runner.check_params('scope_dossier', {'dossier_id': 1, 'framework': 'SOC2', 'bogus': 1})
+    with pytest.raises(ValueError):
+        A.job_runner.check_params('bulk_acl', {'users': [1], 'dossiers': [1]})   # permissions ontbreekt
+    with pytest.raises(ValueError):
+        A.job_runner.check_params('bestaat_niet', {})
+
+
+def test_submit_rejects_bad_params_with_400(client, make_user, make_dossier):
+    user = make_user(role=UserRole.BEHEERDER)
+    d = make_dossier(user)
+    login(client, user)
+    resp = client.post('/jobs', json={'type': 'scope_dossier', 'params': {'dossier_id': d.id, 'bogus': 1}})
+    assert resp.status_code == 400
+    resp = client.post('/jobs', json={'type': 'bulk_acl', 'params': {
+        'users': [user.id], 'dossiers': 'alle', 'permissions': ['VIEW']}})
+    assert resp.status_code == 400
+    assert Job.query.count() == 0
@@ -0,0 +1,27 @@
+# tests/test_metrics.py
+from metrics import Histogram
+
+from conftest import login
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram('t', 'test', (0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        hist.observe('x', value)
+    lines = hist.render()
+    assert 't_bucket{endpoint="x",le="0.1"} 1' in lines
+    assert 't_bucket{endpoint="x",le="1.0"} 2' in lines
+    assert 't_bucket{endpoint="x",le="+Inf"} 3' in lines
+    assert 't_count{endpoint="x"} 3' in lines
+
+
+def test_metrics_endpoint_counts_requests_and_queries(client, make_user, monkeypatch, app):
+    login(client, make_user())
+    client.get('/dossiers.json')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'toverstaf_request_duration_seconds_count{endpoint="dossiers_json"}' in body
+    assert 'toverstaf_request_sql_queries_bucket{endpoint="dossiers_json"' in body
+
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'geheim')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer geheim'}).status_code == 200
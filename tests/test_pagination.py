@@ -0,0 +1,64 @@
+# tests/test_pagination.py
+import datetime
+
+import pytest
+from sqlalchemy import inspect, text
+
+import app as A
+from models import db, UserRole, DossierStatus
+
+from conftest import login
+
+
+def _all_pages(user_id, args):
+    ids, cursor = [], None
+    while True:
+        items, cursor = A.dossier_page(user_id, dict(args, cursor=cursor) if cursor else args)
+        ids += [d.id for d in items]
+        if not cursor:
+            return ids
+
+
+def test_keyset_pages_are_complete_and_acl_filtered(make_user, make_dossier):
+    owner, other = make_user('Eigenaar'), make_user('Ander')
+    mine = [make_dossier(owner) for _ in range(5)]
+    make_dossier(other)
+    assert _all_pages(owner.id, {'limit': 2}) == [d.id for d in reversed(mine)]
+
+    # start_date-volgorde met gelijke datums en NULL's (die komen als laatste)
+    same = datetime.datetime(2024, 1, 1)
+    for d, start in zip(mine, [same, same, datetime.datetime(2024, 6, 1), None, None]):
+        d.start_date = start
+    db.session.commit()
+    expected = [mine[2].id, mine[1].id, mine[0].id, mine[4].id, mine[3].id]
+    assert _all_pages(owner.id, {'limit': 2, 'order': 'start_date'}) == expected
+
+
+def test_filters(make_user, make_dossier):
+    owner = make_user()
+    d1 = make_dossier(owner, status=DossierStatus.GEARCHIVEERD)
+    make_dossier(owner)
+    assert _all_pages(owner.id, {'status': DossierStatus.GEARCHIVEERD.value}) == [d1.id]
+    assert _all_pages(owner.id, {'number': d1.dossier_number}) == [d1.id]
+
+
+@pytest.mark.parametrize('args', [{'order': 'title'}, {'limit': 'veel'}, {'status': 'weg'}, {'cursor': 'onzin'}])
+def test_invalid_parameters(make_user, args):
+    with pytest.raises(ValueError):
+        A.dossier_page(make_user().id, args)
+
+
+def test_dossiers_json_route(client, make_user):
+    user = make_user('Lid', UserRole.TEAMLID)
+    login(client, user)
+    assert client.get('/dossiers.json').get_json() == {"items": [], "next_cursor": None}
+    assert client.get('/dossiers.json?order=title').status_code == 400
+
+
+def test_migrate_schema_adds_indexes_to_existing_dossiers_table(app):
+    for name in ('ix_dossiers_start_date_id', 'ix_dossiers_client_id'):
+        db.session.execute(text(f"DROP INDEX {name}"))   # zoals een database van voor deze indexen
+    db.session.commit()
+    A.migrate_schema()
+    names = {ix['name'] for ix in inspect(db.engine).get_indexes('dossiers')}
+    assert {'ix_dossiers_start_date_id', 'ix_dossiers_client_id'} <= names
@@ -0,0 +1,71 @@
+# tests/test_passwords.py
+import threading
+
+import pytest
+
+import app as A
+from models import db, User
+from passwords import PasswordHasher, HasherBusy
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=4, max_workers=1, max_queue=0)
+    hashed = hasher.hash('geheim')
+    assert hasher.verify('geheim', hashed) and not hasher.verify('fout', hashed)
+    assert not hasher.verify('geheim', '')
+    assert not hasher.needs_rehash(hashed) and PasswordHasher(rounds=5).needs_rehash(hashed)
+    assert hasher.stats()['ops']['hash']['count'] == 1
+
+
+def test_full_pool_rejects_immediately():
+    hasher = PasswordHasher(rounds=4, max_workers=1, max_queue=0)
+    release = threading.Event()
+    worker = threading.Thread(target=hasher._run, args=('hash', release.wait))
+    worker.start()
+    while hasher.in_flight == 0:
+        release.wait(0.001)
+    with pytest.raises(HasherBusy):
+        hasher.hash('geheim')
+    assert hasher.rejected == 1
+    release.set()
+    worker.join()
+    assert hasher.in_flight == 0 and hasher.verify('geheim', hasher.hash('geheim'))
+
+
+def test_slot_stays_taken_until_bcrypt_finishes():
+    hasher = PasswordHasher(rounds=4, max_workers=1, max_queue=0, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(HasherBusy):
+        hasher._run('hash', release.wait)      # timeout, maar de worker rekent nog door
+    assert hasher.in_flight == 1
+    with pytest.raises(HasherBusy):
+        hasher._run('hash', lambda: 'x')       # geen vrij slot
+    assert hasher.rejected == 1
+
+    release.set()
+    hasher._pool.shutdown(wait=True)
+    assert hasher.in_flight == 0
+    assert hasher._slots.acquire(blocking=False)
+
+
+def test_login_rehashes_old_work_factor(client, make_user, monkeypatch):
+    monkeypatch.setattr(A.password_hasher, 'rounds', 5)
+    user = make_user()
+    user.password_hash = PasswordHasher(rounds=4).hash('geheim')
+    db.session.commit()
+    resp = client.post('/login', json={'email': user.email, 'password': 'geheim'})
+    assert resp.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(User, user.id).password_hash.startswith('$2b$05$')
+    assert client.post('/login', json={'email': user.email, 'password': 'fout'}).status_code == 401
+
+
+def test_login_returns_503_when_hasher_is_busy(client, make_user, monkeypatch):
+    user = make_user()
+
+    def busy(*args):
+        raise HasherBusy()
+
+    monkeypatch.setattr(A.password_hasher, 'verify', busy)
+    resp = client.post('/login', json={'email': user.email, 'password': 'geheim'})
+    assert resp.status_code == 503 and resp.headers['Retry-After'] == '2'
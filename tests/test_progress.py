@@ -0,0 +1,63 @@
+# tests/test_progress.py
+import app as A
+from models import (
+    db, DossierControl, DossierClientControl, DossierProgress, DossierTask, ControlStatus, TaskStatus
+)
+
+from conftest import login
+
+
+def _progress(dossier_id):
+    db.session.expire_all()
+    return A.progress_to_dict(db.session.get(DossierProgress, dossier_id))
+
+
+def test_counters_follow_inserts_updates_and_deletes(make_user, make_dossier, soc2_controls):
+    owner = make_user()
+    d = make_dossier(owner)
+    A.scope_dossier(d.id, 'SOC2')   # set-based INSERT ... SELECT telt ook mee
+    p = _progress(d.id)
+    assert (p['controls_total'], p['controls_open'], p['review_open']) == (5, 5, 5)
+    assert (p['client_controls_total'], p['client_responses_received']) == (5, 0)
+
+    controls = DossierControl.query.filter_by(dossier_id=d.id).order_by(DossierControl.id).all()
+    controls[0].status = ControlStatus.AFGEROND
+    controls[1].status, controls[1].review_status = ControlStatus.IN_UITVOERING, 'final'
+    db.session.delete(controls[2])
+    client_control = DossierClientControl.query.filter_by(dossier_id=d.id).first()
+    client_control.client_response = 'Ja'
+    db.session.add(DossierTask(dossier_id=d.id, assigned_to=owner.id, title='Taak', status=TaskStatus.OPEN))
+    db.session.commit()
+
+    p = _progress(d.id)
+    assert p['controls_total'] == 4 and p['controls_open'] == 2
+    assert p['controls_afgerond'] == 1 and p['controls_in_uitvoering'] == 1
+    assert p['review_open'] == 3 and p['review_final'] == 1
+    assert p['client_responses_received'] == 1
+    assert (p['tasks_total'], p['tasks_open']) == (1, 1)
+
+    # Een volledige rebuild komt op dezelfde tellers uit
+    A.rebuild_dossier_progress([d.id])
+    assert _progress(d.id) == p
+
+
+def test_dashboard_progress_route(client, make_user, make_dossier, soc2_controls):
+    user = make_user()
+    d = make_dossier(user)
+    A.scope_dossier(d.id, 'SOC2', include_client_controls=False)
+    login(client, user)
+    items = client.get('/dashboard/progress.json').get_json()['items']
+    assert [(i['id'], i['progress']['controls_total']) for i in items] == [(d.id, 5)]
+
+
+def test_postgres_trigger_body_moves_counts_from_old_to_new_row():
+    body = A._progress_pg_body('dossier_tasks')
+    assert "IF TG_OP <> 'INSERT' THEN UPDATE dossier_progress SET tasks_total = tasks_total - CASE" in body
+    assert "ON CONFLICT (dossier_id) DO NOTHING; UPDATE dossier_progress SET tasks_total = tasks_total + CASE" in body
+    assert body.endswith("RETURN NULL;")
+
+
+def test_unsupported_database_logs_an_error(app, monkeypatch, caplog):
+    monkeypatch.setattr(db.engine.dialect, 'name', 'mysql')
+    assert A.ensure_progress_triggers() is False
+    assert 'rebuild-progress' in caplog.text
@@ -0,0 +1,81 @@
+# tests/test_questionnaire.py
+import os
+
+import pytest
+
+import app as A
+from models import db, DossierControl
+from questionnaire import parse_questionnaire, validate_answers
+
+from conftest import ROOT, login
+
+CSV = os.path.join(ROOT, '2025_lijst tbv app_taken per control_plat - kopie.csv')
+
+
+@pytest.fixture
+def template(app):
+    assert app.config['QUESTIONNAIRE_CSV'] == CSV   # standaard het meegeleverde bestand
+    return A.questionnaire_template()
+
+
+def test_parse_shipped_task_list():
+    template = parse_questionnaire(CSV)
+    titles = [s.title for s in template.sections]
+    assert titles[0] == 'Algemene overwegingen' and titles[-1] == 'Eindconclusie'
+    assert len(template.questions) == 51
+    choice = next(q for q in template.questions.values() if q.kind == 'choice')
+    assert 'Inspectie' in choice.options
+    # ID's en versie hangen af van de inhoud, niet van de positie: opnieuw parsen geeft hetzelfde
+    assert parse_questionnaire(CSV) == template
+
+
+def test_validate_answers(app):
+    template = parse_questionnaire(CSV)
+    text_q = template.sections[0].questions[0].id
+    choice = next(q for q in template.questions.values() if q.kind == 'choice')
+    assert validate_answers(template, {text_q: 'Maandelijks', choice.id: ['Inspectie', 'Interview']}) == []
+    assert validate_answers(template, {text_q: None}) == []
+    errors = validate_answers(template, {'q_onbekend': 'x', choice.id: 'Gokken', text_q: {'a': 1}})
+    assert len(errors) == 3
+    assert validate_answers(template, ['geen', 'object']) != []
+
+
+def test_save_answers_merges_and_is_all_or_nothing(client, template, make_user, make_dossier, soc2_controls):
+    user = make_user()
+    d = make_dossier(user)
+    A.scope_dossier(d.id, 'SOC2')
+    c1, c2 = [c.id for c in DossierControl.query.filter_by(dossier_id=d.id).order_by(DossierControl.id)][:2]
+    q1, q2 = [q.id for q in template.sections[0].questions[:2]]
+    login(client, user)
+    url = f"/dossiers/{d.id}/questionnaire"
+
+    resp = client.post(url, json={'items': [{'id': c1, 'answers': {q1: 'a'}}, {'id': c2, 'answers': {q2: 'b'}}]})
+    assert resp.get_json() == {'updated': 2}
+    resp = client.post(url, json={'items': [{'id': c1, 'answers': {q2: 'c'}}]})
+    assert resp.status_code == 200
+    resp = client.post(url, json={'items': [{'id': c2, 'answers': {q2: 'x'}}, {'id': 999999, 'answers': {}}]})
+    assert resp.status_code == 400 and resp.get_json()['items'][0]['index'] == 1
+
+    db.session.expire_all()
+    assert db.session.get(DossierControl, c1).answers == {q1: 'a', q2: 'c'}
+    assert db.session.get(DossierControl, c2).answers == {q2: 'b'}
+    body = client.get(f"/dossiers/{d.id}/questionnaire.json").get_json()
+    assert body['template_version'] == template.version and len(body['items']) == 2
+
+
+def test_template_route_supports_etag(client, template, make_user):
+    login(client, make_user())
+    resp = client.get('/questionnaire/template.json')
+    assert resp.status_code == 200 and resp.get_json()['version'] == template.version
+    resp = client.get('/questionnaire/template.json', headers={'If-None-Match': resp.headers['ETag']})
+    assert resp.status_code == 304
+
+
+def test_missing_csv_gives_503(client, app, make_user, make_dossier, monkeypatch):
+    monkeypatch.setitem(app.config, 'QUESTIONNAIRE_CSV', os.path.join(ROOT, 'bestaat-niet.csv'))
+    user = make_user()
+    d = make_dossier(user)
+    login(client, user)
+    assert client.get('/questionnaire/template.json').status_code == 503
+    resp = client.post(f"/dossiers/{d.id}/questionnaire", json={'items': [{'id': 1, 'answers': {}}]})
+    assert resp.status_code == 503 and resp.get_json()['error']
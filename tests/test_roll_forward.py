@@ -0,0 +1,44 @@
+# tests/test_roll_forward.py
+import app as A
+from models import (
+    db, Dossier, DossierACL, DossierControl, DossierClientControl, ControlStatus, UserRole, perms_to_mask
+)
+
+from conftest import login
+
+
+def test_roll_forward_copies_controls_answers_and_acl(client, make_user, make_dossier, soc2_controls):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    source = make_dossier(owner, title='Jaarwerk 2024')
+    A.scope_dossier(source.id, 'SOC2')
+    db.session.add(DossierACL(dossier_id=source.id, user_id=member.id, perm_mask=perms_to_mask(['VIEW'])))
+    control = DossierControl.query.filter_by(dossier_id=source.id).first()
+    control.status, control.comments = ControlStatus.AFGEROND, 'ok'
+    client_control = DossierClientControl.query.filter_by(dossier_id=source.id).first()
+    client_control.client_response, client_control.answers = 'Ja', {'q1': 'x'}
+    db.session.commit()
+
+    login(client, owner)
+    resp = client.post(f"/dossiers/{source.id}/roll_forward", json={'title': 'Jaarwerk 2025'})
+    assert resp.status_code == 201
+    body = resp.get_json()
+    assert body['copied'] == {'dossier_controls': 5, 'dossier_client_controls': 5, 'dossier_acl': 2}
+    new = db.session.get(Dossier, body['dossier']['id'])
+    assert new.previous_dossier_id == source.id and new.title == 'Jaarwerk 2025'
+    assert new.dossier_number != source.dossier_number
+
+    controls = DossierControl.query.filter_by(dossier_id=new.id).all()
+    assert {c.status for c in controls} == {ControlStatus.OPEN} and not any(c.comments for c in controls)
+    copied = DossierClientControl.query.filter_by(dossier_id=new.id,
+                                                  master_control_id=client_control.master_control_id).one()
+    assert (copied.client_response, copied.answers) == ('Ja', {'q1': 'x'})
+    assert A.has_dossier_permission(member.id, new.id, 'VIEW')
+    assert A.has_dossier_permission(owner.id, new.id, 'MANAGE')
+
+
+def test_roll_forward_requires_manage(client, make_user, make_dossier):
+    owner, member = make_user('Eigenaar'), make_user('Lid', UserRole.TEAMLID)
+    source = make_dossier(owner)
+    login(client, member)
+    assert client.post(f"/dossiers/{source.id}/roll_forward", json={}).status_code == 403
+    assert Dossier.query.count() == 1
@@ -0,0 +1,49 @@
+# tests/test_search.py
+import app as A
+from models import db, MasterControl
+
+from conftest import login
+
+
+def _controls():
+    controls = [
+        MasterControl(framework='SOC2', sub='CC6.1.1', tsc_series='CC6.1',
+                      points_of_focus='Restricts logical access through password policies.'),
+        MasterControl(framework='SOC2', sub='CC7.1.1', tsc_series='CC7.1',
+                      points_of_focus='Monitors infrastructure for anomalies.'),
+        MasterControl(framework='ISO27001', beheersmaatregel_id='5.17', beheersmaatregel_naam='Authenticatie-informatie',
+                      beheersmaatregel_inhoud='Het toekennen en beheren van wachtwoorden moet worden beheerst.'),
+    ]
+    db.session.add_all(controls)
+    db.session.commit()
+    return controls
+
+
+def test_search_uses_prefixes_and_ignores_diacritics(app):
+    soc2_access, _, iso_password = _controls()
+    assert [r['id'] for r in A.search_controls('passw')] == [soc2_access.id]
+    assert [r['id'] for r in A.search_controls('WACHTWOORDEN')] == [iso_password.id]
+    assert [r['id'] for r in A.search_controls('authenticatie')] == [iso_password.id]
+    result = A.search_controls('access', framework='SOC2')[0]
+    assert result['control_id'] == 'CC6.1.1' and '<mark>' in result['snippet']
+    assert A.search_controls('access', framework='ISO27001') == []
+    assert A.search_controls('"); DROP TABLE master_controls; --') == []
+
+
+def test_index_follows_updates_and_deletes(app):
+    soc2_access, monitoring, _ = _controls()
+    monitoring.points_of_focus = 'Detects vulnerabilities.'
+    db.session.delete(soc2_access)
+    db.session.commit()
+    assert A.search_controls('anomalies') == []
+    assert [r['id'] for r in A.search_controls('vulnerab')] == [monitoring.id]
+    assert A.search_controls('password') == []
+
+
+def test_search_route_validates_parameters(client, make_user):
+    _controls()
+    login(client, make_user())
+    assert client.get('/controls/search?q=access&framework=NEN7510').status_code == 400
+    assert client.get('/controls/search?q=access&limit=veel').status_code == 400
+    body = client.get('/controls/search?q=access&limit=1').get_json()
+    assert len(body['results']) == 1